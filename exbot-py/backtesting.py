@@ -1,108 +1,80 @@
 import argparse
 import logging
+import os
 from config import load_config
-from core import chart
+from core import live
+from core.backtest import BacktestResult, run_backtest
+from core.cache import ResultCache, backtest_key, frame_fingerprint
+from core.candle import parse_ms, timeframe_to_ms
+from core.feed import offline_frame
+from core.portfolio import portfolio_backtest
+from core.report import export_report, report_metrics
+from core.tpsl import IntrabarTpsl
+from core.sweep import param_grid, parse_grid, random_params
+from core.walkforward import walk_forward
 from exchanges import exchange
 import pandas as pd
 from core.logger import logger
-from strategies.manager import with_strategy
+from strategies.manager import (
+    create_strategy,
+    strategy_classes,
+    strategys,
+    with_strategy,
+)
 from pandas import DataFrame
 
 pd.set_option("display.max_columns", 1000)
 pd.set_option("display.width", 1000)
 
-fee_rate = 0.0012
 
-
-# 计算收益
-def cal_profit(hold_side, position_spend, position_amount, close_price):
-    if hold_side == "buy":
-        upnl = position_amount * close_price - position_spend
-    else:
-        upnl = position_spend - position_amount * close_price
-    fee = position_spend * fee_rate
-    net_profit = upnl - fee
-    return net_profit, fee
-
-
-def backtesting(df: DataFrame, reversals=False, uamount=6, uamount_max=6) -> DataFrame:
+def backtesting(
+    df: DataFrame, reversals=False, uamount=6, uamount_max=6, intrabar=None
+) -> BacktestResult:
+    """
+    :param intrabar: IntrabarTpsl, simulate the live take profit and stop loss on 1m candles
+    """
     df["take_profit"] = pd.Series(dtype="str")
     df["stop_loss"] = pd.Series(dtype="str")
-    # 持仓
-    hold_side = None
-    # 持仓花费
-    position_spend = 0
-    # 持仓数量
-    position_amount = 0
-    # 总收益
-    total_profit = 0
-    total_fee = 0
-    # last_price
-    last_price = 0
+    return run_backtest(df, reversals, uamount, uamount_max, intrabar)
 
-    for index, row in df.iterrows():
-        last_price = row["close"]
-        if pd.notnull(row["buy"]) or pd.notnull(row["sell"]):
-            # logger.info(f"{row.name}, close: {row['close']}, {row['buy']} {row['sell']}")
-            signal = "buy" if pd.notnull(row["buy"]) else "sell"
-            per_amount = uamount / float(row["close"])
-            if hold_side is None:
-                hold_side = signal
-                position_spend = float(row["close"]) * per_amount
-                position_amount = per_amount
-                logger.info(f"{row.name} open {signal} {row['close']} {per_amount}")
-            else:
-                if signal == hold_side:
-                    # uamount max limit
-                    if position_spend >= uamount_max:
-                        logger.warning(
-                            f"{row.name} skip, position_spend: {position_spend} >= uamount_max: {uamount_max}"
-                        )
-                        continue
-
-                    average_price = position_spend / position_amount
-                    position_spend += float(row["close"]) * per_amount
-                    position_amount += per_amount
-                    logger.info(
-                        f"{row.name} add {signal} {row['close']} {per_amount}, avg_price: {average_price}"
-                    )
-                else:
-                    profit, fee = cal_profit(
-                        hold_side, position_spend, position_amount, row["close"]
-                    )
-                    total_profit += profit
-                    total_fee += fee
-                    logger.info(
-                        f"{row.name} close {hold_side} {row['close']}, position_spend: {position_spend}, position_amount: {position_amount}, profit: {profit}, total profit: {total_profit}, total fee: {total_fee}"
-                    )
-                    # 反向开仓
-                    if reversals:
-                        hold_side = signal
-                        position_spend = float(row["close"]) * per_amount
-                        position_amount = per_amount
-                        logger.info(
-                            f"{row.name} open {signal} {row['close']} {per_amount}"
-                        )
-                    else:
-                        hold_side = None
 
-    if hold_side is not None:
-        profit, fee = cal_profit(hold_side, position_spend, position_amount, last_price)
+def log_result(result: BacktestResult, uamount_max, log_trades=False):
+    """
+    :param log_trades: log every trade of the ledger
+    """
+    if log_trades:
+        for trade in result.trades.itertuples(index=False):
+            logger.info(
+                f"{trade.action} {trade.side}: [{trade.date} {trade.price}], amount: {trade.amount}, profit: {trade.profit}, total profit: {trade.total_profit}"
+            )
+    if result.skipped > 0:
+        logger.warning(
+            f"skipped {result.skipped} signals, position_spend >= uamount_max: {uamount_max}"
+        )
+    if result.hold_side is not None:
         logger.info(
-            f"unsettled position: position_spend: {position_spend}, position_amount: {position_amount}, profit: {profit}, fee: {fee}"
+            f"unsettled position: {result.hold_side}, profit: {result.unsettled_profit}, fee: {result.unsettled_fee}"
         )
 
-    logger.info(f"backtesting total profit: {total_profit}")
-    return df
+    metrics = report_metrics(result)
+    logger.info(
+        "backtesting report:\n"
+        + "\n".join(f"{name}: {value}" for name, value in metrics.items())
+    )
+    logger.info(f"backtesting total profit: {result.total_profit}")
+    return metrics
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="exbot backtesting for python")
     parser.add_argument(
-        "-c", "--config", type=str, required=True, help="config file path"
+        "-c", "--config", type=str, default=None, help="config file path"
     )
     parser.add_argument(
-        "--symbol", type=str, required=True, help="The trading symbol to use"
+        "--symbol",
+        type=str,
+        required=True,
+        help="The trading symbol to use, comma separated symbols for a portfolio backtest",
     )
     parser.add_argument("--strategy", type=str, default="", help="The strategy to use")
     parser.add_argument(
@@ -115,6 +87,61 @@ if __name__ == "__main__":
         required=True,
         help="timeframe: 1m 5m 15m 30m 1h 4h 1d 1w 1M",
     )
+    parser.add_argument(
+        "--base_timeframe",
+        type=str,
+        default=None,
+        help="build the timeframe from the candles of this lower timeframe, eg. 1m",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="backtest the --start --end candles of the local store, without the exchange",
+    )
+    parser.add_argument(
+        "--start", type=str, default=None, help="offline start date, eg. 2024-01-01"
+    )
+    parser.add_argument(
+        "--end",
+        type=str,
+        default=None,
+        help="offline end date (excluded), eg. 2024-02-01",
+    )
+    parser.add_argument(
+        "--exchange",
+        type=str,
+        default="bitget",
+        help="offline exchange of the local store, the config exchange if --config is given",
+    )
+    parser.add_argument(
+        "--capital",
+        type=float,
+        default=100,
+        help="portfolio usdt balance shared by the symbols",
+    )
+    parser.add_argument(
+        "--intrabar",
+        action="store_true",
+        help="simulate the env TPSL settings on 1m candles between the signals",
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="always run the backtest, the results are cached in data/cache by default",
+    )
+    parser.add_argument(
+        "--cache_size", type=int, default=512, help="result cache size limit in MB"
+    )
+    parser.add_argument(
+        "--log_trades", action="store_true", help="log every trade of the backtest"
+    )
+    parser.add_argument(
+        "--report_format",
+        type=str,
+        default="parquet",
+        choices=["parquet", "arrow", "none"],
+        help="format of the trades, equity and metrics files saved to data/report",
+    )
     parser.add_argument("--reversals", action="store_true", help="reversals")
     parser.add_argument(
         "--amount_type",
@@ -132,6 +159,40 @@ if __name__ == "__main__":
         default=1,
         help="The symbol amount max limit to trade",
     )
+    parser.add_argument(
+        "--walk_forward",
+        action="store_true",
+        help="optimize the --grid params on rolling train windows, backtest them on the following test windows",
+    )
+    parser.add_argument(
+        "--train_days", type=float, default=14, help="walk-forward train window days"
+    )
+    parser.add_argument(
+        "--test_days", type=float, default=7, help="walk-forward test window days"
+    )
+    parser.add_argument(
+        "--grid",
+        type=str,
+        action="append",
+        default=[],
+        help="walk-forward param values, eg. --grid fast_period=8,12,16 --grid slow_period=21,26",
+    )
+    parser.add_argument(
+        "--random",
+        type=int,
+        default=0,
+        help="walk-forward random search budget, number of grid combinations to try",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="random search seed")
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=None,
+        help="walk-forward indicator warmup candles, the strategy required candles by default",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=os.cpu_count(), help="number of workers"
+    )
     # add debug
     parser.add_argument("--debug", default=True, action="store_true", help="debug mode")
     # add arg verbose
@@ -146,14 +207,174 @@ if __name__ == "__main__":
         logger.setLevel(logging.DEBUG)
         pd.set_option("display.max_rows", None)
 
+    if args.walk_forward:
+        if args.strategy not in strategy_classes:
+            parser.error(f"Invalid strategy name: {args.strategy}")
+        if len(args.grid) == 0:
+            parser.error("--walk_forward requires --grid")
+
+    symbols = [symbol.strip() for symbol in args.symbol.split(",")]
+    if len(symbols) > 1:
+        if args.strategy not in strategy_classes:
+            parser.error(f"Invalid strategy name: {args.strategy}")
+        if args.walk_forward:
+            parser.error("--walk_forward supports a single --symbol")
+    if args.intrabar and (len(symbols) > 1 or args.walk_forward):
+        parser.error("--intrabar supports the backtest of a single --symbol")
+
+    if args.offline:
+        if args.start is None or args.end is None:
+            parser.error("--offline requires --start and --end")
+    elif args.config is None:
+        parser.error("the following arguments are required: -c/--config")
+
     logger.info("exbot backtesting ...")
 
-    config = load_config(args.config)
-    ex = exchange.Exchange(config.exchange).get()
-    ex.load_markets()
-    logger.info(f"exchange: {ex.id()}, args: {args}")
-    # 获取图表实时数据
-    df = chart.get_charting(ex, args.symbol, args.timeframe, args.days)
-    df = with_strategy(args.strategy, ex, df, args)
-    logger.info(df)
-    backtesting(df, args.reversals, args.amount, args.amount_max)
+    if args.offline:
+        ex = None
+        exchange_id = args.exchange
+        if args.config is not None:
+            exchange_id = load_config(args.config).exchange.name
+        logger.info(f"offline exchange: {exchange_id}, args: {args}")
+    else:
+        config = load_config(args.config)
+        ex = exchange.Exchange(config.exchange).get()
+        ex.load_markets()
+        exchange_id = ex.id()
+        logger.info(f"exchange: {exchange_id}, args: {args}")
+    frames = {}
+    for symbol in symbols:
+        if args.offline:
+            # 只读取本地数据，缺失时直接失败
+            try:
+                frames[symbol] = offline_frame(
+                    exchange_id,
+                    symbol,
+                    args.timeframe,
+                    parse_ms(args.start),
+                    parse_ms(args.end),
+                    args.base_timeframe,
+                )
+            except ValueError as e:
+                logger.error(e)
+                raise SystemExit(1)
+        else:
+            # 获取图表实时数据
+            frames[symbol] = live.get_charting(
+                ex,
+                symbol,
+                args.timeframe,
+                args.days,
+                base_timeframe=args.base_timeframe,
+            )
+    df = frames[symbols[0]]
+    if len(symbols) > 1:
+        result = portfolio_backtest(
+            frames,
+            args.strategy,
+            None,
+            args.capital,
+            args.reversals,
+            args.amount,
+            args.amount_max,
+            args.workers,
+        )
+        logger.info(f"portfolio backtesting:\n{result.summary()}")
+        logger.info(f"portfolio backtesting total profit: {result.total_profit}")
+        output = os.path.join(
+            "data", "portfolio", f"{args.strategy}_{args.timeframe}_equity.csv"
+        )
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        result.equity.to_csv(output)
+        logger.info(f"portfolio equity saved: {output}")
+    elif args.walk_forward:
+        grid = parse_grid(args.grid)
+        if args.random > 0:
+            trials = random_params(grid, args.random, args.seed)
+        else:
+            trials = param_grid(grid)
+        warmup = args.warmup
+        if warmup is None:
+            warmup = create_strategy(args.strategy, trials[0]).required_candles()
+        logger.info(
+            f"walk-forward {args.strategy}: {len(trials)} trials, train {args.train_days} days, test {args.test_days} days, warmup {warmup}"
+        )
+        results = walk_forward(
+            df,
+            args.strategy,
+            trials,
+            args.train_days,
+            args.test_days,
+            warmup,
+            args.reversals,
+            args.amount,
+            args.amount_max,
+            args.workers,
+        )
+        logger.info(f"walk-forward results:\n{results}")
+        logger.info(
+            f"walk-forward out-of-sample total profit: {results['test_total_profit'].sum()}"
+        )
+        output = os.path.join(
+            "data",
+            "walkforward",
+            f"{args.strategy}_{args.symbol.replace('/', '_').replace(':', '_')}_{args.timeframe}.csv",
+        )
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        results.to_csv(output, index=False)
+        logger.info(f"walk-forward results saved: {output}")
+    else:
+        intrabar = None
+        if args.intrabar:
+            if args.offline:
+                try:
+                    minutes = offline_frame(
+                        exchange_id,
+                        symbols[0],
+                        "1m",
+                        parse_ms(args.start),
+                        parse_ms(args.end),
+                    )
+                except ValueError as e:
+                    logger.error(e)
+                    raise SystemExit(1)
+            else:
+                minutes = live.get_charting(ex, symbols[0], "1m", args.days)
+            intrabar = IntrabarTpsl.from_frame(minutes, timeframe_to_ms(args.timeframe))
+            logger.info(f"intrabar tpsl: {intrabar.settings}")
+        cache, key, cached = None, None, None
+        if not args.no_cache and args.strategy in strategys:
+            cache = ResultCache(max_bytes=args.cache_size * 1024**2)
+            key = backtest_key(
+                df,
+                strategys[args.strategy],
+                reversals=args.reversals,
+                amount=args.amount,
+                amount_max=args.amount_max,
+                intrabar=(
+                    [intrabar.settings, frame_fingerprint(minutes)]
+                    if intrabar is not None
+                    else None
+                ),
+            )
+            cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"backtesting cache hit: {key}")
+            df, result = cached
+        else:
+            df = with_strategy(args.strategy, ex, df, args)
+            result = backtesting(
+                df, args.reversals, args.amount, args.amount_max, intrabar
+            )
+            if cache is not None:
+                cache.put(key, (df, result))
+        logger.info(df)
+        metrics = log_result(result, args.amount_max, args.log_trades)
+        if args.report_format != "none":
+            output = os.path.join(
+                "data",
+                "report",
+                f"{args.strategy}_{args.symbol.replace('/', '_').replace(':', '_')}_{args.timeframe}",
+            )
+            export_report(result, output, metrics, args.report_format)
+            logger.info(f"backtesting report saved: {output}")
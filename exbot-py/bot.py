@@ -3,11 +3,11 @@ import datetime
 import logging
 import time
 from config import load_config
-from core import chart
+from core import live
 from exchanges import exchange
 import pandas as pd
 from core.logger import logger
-from strategies.manager import with_strategy
+from strategies.manager import strategy_history, strategys, with_strategy
 
 pd.set_option("display.max_columns", None)
 pd.set_option("display.width", 1000)
@@ -15,11 +15,14 @@ pd.set_option("display.width", 1000)
 
 def update(ex, args):
     # 获取图表实时数据
-    df = chart.get_charting(ex, args.symbol, args.timeframe, days=3)
+    days, capacity = strategy_history(args.strategy, args.timeframe)
+    df = live.get_charting(
+        ex, args.symbol, args.timeframe, days=days, capacity=capacity, live=True
+    )
     df = with_strategy(args.strategy, ex, df, args)
     logger.debug(df)
     logger.info(
-        f"symbol: {args.symbol}, updated: {datetime.datetime.fromtimestamp(chart.data_updated)}, [{df.index[-1]} {df['close'].iloc[-1]}]"
+        f"symbol: {args.symbol}, updated: {datetime.datetime.fromtimestamp(live.last_update(args.symbol, args.timeframe))}, [{df.index[-1]} {df['close'].iloc[-1]}]"
     )
 
 
@@ -64,6 +67,16 @@ if __name__ == "__main__":
         default=10,
         help="data update interval seconds < timeframes interval",
     )
+    parser.add_argument(
+        "--ws",
+        action="store_true",
+        help="stream candles from the exchange websocket, the interval is the update timeout",
+    )
+    parser.add_argument(
+        "--new_candles",
+        action="store_true",
+        help="only populate the strategy when a candle has closed, tpsl still runs on every update",
+    )
     # add arg verbose
     parser.add_argument("-v", "--verbose", action="store_true", help="verbose mode")
     # add arg verbose
@@ -71,6 +84,8 @@ if __name__ == "__main__":
     # add debug
     parser.add_argument("--debug", action="store_true", help="debug mode")
     args = parser.parse_args()
+    if args.strategy not in strategys:
+        parser.error(f"Invalid strategy name: {args.strategy}")
 
     if args.verbose:
         logger.setLevel(logging.DEBUG)
@@ -84,10 +99,22 @@ if __name__ == "__main__":
     ex = exchange.Exchange(config.exchange).get()
     ex.load_markets()
     logger.info(f"exchange: {ex.id()}, args: {args}")
+    live.data_update_interval = args.interval
+    if args.new_candles:
+        strategys[args.strategy].process_only_new_candles = True
+    if args.ws:
+        feed = live.get_feed(ex)
+        days, capacity = strategy_history(args.strategy, args.timeframe)
+        feed.stream(args.symbol, args.timeframe, days=days, capacity=capacity)
+        feed.watch([(args.symbol, args.timeframe)])
 
     while True:
         try:
             update(ex, args)
         except Exception as e:
             logger.exception(f"An unknown error occurred in update(): {e}")
-        time.sleep(args.interval)
+        if args.ws:
+            # 推送的蜡烛图到达后立即更新
+            live.get_feed(ex).wait(args.interval)
+        else:
+            time.sleep(args.interval)
@@ -4,7 +4,7 @@ import datetime
 import logging
 import pandas as pd
 from config import load_config
-from core import chart
+from core import chart, live
 from exchanges import exchange
 from dash import Dash, State, dcc, html, Input, Output
 from plotly.subplots import make_subplots
@@ -56,6 +56,7 @@ if __name__ == "__main__":
 
     app = Dash(__name__, title=args.symbol)
     data_update_interval = args.interval
+    live.data_update_interval = args.interval
     app.layout = html.Div(
         [
             dcc.Interval(
@@ -81,9 +82,9 @@ if __name__ == "__main__":
         symbol = args.symbol
 
         # 获取图表实时数据
-        df = chart.get_charting(ex, symbol, args.timeframe)
+        df = live.get_charting(ex, symbol, args.timeframe)
         print(
-            f"symbol: {symbol}, updated: {datetime.datetime.fromtimestamp(chart.data_updated)}, [{df.index[-1]} {df['close'].iloc[-1]}]"
+            f"symbol: {symbol}, updated: {datetime.datetime.fromtimestamp(live.last_update(symbol, args.timeframe))}, [{df.index[-1]} {df['close'].iloc[-1]}]"
         )
         # 组合图表
         fig = make_subplots(
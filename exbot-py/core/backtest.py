@@ -0,0 +1,278 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+fee_rate = 0.0012
+
+TRADE_COLUMNS = [
+    "date",
+    "action",
+    "side",
+    "price",
+    "amount",
+    "position_spend",
+    "position_amount",
+    "profit",
+    "fee",
+    "total_profit",
+]
+
+
+# 计算收益
+def cal_profit(hold_side, position_spend, position_amount, close_price):
+    if hold_side == "buy":
+        upnl = position_amount * close_price - position_spend
+    else:
+        upnl = position_spend - position_amount * close_price
+    fee = position_spend * fee_rate
+    net_profit = upnl - fee
+    return net_profit, fee
+
+
+class BacktestResult:
+    def __init__(
+        self,
+        trades: pd.DataFrame,
+        equity: pd.Series,
+        total_profit,
+        total_fee,
+        skipped,
+        hold_side: Optional[str],
+        unsettled_profit,
+        unsettled_fee,
+        position: Optional[pd.Series] = None,
+    ):
+        """
+        :param trades: open, add and close trades
+        :param equity: total profit of every candle, the open position is valued at the close price
+        :param skipped: signals skipped by the uamount max limit
+        :param position: position side of every candle, 1 buy, -1 sell, 0 flat
+        """
+        self.trades = trades
+        self.equity = equity
+        self.total_profit = total_profit
+        self.total_fee = total_fee
+        self.skipped = skipped
+        self.hold_side = hold_side
+        self.unsettled_profit = unsettled_profit
+        self.unsettled_fee = unsettled_fee
+        self.position = position
+
+    def summary(self) -> Dict:
+        closes = self.trades[~self.trades["action"].isin(["open", "add"])]
+        drawdown = self.equity - self.equity.cummax().clip(lower=0)
+        return {
+            "total_profit": self.total_profit,
+            "total_fee": self.total_fee,
+            "unsettled_profit": self.unsettled_profit,
+            "trades": len(closes),
+            "win_rate": (closes["profit"] > 0).mean() if len(closes) > 0 else np.nan,
+            "max_drawdown": max(0.0, -drawdown.min()) if len(drawdown) > 0 else 0.0,
+        }
+
+
+def run_backtest(
+    df: pd.DataFrame, reversals=False, uamount=6, uamount_max=6, intrabar=None
+) -> BacktestResult:
+    """
+    replay the buy and sell signals, a signal on the side of the position adds
+    uamount to it until uamount_max, the opposite signal closes it
+    :param df: candles with buy and sell columns
+    :param reversals: open the opposite position on close
+    :param intrabar: IntrabarTpsl, close the positions at their take profit and stop loss between the signals
+    """
+    return backtest_signals(
+        df.index,
+        df["close"].values,
+        df["buy"].notnull().values,
+        df["sell"].notnull().values,
+        reversals,
+        uamount,
+        uamount_max,
+        intrabar,
+    )
+
+
+def backtest_signals(
+    index, close, buy, sell, reversals=False, uamount=6, uamount_max=6, intrabar=None
+) -> BacktestResult:
+    """
+    run_backtest of signal arrays, eg. a row of the batched macd signals
+    :param close: close prices
+    :param buy: bool array, buy signals
+    :param sell: bool array, sell signals, a buy signal wins on the same candle
+    """
+    rows = np.flatnonzero(buy | sell)
+    signals = np.where(buy[rows], "buy", "sell")
+    dates = index[rows]
+    closes = close[rows].tolist()
+    # 持仓
+    hold_side = None
+    # 持仓花费
+    position_spend = 0
+    # 持仓数量
+    position_amount = 0
+    # 总收益
+    total_profit = 0
+    total_fee = 0
+    skipped = 0
+    trades: List[list] = []
+    # position after each signal: side, spend, amount, total profit
+    states = np.zeros((len(rows), 4))
+    # intrabar exits: trade number, date (ms); candle and position after the exit
+    exits: List[tuple] = []
+    exit_rows: List[int] = []
+    exit_states: List[list] = []
+    if intrabar is not None:
+        index_ms = index.as_unit("ms").asi8
+        # a signal is filled at the close of its candle
+        fills = index_ms[rows] + intrabar.timeframe_ms
+
+    def trade(i, action, side, amount, profit=np.nan, fee=np.nan, price=None):
+        trades.append(
+            [
+                i,
+                action,
+                side,
+                closes[i] if price is None else price,
+                amount,
+                position_spend,
+                position_amount,
+                profit,
+                fee,
+                total_profit,
+            ]
+        )
+
+    def tpsl(i, end):
+        """
+        close the position at the first take profit or stop loss after the signal i
+        """
+        nonlocal hold_side, position_spend, position_amount, total_profit, total_fee
+        touch = intrabar.first_touch(
+            hold_side, position_spend, position_amount, fills[i], end
+        )
+        if touch is None:
+            return
+        date, price, action = touch
+        profit, fee = cal_profit(hold_side, position_spend, position_amount, price)
+        total_profit += profit
+        total_fee += fee
+        exits.append((len(trades), date))
+        trade(i, action, hold_side, position_amount, profit, fee, price)
+        hold_side = None
+        position_spend = 0
+        position_amount = 0
+        exit_rows.append(int(np.searchsorted(index_ms, date, "right")) - 1)
+        exit_states.append([0, 0, 0, total_profit])
+
+    for i, signal in enumerate(signals.tolist()):
+        if intrabar is not None and hold_side is not None:
+            tpsl(i - 1, fills[i])
+        price = closes[i]
+        per_amount = uamount / price
+        if hold_side is None:
+            hold_side = signal
+            position_spend = price * per_amount
+            position_amount = per_amount
+            trade(i, "open", signal, per_amount)
+        elif signal == hold_side:
+            # uamount max limit
+            if position_spend >= uamount_max:
+                skipped += 1
+            else:
+                position_spend += price * per_amount
+                position_amount += per_amount
+                trade(i, "add", signal, per_amount)
+        else:
+            profit, fee = cal_profit(hold_side, position_spend, position_amount, price)
+            total_profit += profit
+            total_fee += fee
+            trade(i, "close", hold_side, position_amount, profit, fee)
+            # 反向开仓
+            if reversals:
+                hold_side = signal
+                position_spend = price * per_amount
+                position_amount = per_amount
+                trade(i, "open", signal, per_amount)
+            else:
+                hold_side = None
+                position_spend = 0
+                position_amount = 0
+        states[i] = [
+            {"buy": 1, "sell": -1, None: 0}[hold_side],
+            position_spend,
+            position_amount,
+            total_profit,
+        ]
+    if intrabar is not None and hold_side is not None:
+        tpsl(len(rows) - 1, np.iinfo(np.int64).max)
+
+    unsettled_profit, unsettled_fee = 0, 0
+    if hold_side is not None:
+        unsettled_profit, unsettled_fee = cal_profit(
+            hold_side, position_spend, position_amount, close[-1]
+        )
+
+    trades = pd.DataFrame(trades, columns=TRADE_COLUMNS)
+    # the dates are looked up once, boxing a date per trade is slow
+    trades["date"] = dates[trades["date"].values.astype(int)]
+    if len(exits) > 0:
+        positions, exit_dates = zip(*exits)
+        exit_dates = pd.to_datetime(list(exit_dates), unit="ms", utc=True)
+        trades.loc[list(positions), "date"] = (
+            exit_dates.tz_convert(index.tz)
+            if index.tz
+            else exit_dates.tz_localize(None)
+        )
+        # the ledger stays in fill order: a signal is dated at its candle and
+        # filled at the close, after the exits dated inside the candle
+        # the exits come before the signals of the same candle
+        order = np.argsort(np.r_[exit_rows, rows], kind="stable")
+        rows = np.r_[exit_rows, rows][order]
+        states = np.vstack([exit_states, states])[order]
+
+    return BacktestResult(
+        trades=trades,
+        equity=pd.Series(equity_curve(close, rows, states), index=index, name="equity"),
+        total_profit=total_profit,
+        total_fee=total_fee,
+        skipped=skipped,
+        hold_side=hold_side,
+        unsettled_profit=unsettled_profit,
+        unsettled_fee=unsettled_fee,
+        position=pd.Series(
+            position_states(len(close), rows, states)[:, 0].astype(np.int8),
+            index=index,
+            name="position",
+        ),
+    )
+
+
+def equity_curve(close, rows, states) -> np.ndarray:
+    """
+    :param rows: candle of every signal
+    :param states: position after every signal: side (1 buy, -1 sell, 0 flat), spend, amount, total profit
+    :return: total profit of every candle, the open position is valued at the close price
+    """
+    side, spend, amount, realized = position_states(len(close), rows, states).T
+    upnl = np.where(
+        side > 0,
+        amount * close - spend,
+        spend - amount * close,
+    )
+    return realized + np.where(side != 0, upnl - spend * fee_rate, 0.0)
+
+
+def position_states(n, rows, states) -> np.ndarray:
+    """
+    forward fill the position of the last signal to every candle
+    :return: (n, 4) states, see equity_curve
+    """
+    last = np.full(n, -1)
+    last[rows] = np.arange(len(rows))
+    last = np.maximum.accumulate(last)
+    states = np.vstack([np.zeros((1, 4)), states])
+    # row 0 is the flat position before the first signal
+    return states[last + 1]
@@ -0,0 +1,158 @@
+import ast
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import pickle
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from core import backtest, tpsl
+from core.logger import logger
+from core.ringbuffer import OHLCV
+from strategies.istrategy import IStrategy
+
+# packages of the repo code, the backtest results depend on their sources
+SOURCE_PACKAGES = ("core", "strategies")
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """
+    :return: hash of the dates and the ohlcv values of the candles
+    """
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(df.index.as_unit("ms").asi8).tobytes())
+    h.update(np.ascontiguousarray(df[OHLCV].values, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def source_fingerprint(*objects) -> str:
+    """
+    :param objects: classes, modules or file paths
+    :return: hash of the source files
+    """
+    h = hashlib.sha256()
+    for obj in objects:
+        path = obj if isinstance(obj, str) else inspect.getfile(obj)
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def _find_file(name) -> Optional[str]:
+    if name.split(".")[0] not in SOURCE_PACKAGES:
+        return None
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return None
+    return spec.origin if spec is not None and spec.has_location else None
+
+
+def source_files(*objects) -> List[str]:
+    """
+    source files of the classes or modules and the core/strategies modules
+    they import, transitively, found in the import statements
+    :return: sorted file paths
+    """
+    files = set()
+    stack = [inspect.getfile(obj) for obj in objects]
+    while len(stack) > 0:
+        path = stack.pop()
+        if path in files:
+            continue
+        files.add(path)
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                # from core import indicators imports a module
+                names = [node.module] + [
+                    f"{node.module}.{alias.name}" for alias in node.names
+                ]
+            else:
+                continue
+            for name in names:
+                found = _find_file(name)
+                if found is not None:
+                    stack.append(found)
+    return sorted(files)
+
+
+def backtest_key(df: pd.DataFrame, stgy: IStrategy, **kwargs) -> str:
+    """
+    cache key of a backtest, it changes with the candles, the sources of the
+    strategy, the backtest engine, the intrabar tpsl and the core/strategies
+    modules they import, the params and the CONDITION_* env switches
+    :param kwargs: backtest arguments, json serializable
+    """
+    h = hashlib.sha256()
+    h.update(frame_fingerprint(df).encode())
+    files = source_files(type(stgy), IStrategy, backtest, tpsl)
+    h.update(source_fingerprint(*files).encode())
+    params = {
+        "strategy": type(stgy).__name__,
+        "buy_params": stgy.buy_params,
+        "sell_params": stgy.sell_params,
+        "env": {k: v for k, v in os.environ.items() if k.startswith("CONDITION_")},
+        **kwargs,
+    }
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Pickled results in a directory, one file per key.
+    The least recently used files are evicted when the directory is larger than max_bytes.
+    """
+
+    def __init__(self, path=os.path.join("data", "cache"), max_bytes=512 * 1024**2):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.path, f"{key}.pkl")
+
+    def get(self, key) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"invalid cache {path}: {e}")
+            os.remove(path)
+            return None
+        # the access time of the lru eviction
+        os.utime(path)
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith(".pkl"):
+                stat = os.stat(os.path.join(self.path, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.path, name))
+            total -= size
+            logger.debug(f"evicted cache {name}")
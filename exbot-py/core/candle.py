@@ -1,68 +1,151 @@
 import datetime
-import json
 import os
 from core.logger import logger
+from core.store import COLUMNS, CandleStore, migrate_json
 
 
-from typing import List, Any
+from typing import Dict, List, Any
 
+import numpy as np
 
-def get_candles(ex, symbol, timeframe, days=7):
+
+def get_candle_store(
+    exchange_id, symbol, timeframe, rootpath=None, readonly=False
+) -> CandleStore:
+    """
+    :param exchange_id: eg. bitget
+    :param symbol: eg. BTC/USDT:USDT
+    :param str timeframe: 1m 5m 15m 30m 1h 4h 1d 1w 1M
+    :param readonly: open the downloaded store only, nothing is created or migrated
+    :raise ValueError: the readonly store has not been downloaded
+    """
+    rootpath = rootpath or os.getcwd()
+    name = f"{symbol.replace('/','_')}_{timeframe}"
+    path = os.path.join(rootpath, "data", str(exchange_id), name)
+    if readonly:
+        return CandleStore(path, readonly=True)
+    store = CandleStore(path)
+    # migrate legacy json cache
+    json_path = os.path.join(rootpath, "data", str(exchange_id), f"{name}.json")
+    if os.path.exists(json_path) and len(store) == 0:
+        migrate_json(json_path, store)
+    return store
+
+
+TIMEFRAME_UNITS = {
+    "m": 60 * 1000,
+    "h": 60 * 60 * 1000,
+    "d": 24 * 60 * 60 * 1000,
+    "w": 7 * 24 * 60 * 60 * 1000,
+}
+
+
+def timeframe_to_ms(timeframe) -> int:
+    """
+    :param str timeframe: 1m 5m 15m 30m 1h 4h 1d 1w
+    """
+    unit = timeframe[-1]
+    if unit not in TIMEFRAME_UNITS:
+        raise ValueError(f"Invalid timeframe: {timeframe}")
+    return int(timeframe[:-1]) * TIMEFRAME_UNITS[unit]
+
+
+def candles_days(timeframe, candles) -> float:
+    """
+    :return: days of the given number of candles
+    """
+    return candles * timeframe_to_ms(timeframe) / TIMEFRAME_UNITS["d"]
+
+
+def format_ms(ms):
+    return datetime.datetime.fromtimestamp(ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_ms(value) -> int:
+    """
+    :param str value: eg. 2024-01-01 or 2024-01-01 08:00, local time without a timezone
+    """
+    return int(datetime.datetime.fromisoformat(value).timestamp() * 1000)
+
+
+def sync_candles(ex, symbol, timeframe, days=7):
     """
+    download missing candles into the local store
     :param ex: exchange
     :param symbol: eg. BTC/USDT:USDT
     :param str timeframe: 1m 5m 15m 30m 1h 4h 1d 1w 1M
     :param int days: 7
+    :return: store, since
     """
-    rootpath = os.getcwd()
-    candles_path = os.path.join(
-        rootpath, "data", str(ex.id()), f"{symbol.replace('/','_')}_{timeframe}.json"
-    )
+    store = get_candle_store(ex.id(), symbol, timeframe)
+    now = ex.exchange.milliseconds()
     # days to since
-    since = ex.exchange.milliseconds() - days * 24 * 60 * 60 * 1000
-    data_from = since
-
-    # declare candles
-    candles: List[Any] = []
-    if not os.path.exists(candles_path):
-        logger.debug(f"download data to {candles_path}")
-        os.makedirs(os.path.dirname(candles_path), exist_ok=True)
-        candles = ex.get_all_candles(symbol, timeframe, since=since)
-        with open(candles_path, "w") as f:
-            json.dump(candles, f)
-        return candles
-    else:
-        logger.debug(f"load data from {candles_path}")
-        with open(candles_path, "r") as f:
-            candles = json.load(f)
-
-    if candles:
-        exist_start = candles[0][0]
-        exist_end = candles[-1][0]
-        if since < exist_start:
-            # redownload all data
-            # TODO download only missing data
-            candles = []
-        else:
-            # calculate since, +1 to avoid duplicate data
-            since = exist_end + 1
+    since = now - int(days * 24 * 60 * 60 * 1000)
 
-    logger.debug(
-        f"downloading new data for [{symbol} {timeframe}] from {datetime.datetime.fromtimestamp(since/1000).strftime('%Y-%m-%d %H:%M:%S')}"
-    )
-
-    new_candles = ex.get_all_candles(symbol, timeframe, since=since)
+    if len(store) == 0:
+        logger.debug(f"download data to {store.path}")
+    else:
+        logger.debug(f"load data from {store.path}")
 
-    if len(new_candles) > 0:
-        candles.extend(new_candles)
-        with open(candles_path, "w") as f:
+    # download only the missing head, interior and tail ranges
+    for start, end in store.missing(since, now):
+        logger.debug(
+            f"downloading data for [{symbol} {timeframe}] from {format_ms(start)} to {format_ms(end)}"
+        )
+        until = end if end < now else None
+        new_candles = ex.get_all_candles(symbol, timeframe, since=start, until=until)
+        if len(new_candles) > 0:
             logger.debug(
                 f"downloaded data for [{symbol}] with length {len(new_candles)}"
             )
-            json.dump(candles, f)
-    else:
-        logger.debug(f"no new data for [{symbol}]")
+            store.write(new_candles)
+        if until is not None:
+            store.add_range(start, end)
+        elif len(new_candles) > 0:
+            # the last candle may be incomplete, download it again next time
+            store.add_range(start, new_candles[-1][0])
+        else:
+            logger.debug(f"no new data for [{symbol}]")
+
+    return store, since
+
+
+def load_candles(ex, symbol, timeframe, days=7) -> Dict[str, np.ndarray]:
+    """
+    :return: column name -> array of the last given days
+    """
+    store, since = sync_candles(ex, symbol, timeframe, days)
+    return store.read(start=since)
+
+
+def read_candles(
+    exchange_id, symbol, timeframe, start, end, rootpath=None
+) -> Dict[str, np.ndarray]:
+    """
+    read the candles of [start, end) from the local store only, nothing is downloaded
+    :param int start: ms
+    :param int end: ms
+    :raise ValueError: the store has not downloaded the whole range
+    """
+    store = get_candle_store(exchange_id, symbol, timeframe, rootpath, readonly=True)
+    missing = store.missing(start, end)
+    if len(missing) > 0:
+        ranges = ", ".join(f"{format_ms(s)} - {format_ms(e)}" for s, e in missing)
+        raise ValueError(
+            f"missing [{symbol} {timeframe}] candles in {store.path}: {ranges}"
+        )
+    return store.read(start=start, end=end)
 
-    candles = [x for x in candles if x[0] >= data_from]
 
-    return candles
+def get_candles(ex, symbol, timeframe, days=7) -> List[Any]:
+    """
+    :param ex: exchange
+    :param symbol: eg. BTC/USDT:USDT
+    :param str timeframe: 1m 5m 15m 30m 1h 4h 1d 1w 1M
+    :param int days: 7
+    :return: ohlcv rows
+    """
+    arrays = load_candles(ex, symbol, timeframe, days)
+    dates = arrays["date"].tolist()
+    values = np.column_stack([arrays[c] for c in COLUMNS[1:]]).tolist()
+    return [[date] + row for date, row in zip(dates, values)]
@@ -1,30 +1,10 @@
 from datetime import timedelta
-import time
 import pandas as pd
 import talib
 from core.logger import logger
-from core.candle import get_candles
+from core.live import chart_display_size
 import plotly.graph_objects as go
 
-chartdata = {}
-# display size in fig
-chart_display_size = 200
-data_update_interval = 10
-data_updated = 0.0
-
-
-def get_chart(ex, symbol, timeframe, days=7):
-    ohlcv = get_candles(ex, symbol, timeframe, days)
-    df = pd.DataFrame(ohlcv, columns=["date", "open", "high", "low", "close", "volume"])
-    df["date"] = pd.to_datetime(df["date"], unit="ms", utc=True).dt.tz_convert(
-        "Asia/Shanghai"
-    )
-    # get last some rows
-    df.set_index("date", inplace=True)
-    if chartdata.get(symbol) is None:
-        chartdata[symbol] = {}
-    chartdata[symbol][timeframe] = df
-
 
 # 绘制蜡烛图
 def draw_fig_candle(df):
@@ -297,38 +277,6 @@ def fig_relayout(fig, relayout_data):
         fig["layout"] = layout
 
 
-def get_charting(ex, symbol, timeframe, days=7):
-    if symbol not in chartdata or timeframe not in chartdata[symbol]:
-        get_chart(ex, symbol, timeframe, days)
-    df = chartdata[symbol][timeframe]
-    # last_date_timestamp = int(df.iloc[-1]['date'].timestamp()*1000)
-    last_date = df.index[-1]
-
-    # 只获取最新的蜡烛图，会导致最终的蜡烛图没更新到最新就切换到下一个蜡烛图了，造成数据不准确
-    # 所以获取最后两根蜡烛图去修复上一根蜡烛图的数据
-    global data_updated
-    current_timestamp = time.time()
-    if round(current_timestamp - data_updated) >= data_update_interval:
-        data_updated = current_timestamp
-        logger.debug(f"update candles: {symbol}, {data_updated}")
-        last_candles: list = ex.get_candles(symbol, timeframe, None, 2)
-        df_last = pd.DataFrame(
-            last_candles, columns=["date", "open", "high", "low", "close", "volume"]
-        )
-        df_last["date"] = pd.to_datetime(
-            df_last["date"], unit="ms", utc=True
-        ).dt.tz_convert("Asia/Shanghai")
-        df_last.set_index("date", inplace=True)
-
-        if last_date == df_last.index[-1]:
-            df.loc[last_date] = dict(zip(df.columns, df_last.iloc[-1]))
-        elif last_date < df_last.index[-1]:
-            df.loc[df_last.index[-1]] = dict(zip(df.columns, df_last.iloc[-1]))
-            # 添加新的蜡烛图后，需要把上一根蜡烛图的数据修复
-            df.loc[df_last.index[-2]] = dict(zip(df.columns, df_last.iloc[-2]))
-    return df
-
-
 def draw_fig_emas(fig, df, emas=[9, 22]):
     for ema in emas:
         fig.add_trace(
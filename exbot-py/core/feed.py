@@ -0,0 +1,333 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.candle import load_candles, read_candles, timeframe_to_ms
+from core.logger import logger
+from core.resample import Resampler, resample
+from core.ringbuffer import OHLCV, CandleRingBuffer
+
+
+class CandleStream:
+    """
+    Live candle window of a symbol and timeframe,
+    derived streams are resampled from their base stream.
+    """
+
+    def __init__(self, symbol, timeframe, buffer: CandleRingBuffer, base=None):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.buffer = buffer
+        self.base: Optional[CandleStream] = base
+        self.resampler = Resampler(timeframe) if base is not None else None
+        self.derived: List[CandleStream] = []
+        # time of the last successful update
+        self.updated = 0.0
+        # updated by pushes from a candle stream
+        self.streaming = False
+        # pushed candles waiting for a catch up over REST, None when not catching up
+        self.pending: Optional[List[list]] = None
+
+    def last_update(self) -> float:
+        return self.base.updated if self.base is not None else self.updated
+
+    def staleness(self, now=None) -> float:
+        now = time.time() if now is None else now
+        return now - self.last_update()
+
+
+class LiveCandleFeed:
+    """
+    Live candles of many symbols and timeframes in one process.
+    Freshness is tracked per stream, and all the streams which are due are
+    refreshed together, concurrently under the exchange rate limiter.
+    Streams can also be updated by pushes from the exchange websocket,
+    they are only polled when the stream goes silent.
+    """
+
+    def __init__(self, ex, interval=10, capacity=None, min_capacity=200, workers=4):
+        """
+        :param ex: exchange
+        :param int interval: seconds between the updates of a stream
+        :param int capacity: live window size, None keeps the candles loaded at startup
+        """
+        self.ex = ex
+        self.interval = interval
+        self.capacity = capacity
+        self.min_capacity = min_capacity
+        self.workers = workers
+        self.streams: Dict[Tuple[str, str], CandleStream] = {}
+        # pushes come from the websocket thread
+        self.lock = threading.RLock()
+        self.event = threading.Event()
+        self.watcher = None
+        # catch ups of the push gaps, off the websocket event loop
+        self.catch_up = None
+
+    def stream(
+        self, symbol, timeframe, days=7, base_timeframe=None, capacity=None
+    ) -> CandleStream:
+        """
+        get a stream, the history is loaded on the first call
+        :param base_timeframe: build the timeframe from the base timeframe candles
+        """
+        key = (symbol, timeframe)
+        if key in self.streams:
+            return self.streams[key]
+        with self.lock:
+            return self._stream(symbol, timeframe, days, base_timeframe, capacity)
+
+    def _stream(self, symbol, timeframe, days, base_timeframe, capacity):
+        key = (symbol, timeframe)
+        if key in self.streams:
+            return self.streams[key]
+        if base_timeframe is not None and base_timeframe != timeframe:
+            base = self.stream(symbol, base_timeframe, days, capacity=capacity)
+            stream = self._derive(base, timeframe)
+        else:
+            arrays = load_candles(self.ex, symbol, timeframe, days)
+            capacity = capacity or self.capacity or len(arrays["date"])
+            buffer = CandleRingBuffer(max(capacity, self.min_capacity))
+            buffer.extend(arrays)
+            stream = CandleStream(symbol, timeframe, buffer)
+            stream.updated = time.time()
+        self.streams[key] = stream
+        return stream
+
+    def _derive(self, base: CandleStream, timeframe) -> CandleStream:
+        arrays = base.buffer.arrays()
+        capacity = (
+            base.buffer.capacity
+            * timeframe_to_ms(base.timeframe)
+            // timeframe_to_ms(timeframe)
+            + 1
+        )
+        buffer = CandleRingBuffer(max(capacity, self.min_capacity))
+        buffer.extend(resample(arrays, timeframe))
+        stream = CandleStream(base.symbol, timeframe, buffer, base)
+        base.derived.append(stream)
+        # seed with the candles of the last two periods
+        resampler = stream.resampler
+        since = resampler.period(int(arrays["date"][-1])) - resampler.timeframe_ms
+        self._resample(stream, since)
+        return stream
+
+    def _resample(self, stream: CandleStream, since):
+        dates = stream.base.buffer.dates()
+        start = int(np.searchsorted(dates, since, "left"))
+        candles = np.column_stack(
+            [dates[start:], stream.base.buffer.values()[start:]]
+        ).tolist()
+        for candle in stream.resampler.update(candles):
+            stream.buffer.update(candle)
+
+    def _apply(self, stream: CandleStream, candles):
+        with self.lock:
+            for candle in candles:
+                stream.buffer.update(candle)
+            stream.updated = time.time()
+            base_ms = timeframe_to_ms(stream.timeframe)
+            for derived in stream.derived:
+                # the last seen candle may have been revised
+                self._resample(derived, derived.resampler.last_date - base_ms)
+        self.event.set()
+
+    def _missed(self, stream: CandleStream) -> int:
+        """
+        :return: number of bars after the last candle in the window
+        """
+        last_date = stream.buffer.last_date()
+        if last_date is None:
+            return stream.buffer.capacity
+        now = self.ex.exchange.milliseconds()
+        return int((now - last_date) // timeframe_to_ms(stream.timeframe))
+
+    def _poll(self, stream: CandleStream):
+        missed = self._missed(stream)
+        if missed > 1:
+            # 循环停顿超过一根蜡烛图时，从最后一根蜡烛图开始补齐缺失的蜡烛图
+            timeframe_ms = timeframe_to_ms(stream.timeframe)
+            last_date = stream.buffer.last_date() or 0
+            since = max(
+                last_date,
+                self.ex.exchange.milliseconds() - stream.buffer.capacity * timeframe_ms,
+            )
+            logger.info(
+                f"catch up {missed} candles {stream.symbol} {stream.timeframe} since {since}"
+            )
+            last_candles = self.ex.get_all_candles(
+                stream.symbol, stream.timeframe, since=since
+            )
+        else:
+            # 只获取最新的蜡烛图，会导致最终的蜡烛图没更新到最新就切换到下一个蜡烛图了，造成数据不准确
+            # 所以获取最后两根蜡烛图去修复上一根蜡烛图的数据
+            last_candles = self.ex.get_candles(stream.symbol, stream.timeframe, None, 2)
+        # 添加新的蜡烛图后，需要把上一根蜡烛图的数据修复
+        self._apply(stream, last_candles)
+
+    def push(self, symbol, timeframe, candle):
+        """
+        apply a candle pushed by the exchange, bars missed between the last
+        candle and the pushed one are caught up over REST in a worker thread,
+        so the websocket event loop is not blocked, and the pushes of the
+        stream are applied after the catch up
+        :param candle: [timestamp, open, high, low, close, volume]
+        """
+        stream = self.streams.get((symbol, timeframe))
+        if stream is None or stream.base is not None:
+            return
+        with self.lock:
+            if stream.pending is not None:
+                stream.pending.append(candle)
+                return
+            last_date = stream.buffer.last_date()
+            if last_date is None or candle[0] - last_date <= timeframe_to_ms(timeframe):
+                self._apply(stream, [candle])
+                return
+            logger.info(f"candle gap {symbol} {timeframe}, fetch the missed candles")
+            stream.pending = [candle]
+            if self.catch_up is None:
+                self.catch_up = ThreadPoolExecutor(max_workers=1)
+            self.catch_up.submit(self._catch_up, stream)
+
+    def _catch_up(self, stream: CandleStream):
+        try:
+            self._poll(stream)
+        except Exception as e:
+            logger.exception(f"catch up {stream.symbol} {stream.timeframe}: {e}")
+        with self.lock:
+            candles, stream.pending = stream.pending, None
+            self._apply(stream, candles)
+
+    def resync(self):
+        """
+        poll all the streaming streams, after the candle stream reconnects
+        """
+        self.refresh([s for s in self.streams.values() if s.streaming])
+
+    def watch(self, pairs, **kwargs):
+        """
+        stream the candles of the pairs from the exchange websocket
+        :param pairs: [(symbol, timeframe), ...], the streams are created with the defaults if missing
+        :param kwargs: options of the exchange candle stream
+        """
+        for symbol, timeframe in pairs:
+            stream = self.stream(symbol, timeframe)
+            # derived streams follow their base stream
+            (stream.base or stream).streaming = True
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.watcher = self.ex.watch_candles(
+            [(s.symbol, s.timeframe) for s in self.streams.values() if s.streaming],
+            self.push,
+            self.resync,
+            **kwargs,
+        )
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        if self.catch_up is not None:
+            self.catch_up.shutdown()
+            self.catch_up = None
+
+    def wait(self, timeout=None) -> bool:
+        """
+        wait for a pushed or polled update
+        :return: False on timeout
+        """
+        updated = self.event.wait(timeout)
+        self.event.clear()
+        return updated
+
+    def due(self, now=None) -> List[CandleStream]:
+        now = time.time() if now is None else now
+        return [
+            s
+            for s in self.streams.values()
+            if s.base is None
+            # streaming streams are only polled when the pushes stop
+            and round(now - s.updated) >= self.interval * (3 if s.streaming else 1)
+        ]
+
+    def refresh(self, streams=None):
+        """
+        update the given streams, or all the streams which are due
+        """
+        streams = self.due() if streams is None else streams
+        if len(streams) == 0:
+            return
+        logger.debug(f"update candles: {[(s.symbol, s.timeframe) for s in streams]}")
+        with ThreadPoolExecutor(
+            max_workers=min(self.workers, len(streams))
+        ) as executor:
+            futures = {executor.submit(self._poll, s): s for s in streams}
+        for future, s in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                logger.exception(f"update candles {s.symbol} {s.timeframe}: {e}")
+
+    def get_buffer(
+        self, symbol, timeframe, days=7, base_timeframe=None, capacity=None
+    ) -> CandleRingBuffer:
+        stream = self.stream(symbol, timeframe, days, base_timeframe, capacity)
+        self.refresh()
+        return stream.buffer
+
+    def get_frame(
+        self, symbol, timeframe, days=7, base_timeframe=None, capacity=None, live=False
+    ) -> pd.DataFrame:
+        """
+        :param capacity: live window size of a new stream
+        :param live: tag the frame with its symbol and timeframe, the strategies keep
+            the indicator state of tagged frames and compute only the new candles,
+            the backtests use untagged frames and the batch computation
+        :return: dataframe of the live candle window, the ohlcv columns are read-only
+        """
+        buffer = self.get_buffer(symbol, timeframe, days, base_timeframe, capacity)
+        with self.lock:
+            # copy when the buffer can be updated by the websocket thread
+            frame = buffer.to_frame(copy=self.watcher is not None)
+        if live:
+            frame.attrs.update(symbol=symbol, timeframe=timeframe)
+        return frame
+
+    def last_update(self, symbol, timeframe) -> float:
+        stream = self.streams.get((symbol, timeframe))
+        return stream.last_update() if stream is not None else 0.0
+
+    def staleness(self, symbol, timeframe, now=None) -> float:
+        stream = self.streams.get((symbol, timeframe))
+        return stream.staleness(now) if stream is not None else float("inf")
+
+
+def offline_frame(
+    exchange_id, symbol, timeframe, start, end, base_timeframe=None, rootpath=None
+) -> pd.DataFrame:
+    """
+    dataframe of the [start, end) candles in the local store, without the exchange
+    :param base_timeframe: build the timeframe from the base timeframe candles
+    :raise ValueError: the store has not downloaded the whole range
+    """
+    if base_timeframe is not None and base_timeframe != timeframe:
+        # start at a period boundary, the first candle is complete
+        timeframe_ms = timeframe_to_ms(timeframe)
+        start = start // timeframe_ms * timeframe_ms
+        arrays = read_candles(exchange_id, symbol, base_timeframe, start, end, rootpath)
+        arrays = resample(arrays, timeframe)
+    else:
+        arrays = read_candles(exchange_id, symbol, timeframe, start, end, rootpath)
+    index = pd.to_datetime(arrays["date"], unit="ms", utc=True).tz_convert(
+        "Asia/Shanghai"
+    )
+    return pd.DataFrame(
+        np.column_stack([arrays[c] for c in OHLCV]),
+        index=index.rename("date"),
+        columns=OHLCV,
+    )
@@ -0,0 +1,342 @@
+from collections import deque
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+NAN = float("nan")
+
+# the last bars which can be revised, the live feed polls the last 2 candles again
+REVISABLE_BARS = 2
+
+
+class Indicator:
+    """
+    Incremental indicator, the bars are updated in date order and a bar with
+    the date of the last one revises it, so the live candle can be updated on
+    every tick in O(1). A bar with the date of one of the last REVISABLE_BARS
+    bars rolls the indicator back to it, the bars after it must be updated again.
+    The outputs match the talib/pandas batch computation over the same bars.
+    """
+
+    def __init__(self):
+        self.date = None
+        # state before and after the last bar
+        self._state = self.initial()
+        self._last = self._state
+        # (date, state before the bar) of the last revisable bars
+        self._history = deque(maxlen=REVISABLE_BARS)
+
+    def initial(self):
+        return None
+
+    def step(self, state, *values) -> Tuple:
+        """
+        :return: (state, output)
+        """
+        raise NotImplementedError
+
+    def rollback(self, date):
+        """
+        forget the bars from the date, it is updated as a new bar
+        """
+        while len(self._history) > 0 and self._history[-1][0] > date:
+            self._history.pop()
+        if len(self._history) == 0 or self._history[-1][0] != date:
+            raise ValueError(f"Bar {date} is older than the revisable bars")
+        _, self._last = self._history.pop()
+        self.date = self._history[-1][0] if len(self._history) > 0 else None
+
+    def update(self, date, *values):
+        """
+        :param date: bar date, the last date revises the last bar
+        :return: indicator output of the bar, nan during the warmup
+        """
+        if self.date is not None and date < self.date:
+            self.rollback(date)
+        if date != self.date:
+            self._state = self._last
+            self.date = date
+            self._history.append((date, self._state))
+        self._last, output = self.step(self._state, *values)
+        return output
+
+
+def ema_step(state, value, period, k):
+    """
+    talib EMA, seeded with the SMA of the first period values
+    :param state: (count, sum or ema)
+    """
+    count, prev = state
+    count += 1
+    if count < period:
+        return (count, prev + value), NAN
+    if count == period:
+        prev = (prev + value) / period
+        return (count, prev), prev
+    prev = ((value - prev) * k) + prev
+    return (count, prev), prev
+
+
+class EMA(Indicator):
+    def __init__(self, period):
+        self.period = period
+        self.k = 2.0 / (period + 1)
+        super().__init__()
+
+    def initial(self):
+        return (0, 0.0)
+
+    def step(self, state, value):
+        return ema_step(state, value, self.period, self.k)
+
+
+class MACD(Indicator):
+    """
+    talib MACD, the fast EMA is seeded at the same bar as the slow EMA
+    :return: (macd, signal, hist)
+    """
+
+    def __init__(self, fast_period=12, slow_period=26, signal_period=9):
+        self.fast_period = fast_period
+        self.slow_period = slow_period
+        self.signal_period = signal_period
+        super().__init__()
+
+    def initial(self):
+        return (0, (0, 0.0), (0, 0.0), (0, 0.0))
+
+    def step(self, state, value):
+        count, fast, slow, signal = state
+        count += 1
+        if count > self.slow_period - self.fast_period:
+            fast, fast_ema = ema_step(
+                fast, value, self.fast_period, 2.0 / (self.fast_period + 1)
+            )
+        slow, slow_ema = ema_step(
+            slow, value, self.slow_period, 2.0 / (self.slow_period + 1)
+        )
+        if count < self.slow_period:
+            return (count, fast, slow, signal), (NAN, NAN, NAN)
+        macd = fast_ema - slow_ema
+        signal, signal_ema = ema_step(
+            signal, macd, self.signal_period, 2.0 / (self.signal_period + 1)
+        )
+        state = (count, fast, slow, signal)
+        if count < self.slow_period + self.signal_period - 1:
+            return state, (NAN, NAN, NAN)
+        return state, (macd, signal_ema, macd - signal_ema)
+
+
+class ATR(Indicator):
+    """
+    talib ATR, Wilder's smoothing of the true range
+    """
+
+    def __init__(self, period=14):
+        self.period = period
+        super().__init__()
+
+    def initial(self):
+        # (count, previous close, sum or atr)
+        return (0, None, 0.0)
+
+    def step(self, state, high, low, close):
+        count, prev_close, prev = state
+        count += 1
+        if prev_close is None:
+            return (count, close, prev), NAN
+        tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        if count <= self.period:
+            return (count, close, prev + tr), NAN
+        if count == self.period + 1:
+            # the first atr is the mean of the first period true ranges
+            prev = (prev + tr) / self.period
+        else:
+            prev = (prev * (self.period - 1) + tr) / self.period
+        return (count, close, prev), prev
+
+
+class HeikinAshi(Indicator):
+    """
+    :return: (open, high, low, close)
+    """
+
+    def step(self, state, open, high, low, close):
+        ha_close = (open + high + low + close) / 4
+        if state is None:
+            ha_open = (open + close) / 2
+        else:
+            ha_open = (state[0] + state[1]) / 2
+        ha_high = max(high, ha_open, ha_close)
+        ha_low = min(low, ha_open, ha_close)
+        return (ha_open, ha_close), (ha_open, ha_high, ha_low, ha_close)
+
+
+class RollingMax:
+    """
+    Rolling max of the last window bars, the committed bars are kept in a
+    monotonic deque and the last bar is pending until a newer bar arrives.
+    The values of the last window + REVISABLE_BARS bars are kept to roll back.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.date = None
+        self.count = 0
+        self.pending = None
+        # (index, value), values are decreasing
+        self.queue = deque()
+        # (date, value) of the last bars
+        self.values = deque(maxlen=window + REVISABLE_BARS)
+
+    def better(self, a, b) -> bool:
+        return a >= b
+
+    def rollback(self, date):
+        """
+        forget the bars from the date, the monotonic deque is built again from the kept values
+        """
+        dropped = 0
+        while len(self.values) > 0 and self.values[-1][0] >= date:
+            self.values.pop()
+            dropped += 1
+        if dropped == 0 or dropped > REVISABLE_BARS:
+            raise ValueError(f"Bar {date} is older than the revisable bars")
+        self.count -= dropped
+        self.queue.clear()
+        if len(self.values) == 0:
+            self.date, self.pending = None, None
+            return
+        self.date, self.pending = self.values[-1]
+        first = self.count - len(self.values)
+        for i, (_, value) in enumerate(list(self.values)[:-1]):
+            if first + i < self.count - self.window:
+                continue
+            while len(self.queue) > 0 and self.better(value, self.queue[-1][1]):
+                self.queue.pop()
+            self.queue.append((first + i, value))
+
+    def update(self, date, value):
+        if self.date is not None and date < self.date:
+            self.rollback(date)
+        if date != self.date:
+            if self.date is not None:
+                while len(self.queue) > 0 and self.better(
+                    self.pending, self.queue[-1][1]
+                ):
+                    self.queue.pop()
+                self.queue.append((self.count - 1, self.pending))
+            self.count += 1
+            self.date = date
+            while (
+                len(self.queue) > 0 and self.queue[0][0] <= self.count - 1 - self.window
+            ):
+                self.queue.popleft()
+            self.values.append((date, value))
+        else:
+            self.values[-1] = (date, value)
+        self.pending = value
+        if self.count < self.window:
+            return NAN
+        if len(self.queue) > 0 and self.better(self.queue[0][1], value):
+            return self.queue[0][1]
+        return value
+
+
+class RollingMin(RollingMax):
+    def better(self, a, b) -> bool:
+        return a <= b
+
+
+class IndicatorSeries:
+    """
+    Indicator values of a live candle window, only the new bars and the
+    revised bars of each frame are computed, a revision of one of the last
+    REVISABLE_BARS bars recomputes the bars from it.
+    """
+
+    def __init__(self, columns: Dict[Union[str, Tuple], Tuple[object, List[str]]]):
+        """
+        :param columns: output name(s) -> (indicator, input columns),
+            eg. {("dif", "dea", "macd"): (MACD(12, 26, 9), ["close"])}
+        """
+        self.columns = columns
+        self.names = []
+        for names in columns:
+            self.names.extend([names] if isinstance(names, str) else names)
+        self.inputs = list(
+            dict.fromkeys(c for _, inputs in columns.values() for c in inputs)
+        )
+        self.capacity = 0
+        self.length = 0
+        self._dates = np.zeros(0, dtype=np.int64)
+        self._values = np.zeros((0, len(self.names)))
+        # input values of the computed bars, to find the revised ones
+        self._inputs = np.zeros((0, len(self.inputs)))
+
+    def _reserve(self, count):
+        if self.length + count <= len(self._dates):
+            return
+        # keep the last capacity rows, compacted to the front
+        keep = min(self.length, self.capacity)
+        size = 2 * max(self.capacity, keep + count)
+        dates = np.zeros(size, dtype=np.int64)
+        values = np.zeros((size, len(self.names)))
+        inputs = np.zeros((size, len(self.inputs)))
+        dates[:keep] = self._dates[self.length - keep : self.length]
+        values[:keep] = self._values[self.length - keep : self.length]
+        inputs[:keep] = self._inputs[self.length - keep : self.length]
+        self._dates, self._values, self._inputs = dates, values, inputs
+        self.length = keep
+
+    def update(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        :param df: candles indexed by date, the computed bars are only computed
+            again from the first of the last REVISABLE_BARS bars whose inputs changed
+        :return: output name -> values aligned to the rows of df
+        """
+        dates = df.index.as_unit("ms").asi8
+        self.capacity = max(self.capacity, len(dates))
+        columns = {c: df[c].values for c in self.inputs}
+        start = 0
+        if self.length > 0:
+            start = int(np.searchsorted(dates, self._dates[self.length - 1], "right"))
+            for row in range(max(self.length - REVISABLE_BARS, 0), self.length):
+                i = int(np.searchsorted(dates, self._dates[row], "left"))
+                if i == len(dates) or dates[i] != self._dates[row]:
+                    continue
+                inputs = [columns[c][i] for c in self.inputs]
+                if not np.array_equal(inputs, self._inputs[row], equal_nan=True):
+                    # the bars from the revised bar are computed again
+                    start = i
+                    self.length = row
+                    break
+        self._reserve(len(dates) - start)
+        for i in range(start, len(dates)):
+            row = []
+            for indicator, inputs in self.columns.values():
+                output = indicator.update(dates[i], *[columns[c][i] for c in inputs])
+                row.extend(output if isinstance(output, tuple) else [output])
+            self._dates[self.length] = dates[i]
+            self._values[self.length] = row
+            self._inputs[self.length] = [columns[c][i] for c in self.inputs]
+            self.length += 1
+        return self._align(dates)
+
+    def _align(self, dates) -> Dict[str, np.ndarray]:
+        history = self._dates[: self.length]
+        n = len(dates)
+        if (
+            n <= self.length
+            and history[self.length - n] == dates[0]
+            and history[-1] == dates[-1]
+        ):
+            values = self._values[self.length - n : self.length].copy()
+        else:
+            index = np.searchsorted(history, dates).clip(max=max(self.length - 1, 0))
+            values = np.full((n, len(self.names)), np.nan)
+            if self.length > 0:
+                found = history[index] == dates
+                values[found] = self._values[index[found]]
+        return {name: values[:, i] for i, name in enumerate(self.names)}
@@ -0,0 +1,195 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+NAN = float("nan")
+
+# the heikin ashi open halves the older bars, 0.5**64 is under the float precision
+HEIKINASHI_DECAY_BARS = 64
+
+
+def _output(out: Optional[np.ndarray], n, dtype=np.float64) -> np.ndarray:
+    if out is None:
+        return np.empty(n, dtype=dtype)
+    if len(out) != n:
+        raise ValueError(f"Invalid output size: {len(out)}, expected {n}")
+    return out
+
+
+def heikinashi(
+    open: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    out: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    heikin ashi candles, same as qtpylib.heikinashi
+    ha_open[i] = (ha_open[i - 1] + ha_close[i - 1]) / 2 is computed as a
+    convolution of the ha_close with the weights 1/2, 1/4, 1/8 ...
+    :param out: (open, high, low, close) arrays to write into
+    :return: (open, high, low, close)
+    """
+    n = len(close)
+    out = (None,) * 4 if out is None else out
+    ha_open, ha_high, ha_low, ha_close = (_output(o, n) for o in out)
+    if n == 0:
+        return ha_open, ha_high, ha_low, ha_close
+    np.add(open, high, out=ha_close)
+    ha_close += low
+    ha_close += close
+    ha_close /= 4
+
+    weights = 0.5 ** np.arange(HEIKINASHI_DECAY_BARS + 1)
+    weights[0] = 0.0
+    ha_open[:] = np.convolve(ha_close, weights)[:n]
+    # the first ha_open, halved on every bar
+    first = (open[0] + close[0]) / 2
+    bars = min(n, HEIKINASHI_DECAY_BARS + 1)
+    ha_open[:bars] += first * 0.5 ** np.arange(bars)
+
+    np.maximum(high, ha_open, out=ha_high)
+    np.maximum(ha_high, ha_close, out=ha_high)
+    np.minimum(low, ha_open, out=ha_low)
+    np.minimum(ha_low, ha_close, out=ha_low)
+    return ha_open, ha_high, ha_low, ha_close
+
+
+def crossed_above(
+    series1: np.ndarray, series2, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    same as qtpylib.crossed_above, series1 > series2 and series1 <= series2 on the bar before
+    :param series2: array or number
+    """
+    return _crossed(series1, series2, np.greater, np.less_equal, out)
+
+
+def crossed_below(
+    series1: np.ndarray, series2, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    same as qtpylib.crossed_below, series1 < series2 and series1 >= series2 on the bar before
+    :param series2: array or number
+    """
+    return _crossed(series1, series2, np.less, np.greater_equal, out)
+
+
+def _crossed(series1, series2, now, before, out) -> np.ndarray:
+    series1 = np.asarray(series1, dtype=np.float64)
+    series2 = np.broadcast_to(np.asarray(series2, dtype=np.float64), series1.shape)
+    n = len(series1)
+    out = _output(out, n, bool)
+    if n == 0:
+        return out
+    out[0] = False
+    now(series1[1:], series2[1:], out=out[1:])
+    out[1:] &= before(series1[:-1], series2[:-1])
+    return out
+
+
+def rolling_max(
+    values: np.ndarray, window, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    same as pd.Series.rolling(window).max(), nan during the warmup
+    """
+    return _rolling(values, window, np.maximum, out)
+
+
+def rolling_min(
+    values: np.ndarray, window, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    same as pd.Series.rolling(window).min(), nan during the warmup
+    """
+    return _rolling(values, window, np.minimum, out)
+
+
+def _rolling(values, window, ufunc, out) -> np.ndarray:
+    """
+    van herk / gil-werman rolling extreme in O(n): the values are split in blocks
+    of the window size, a window is the suffix of a block and the prefix of the next one
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = _output(out, n)
+    warmup = min(window - 1, n)
+    out[:warmup] = NAN
+    if n < window:
+        return out
+    blocks = -(-n // window)
+    padded = np.full(blocks * window, values[-1])
+    padded[:n] = values
+    padded = padded.reshape(blocks, window)
+    prefix = ufunc.accumulate(padded, axis=1).ravel()
+    suffix = ufunc.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+    ufunc(suffix[: n - window + 1], prefix[window - 1 : n], out=out[warmup:])
+    return out
+
+
+def shift(values: np.ndarray, periods, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    same as pd.Series.shift(periods), filled with nan
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = _output(out, n)
+    periods = max(-n, min(n, periods))
+    if periods > 0:
+        out[:periods] = NAN
+        out[periods:] = values[: n - periods]
+    elif periods < 0:
+        out[periods:] = NAN
+        out[:periods] = values[-periods:]
+    else:
+        out[:] = values
+    return out
+
+
+def donchian(high: np.ndarray, low: np.ndarray, window, out=None) -> np.ndarray:
+    """
+    middle of the highest high and the lowest low of the window
+    """
+    out = rolling_max(high, window, out)
+    out += rolling_min(low, window)
+    out /= 2
+    return out
+
+
+def ichimoku(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    conversion_line_period=9,
+    base_line_periods=26,
+    laggin_span=52,
+    displacement=26,
+) -> Dict[str, np.ndarray]:
+    """
+    ichimoku cloud, same outputs and displacement as technical.indicators.ichimoku:
+    the senkou spans are the leading spans shifted by displacement - 1 bars and
+    the chikou span is the close shifted back by displacement - 1 bars, it looks
+    into the future and must not be used by the signals
+    :return: tenkan_sen, kijun_sen, senkou_span_a, senkou_span_b, leading_senkou_span_a,
+        leading_senkou_span_b, chikou_span, cloud_green, cloud_red
+    """
+    tenkan_sen = donchian(high, low, conversion_line_period)
+    kijun_sen = donchian(high, low, base_line_periods)
+    leading_senkou_span_a = tenkan_sen + kijun_sen
+    leading_senkou_span_a /= 2
+    leading_senkou_span_b = donchian(high, low, laggin_span)
+    senkou_span_a = shift(leading_senkou_span_a, displacement - 1)
+    senkou_span_b = shift(leading_senkou_span_b, displacement - 1)
+    return {
+        "tenkan_sen": tenkan_sen,
+        "kijun_sen": kijun_sen,
+        "senkou_span_a": senkou_span_a,
+        "senkou_span_b": senkou_span_b,
+        "leading_senkou_span_a": leading_senkou_span_a,
+        "leading_senkou_span_b": leading_senkou_span_b,
+        "chikou_span": shift(close, -displacement + 1),
+        # comparisons with nan are False
+        "cloud_green": senkou_span_a > senkou_span_b,
+        "cloud_red": senkou_span_b > senkou_span_a,
+    }
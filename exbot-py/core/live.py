@@ -0,0 +1,42 @@
+from core.feed import LiveCandleFeed
+
+# live candle window size, None keeps the candles loaded at startup
+chart_capacity = None
+# display size in fig
+chart_display_size = 200
+data_update_interval = 10
+live_feed = None
+
+
+def get_feed(ex) -> LiveCandleFeed:
+    global live_feed
+    if live_feed is None or live_feed.ex is not ex:
+        live_feed = LiveCandleFeed(
+            ex, data_update_interval, chart_capacity, chart_display_size
+        )
+    live_feed.interval = data_update_interval
+    return live_feed
+
+
+def get_chart(ex, symbol, timeframe, days=7, capacity=None):
+    get_feed(ex).stream(symbol, timeframe, days, capacity=capacity)
+
+
+def last_update(symbol, timeframe) -> float:
+    if live_feed is None:
+        return 0.0
+    return live_feed.last_update(symbol, timeframe)
+
+
+def get_charting(
+    ex, symbol, timeframe, days=7, base_timeframe=None, capacity=None, live=False
+):
+    """
+    :param base_timeframe: build the timeframe from the base timeframe candles
+    :param capacity: live window size, see chart_capacity
+    :param live: frame of a live strategy, see LiveCandleFeed.get_frame
+    :return: dataframe of the live candle window, the ohlcv columns are read-only
+    """
+    return get_feed(ex).get_frame(
+        symbol, timeframe, days, base_timeframe, capacity, live
+    )
@@ -0,0 +1,158 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import talib
+
+from core.backtest import backtest_signals
+from strategies.macd import macd as macd_strategy
+
+
+def ema_batch(values: np.ndarray, periods, starts) -> np.ndarray:
+    """
+    talib EMA of many periods, one talib call per row
+    :param values: (bars,) or (rows, bars) inputs
+    :param periods: ema period of every row
+    :param starts: first bar of every row, the ema is seeded with the SMA of the period bars from it
+    :return: (rows, bars), nan before the seed bar
+    """
+    periods = np.asarray(periods)
+    starts = np.asarray(starts)
+    rows = len(periods)
+    values = np.broadcast_to(values, (rows, values.shape[-1]))
+    bars = values.shape[1]
+    out = np.full((rows, bars), np.nan)
+    for row in range(rows):
+        start, period = int(starts[row]), int(periods[row])
+        if start + period <= bars:
+            out[row, start:] = talib.EMA(
+                np.ascontiguousarray(values[row, start:], dtype=np.float64), period
+            )
+    return out
+
+
+def macd_emas(
+    close: np.ndarray, params: List[Tuple[int, int, int]]
+) -> Tuple[np.ndarray, Dict[Tuple[int, int], int]]:
+    """
+    fast and slow EMAs of the params, the EMAs of the same span and seed bar are computed once
+    :param params: (fast, slow, signal) with fast <= slow
+    :return: (emas, (span, seed bar) -> row of emas)
+    """
+    # the fast EMA is seeded at the same bar as the slow EMA
+    spans = sorted({(f, s - f) for f, s, _ in params} | {(s, 0) for _, s, _ in params})
+    emas = ema_batch(close, [p for p, _ in spans], [st for _, st in spans])
+    return emas, {span: i for i, span in enumerate(spans)}
+
+
+def _macd_rows(emas, rows, params) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :return: (macd, signal) of the params, each (params, bars)
+    """
+    bars = emas.shape[1]
+    macd = np.empty((len(params), bars))
+    signal = np.empty((len(params), bars))
+    for i, (f, s, g) in enumerate(params):
+        np.subtract(emas[rows[(f, s - f)]], emas[rows[(s, 0)]], out=macd[i])
+        start = s - 1
+        if start + g <= bars:
+            signal[i, :start] = np.nan
+            signal[i, start:] = talib.EMA(macd[i, start:], g)
+        else:
+            signal[i] = np.nan
+        # talib outputs start at the first signal bar
+        macd[i, : start + g - 1] = np.nan
+    return macd, signal
+
+
+def _swap_periods(params) -> List[Tuple[int, int, int]]:
+    # talib swaps the periods when fast > slow
+    return [(min(f, s), max(f, s), g) for f, s, g in params]
+
+
+def macd_batch(
+    close: np.ndarray, params: List[Tuple[int, int, int]]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    talib MACD of many (fast, slow, signal) periods, the EMAs of the same
+    span and seed bar are computed once
+    :return: (macd, signal, hist), each (params, bars)
+    """
+    close = np.asarray(close, dtype=np.float64)
+    params = _swap_periods(params)
+    emas, rows = macd_emas(close, params)
+    macd, signal = _macd_rows(emas, rows, params)
+    return macd, signal, macd - signal
+
+
+def macd_signals(
+    close: np.ndarray,
+    params: List[Tuple[int, int, int]],
+    condition_dea: Optional[bool] = None,
+    chunk=2,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    buy and sell signals of the macd strategy for every params, for closed candles
+    :param condition_dea: buy below and sell above the zero line, CONDITION_DEA by default
+    :param chunk: params computed together, the arrays of a small chunk stay in the cpu cache
+    :return: (buy, sell) bool arrays, each (params, bars)
+    """
+    if condition_dea is None:
+        condition_dea = os.getenv("CONDITION_DEA", "false") == "true"
+    close = np.asarray(close, dtype=np.float64)
+    params = _swap_periods(params)
+    emas, rows = macd_emas(close, params)
+    buy = np.zeros((len(params), len(close)), dtype=bool)
+    sell = np.zeros((len(params), len(close)), dtype=bool)
+    for lo in range(0, len(params), chunk):
+        dif, dea = _macd_rows(emas, rows, params[lo : lo + chunk])
+        np.around(dif, decimals=6, out=dif)
+        np.around(dea, decimals=6, out=dea)
+        # crosses from the previous bar, comparisons with nan are False
+        now, before = dif[:, 1:], dea[:, 1:]
+        prev_dif, prev_dea = dif[:, :-1], dea[:, :-1]
+        b, s = buy[lo : lo + chunk, 1:], sell[lo : lo + chunk, 1:]
+        np.greater(now, before, out=b)
+        b &= prev_dif < prev_dea
+        np.less(now, before, out=s)
+        s &= prev_dif > prev_dea
+        if condition_dea:
+            b &= before < 0
+            s &= before > 0
+    return buy, sell
+
+
+def macd_grid(
+    df: pd.DataFrame,
+    trials: List[Dict],
+    reversals=False,
+    uamount=6,
+    uamount_max=6,
+) -> pd.DataFrame:
+    """
+    backtest the macd strategy with every fast_period, slow_period and signal_period
+    of the trials, the signals of all the trials are computed in one pass
+    :return: results ranked by total profit
+    """
+    defaults = macd_strategy.buy_params
+    params = [
+        tuple(
+            int(trial.get(name, defaults[name]))
+            for name in ["fast_period", "slow_period", "signal_period"]
+        )
+        for trial in trials
+    ]
+    close = df["close"].values.astype(np.float64)
+    buy, sell = macd_signals(close, params)
+    results = []
+    for i, trial in enumerate(trials):
+        result = backtest_signals(
+            df.index, close, buy[i], sell[i], reversals, uamount, uamount_max
+        )
+        results.append({**trial, **result.summary()})
+    return (
+        pd.DataFrame(results)
+        .sort_values("total_profit", ascending=False)
+        .reset_index(drop=True)
+    )
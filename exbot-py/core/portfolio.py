@@ -0,0 +1,228 @@
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.backtest import TRADE_COLUMNS, cal_profit, equity_curve
+from core.logger import logger
+from strategies.manager import create_strategy
+
+SIDES = {"buy": 1, "sell": -1, None: 0}
+
+
+class PortfolioResult:
+    def __init__(
+        self,
+        trades: pd.DataFrame,
+        equity: pd.DataFrame,
+        symbols: Dict[str, Dict],
+        capital,
+    ):
+        """
+        :param trades: open, add and close trades of every symbol, in time order
+        :param equity: total profit of every symbol and the total column, by date
+        :param symbols: symbol -> total profit, total fee, skipped signals and the open position
+        """
+        self.trades = trades
+        self.equity = equity
+        self.symbols = symbols
+        self.capital = capital
+
+    @property
+    def total_profit(self):
+        return sum(s["total_profit"] for s in self.symbols.values())
+
+    def summary(self) -> pd.DataFrame:
+        """
+        :return: a row per symbol and the total row
+        """
+        rows = {}
+        for symbol, stats in self.symbols.items():
+            closes = self.trades[
+                (self.trades["symbol"] == symbol) & (self.trades["action"] == "close")
+            ]
+            equity = self.equity[symbol]
+            rows[symbol] = {
+                **stats,
+                "trades": len(closes),
+                "win_rate": (
+                    (closes["profit"] > 0).mean() if len(closes) > 0 else np.nan
+                ),
+                "max_drawdown": max_drawdown(equity),
+            }
+        summary = pd.DataFrame.from_dict(rows, orient="index")
+        summary.loc["total"] = summary.drop(columns=["hold_side"]).sum()
+        summary.loc["total", "win_rate"] = np.nan
+        summary.loc["total", "max_drawdown"] = max_drawdown(self.equity["total"])
+        return summary
+
+
+def max_drawdown(equity: pd.Series):
+    drawdown = equity - equity.cummax().clip(lower=0)
+    return max(0.0, -drawdown.min()) if len(drawdown) > 0 else 0.0
+
+
+def symbol_signals(strategy_name, params, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    run the strategy on the candles of a symbol, in a worker process
+    :return: index, close, buy and sell arrays
+    """
+    df = create_strategy(strategy_name, params).run(df, None, Namespace(debug=True))
+    return {
+        "index": df.index,
+        "close": df["close"].values,
+        "buy": df["buy"].notnull().values,
+        "sell": df["sell"].notnull().values,
+    }
+
+
+def portfolio_backtest(
+    frames: Dict[str, pd.DataFrame],
+    strategy_name,
+    params: Optional[Dict] = None,
+    capital=100,
+    reversals=False,
+    uamount=6,
+    uamount_max=6,
+    workers=4,
+) -> PortfolioResult:
+    """
+    run the strategy of every symbol in a process pool, then replay the signals
+    of all the symbols in time order with a shared usdt balance
+    :param frames: symbol -> candles
+    :param capital: usdt balance shared by the symbols
+    """
+    symbols = list(frames)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(symbol_signals, strategy_name, params, frames[symbol])
+            for symbol in symbols
+        ]
+        signals = {symbol: f.result() for symbol, f in zip(symbols, futures)}
+    return portfolio_signals(signals, capital, reversals, uamount, uamount_max)
+
+
+def portfolio_signals(
+    signals: Dict[str, Dict[str, np.ndarray]],
+    capital=100,
+    reversals=False,
+    uamount=6,
+    uamount_max=6,
+) -> PortfolioResult:
+    """
+    backtest_signals of many symbols, a position is opened or added only when
+    the balance (capital plus the realized profit, minus the open position spends)
+    covers uamount, and every position is limited by uamount_max
+    :param signals: symbol -> index, close, buy and sell arrays
+    """
+    symbols = list(signals)
+    rows = {s: np.flatnonzero(v["buy"] | v["sell"]) for s, v in signals.items()}
+    # 所有交易对的信号按时间排序，同一时间按交易对顺序
+    dates = np.concatenate(
+        [signals[s]["index"][rows[s]].as_unit("ms").asi8 for s in symbols]
+    )
+    owners = np.concatenate(
+        [np.full(len(rows[s]), i) for i, s in enumerate(symbols)]
+    ).astype(int)
+    positions = np.concatenate([np.arange(len(rows[s])) for s in symbols]).astype(int)
+    order = np.lexsort((owners, dates))
+
+    hold = {s: [None, 0.0, 0.0] for s in symbols}
+    stats = {
+        s: {"total_profit": 0, "total_fee": 0, "skipped": 0, "skipped_capital": 0}
+        for s in symbols
+    }
+    states = {s: np.zeros((len(rows[s]), 4)) for s in symbols}
+    trades: List[list] = []
+    realized = 0.0
+    spent = 0.0
+
+    def trade(symbol, date, action, side, price, amount, profit=np.nan, fee=np.nan):
+        position = hold[symbol]
+        trades.append(
+            [
+                symbol,
+                date,
+                action,
+                side,
+                price,
+                amount,
+                position[1],
+                position[2],
+                profit,
+                fee,
+                realized,
+            ]
+        )
+
+    for owner, i, date in zip(
+        owners[order].tolist(), positions[order].tolist(), dates[order].tolist()
+    ):
+        symbol = symbols[owner]
+        v = signals[symbol]
+        row = rows[symbol][i]
+        signal = "buy" if v["buy"][row] else "sell"
+        price = float(v["close"][row])
+        per_amount = uamount / price
+        position = hold[symbol]
+        stat = stats[symbol]
+        if position[0] is not None and signal != position[0]:
+            side, spend, amount = position
+            profit, fee = cal_profit(side, spend, amount, price)
+            stat["total_profit"] += profit
+            stat["total_fee"] += fee
+            realized += profit
+            spent -= spend
+            trade(symbol, date, "close", side, price, amount, profit, fee)
+            position[:] = [None, 0.0, 0.0]
+            # 反向开仓
+            opening = reversals
+        elif position[0] is not None and position[1] >= uamount_max:
+            # uamount max limit
+            stat["skipped"] += 1
+            opening = False
+        else:
+            opening = True
+        if opening:
+            # 共享资金不足
+            if capital + realized - spent < uamount:
+                stat["skipped_capital"] += 1
+            else:
+                action = "open" if position[0] is None else "add"
+                position[0] = signal
+                position[1] += price * per_amount
+                position[2] += per_amount
+                spent += price * per_amount
+                trade(symbol, date, action, signal, price, per_amount)
+        states[symbol][i] = [
+            SIDES[position[0]],
+            position[1],
+            position[2],
+            stat["total_profit"],
+        ]
+
+    curves = {}
+    for symbol in symbols:
+        v = signals[symbol]
+        side, spend, amount = hold[symbol]
+        stats[symbol]["hold_side"] = side
+        stats[symbol]["unsettled_profit"] = (
+            cal_profit(side, spend, amount, v["close"][-1])[0]
+            if side is not None
+            else 0
+        )
+        curves[symbol] = pd.Series(
+            equity_curve(v["close"], rows[symbol], states[symbol]), index=v["index"]
+        )
+    equity = pd.DataFrame(curves).sort_index().ffill().fillna(0.0)
+    equity["total"] = equity.sum(axis=1)
+    equity.index.name = "date"
+
+    trades = pd.DataFrame(trades, columns=["symbol"] + TRADE_COLUMNS)
+    tz = signals[symbols[0]]["index"].tz if len(symbols) > 0 else None
+    trade_dates = pd.to_datetime(trades["date"].values, unit="ms", utc=True)
+    trades["date"] = trade_dates.tz_convert(tz) if tz else trade_dates.tz_localize(None)
+    logger.debug(f"portfolio trades:\n{trades}")
+    return PortfolioResult(trades, equity, stats, capital)
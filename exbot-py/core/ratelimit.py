@@ -0,0 +1,21 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread safe limiter, spaces the calls at least interval seconds apart.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait > 0:
+            time.sleep(wait)
@@ -0,0 +1,115 @@
+import os
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from core.backtest import BacktestResult
+
+YEAR_SECONDS = 365 * 24 * 60 * 60
+
+
+def report_metrics(result: BacktestResult) -> Dict:
+    """
+    performance metrics of a backtest, from the trade ledger and the candle
+    equity and position curves
+    :return: metric name -> value, the profits are in usdt
+    """
+    trades = result.trades
+    closes = trades[~trades["action"].isin(["open", "add"])]
+    profits = closes["profit"].values.astype(np.float64)
+    wins = profits[profits > 0]
+    losses = profits[profits <= 0]
+
+    equity = result.equity.values
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0)) if len(equity) > 0 else equity
+    drawdown = peak - equity
+    # the longest run of candles under the peak
+    under = drawdown > 0
+    runs = np.flatnonzero(np.diff(np.r_[0, under.astype(np.int8), 0]))
+    drawdown_bars = int((runs[1::2] - runs[::2]).max()) if len(runs) > 0 else 0
+
+    # per candle profits, the sharpe ratio is annualized by the candle timeframe
+    pnl = np.diff(equity, prepend=0.0)
+    index = result.equity.index
+    bar_seconds = (
+        np.median(np.diff(index.as_unit("s").asi8)) if len(index) > 1 else np.nan
+    )
+    periods = np.sqrt(YEAR_SECONDS / bar_seconds) if bar_seconds > 0 else np.nan
+    std = pnl.std()
+    downside = np.sqrt(np.mean(np.minimum(pnl, 0.0) ** 2)) if len(pnl) > 0 else 0.0
+
+    position = result.position.values if result.position is not None else np.zeros(0)
+    return {
+        "start": index[0] if len(index) > 0 else pd.NaT,
+        "end": index[-1] if len(index) > 0 else pd.NaT,
+        "candles": len(index),
+        "total_profit": result.total_profit,
+        "total_fee": result.total_fee,
+        "unsettled_profit": result.unsettled_profit,
+        "trades": len(profits),
+        "skipped": result.skipped,
+        "win_rate": len(wins) / len(profits) if len(profits) > 0 else np.nan,
+        "avg_win": wins.mean() if len(wins) > 0 else np.nan,
+        "avg_loss": losses.mean() if len(losses) > 0 else np.nan,
+        "profit_factor": profit_factor(wins, losses),
+        "expectancy": profits.mean() if len(profits) > 0 else np.nan,
+        "max_drawdown": float(drawdown.max()) if len(drawdown) > 0 else 0.0,
+        "max_drawdown_candles": drawdown_bars,
+        "sharpe": pnl.mean() / std * periods if std > 0 else np.nan,
+        "sortino": pnl.mean() / downside * periods if downside > 0 else np.nan,
+        "exposure": (position != 0).mean() if len(position) > 0 else 0.0,
+        "long_exposure": (position > 0).mean() if len(position) > 0 else 0.0,
+        "short_exposure": (position < 0).mean() if len(position) > 0 else 0.0,
+    }
+
+
+def profit_factor(wins: np.ndarray, losses: np.ndarray) -> float:
+    """
+    gross profit / gross loss, inf without a loss and nan without a trade
+    """
+    if len(wins) + len(losses) == 0:
+        return np.nan
+    loss = -losses.sum()
+    if loss > 0:
+        return wins.sum() / loss
+    # only the break even trades: no profit
+    return np.inf if wins.sum() > 0 else 0.0
+
+
+def equity_frame(result: BacktestResult) -> pd.DataFrame:
+    """
+    :return: equity, drawdown and position of every candle
+    """
+    equity = result.equity
+    df = pd.DataFrame({"equity": equity})
+    df["drawdown"] = equity.clip(lower=0).cummax() - equity
+    if result.position is not None:
+        df["position"] = result.position
+    return df
+
+
+def export_report(result: BacktestResult, path, metrics=None, format="parquet"):
+    """
+    write trades, equity and metrics files to the path directory
+    :param format: parquet or arrow (feather)
+    :return: file paths
+    """
+    if format not in ["parquet", "arrow"]:
+        raise ValueError(f"Invalid report format: {format}")
+    metrics = report_metrics(result) if metrics is None else metrics
+    frames = {
+        "trades": result.trades,
+        "equity": equity_frame(result).reset_index(),
+        "metrics": pd.DataFrame([metrics]),
+    }
+    os.makedirs(path, exist_ok=True)
+    paths = []
+    for name, df in frames.items():
+        file = os.path.join(path, f"{name}.{format}")
+        if format == "parquet":
+            df.to_parquet(file, index=False)
+        else:
+            df.reset_index(drop=True).to_feather(file)
+        paths.append(file)
+    return paths
@@ -0,0 +1,93 @@
+from collections import OrderedDict
+from typing import Dict, List
+
+import numpy as np
+
+from core.candle import timeframe_to_ms
+
+
+def resample(arrays, timeframe, offset=0) -> Dict[str, np.ndarray]:
+    """
+    build higher timeframe candles from lower timeframe candles,
+    the last candle is partial if its period is not complete
+    :param arrays: column name -> array, sorted by date
+    :param str timeframe: 5m 15m 30m 1h 4h 1d 1w
+    :param int offset: ms, period alignment from the epoch, eg. 8h for UTC+8 days
+    """
+    timeframe_ms = timeframe_to_ms(timeframe)
+    dates = np.asarray(arrays["date"], dtype=np.int64)
+    if len(dates) == 0:
+        return {c: np.asarray(arrays[c])[:0] for c in arrays}
+    buckets = (dates - offset) // timeframe_ms * timeframe_ms + offset
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(dates)] - 1
+    return {
+        "date": buckets[starts],
+        "open": np.asarray(arrays["open"])[starts],
+        "high": np.maximum.reduceat(arrays["high"], starts),
+        "low": np.minimum.reduceat(arrays["low"], starts),
+        "close": np.asarray(arrays["close"])[ends],
+        "volume": np.add.reduceat(arrays["volume"], starts),
+    }
+
+
+class Resampler:
+    """
+    Incremental resampler, keeps the lower timeframe candles of the last two
+    periods so that the partial candle and a revision of the previous
+    candle can be rebuilt as new lower timeframe candles arrive.
+    """
+
+    def __init__(self, timeframe, offset=0):
+        self.timeframe = timeframe
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.offset = offset
+        # period -> {date: candle}
+        self.periods: OrderedDict = OrderedDict()
+        self.last_date = None
+
+    def period(self, date) -> int:
+        return (
+            date - self.offset
+        ) // self.timeframe_ms * self.timeframe_ms + self.offset
+
+    def _candle(self, period) -> List:
+        rows = [self.periods[period][d] for d in sorted(self.periods[period])]
+        return [
+            period,
+            rows[0][1],
+            max(r[2] for r in rows),
+            min(r[3] for r in rows),
+            rows[-1][4],
+            sum(r[5] for r in rows),
+        ]
+
+    def update(self, candles) -> List[List]:
+        """
+        :param candles: sorted lower timeframe ohlcv rows, new or revised
+        :return: the updated higher timeframe candles, the last one may be partial
+        """
+        updated = []
+        # updated periods which are no longer kept
+        closed = []
+        for candle in candles:
+            date = int(candle[0])
+            period = self.period(date)
+            if len(self.periods) > 0 and period < next(iter(self.periods)):
+                # older than the kept periods
+                continue
+            if period not in self.periods:
+                self.periods[period] = {}
+                while len(self.periods) > 2:
+                    oldest = next(iter(self.periods))
+                    if oldest in updated:
+                        closed.append(self._candle(oldest))
+                        updated.remove(oldest)
+                    self.periods.popitem(last=False)
+            self.periods[period][date] = [date] + [float(x) for x in candle[1:6]]
+            if period not in updated:
+                updated.append(period)
+            self.last_date = (
+                date if self.last_date is None else max(self.last_date, date)
+            )
+        return closed + [self._candle(p) for p in sorted(updated)]
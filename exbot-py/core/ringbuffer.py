@@ -0,0 +1,115 @@
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.logger import logger
+
+OHLCV = ["open", "high", "low", "close", "volume"]
+
+
+class CandleRingBuffer:
+    """
+    Fixed capacity candle window.
+    Every row is written twice, at i and i + capacity, so the rows in the window
+    are always a contiguous slice of the buffer and can be viewed without copying.
+    """
+
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError(f"Invalid capacity: {capacity}")
+        self.capacity = capacity
+        self._dates = np.zeros(2 * capacity, dtype=np.int64)
+        self._values = np.zeros((2 * capacity, len(OHLCV)), dtype=np.float64)
+        # position of the oldest row, in [0, capacity)
+        self._start = 0
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def last_date(self) -> Optional[int]:
+        if self._length == 0:
+            return None
+        return int(self._dates[self._start + self._length - 1])
+
+    def dates(self) -> np.ndarray:
+        view = self._dates[self._start : self._start + self._length]
+        view.flags.writeable = False
+        return view
+
+    def values(self) -> np.ndarray:
+        """
+        :return: read-only (rows, ohlcv) view of the window
+        """
+        view = self._values[self._start : self._start + self._length]
+        view.flags.writeable = False
+        return view
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        values = self.values()
+        arrays = {c: values[:, i] for i, c in enumerate(OHLCV)}
+        arrays["date"] = self.dates()
+        return arrays
+
+    def _write(self, positions, dates, values):
+        for offset in [0, self.capacity]:
+            self._dates[positions + offset] = dates
+            self._values[positions + offset] = values
+
+    def extend(self, arrays):
+        """
+        append candles newer than the last one, the oldest rows are dropped
+        :param arrays: column name -> array, sorted by date
+        """
+        dates = np.asarray(arrays["date"], dtype=np.int64)
+        values = np.column_stack([arrays[c] for c in OHLCV]).astype(np.float64)
+        last_date = self.last_date()
+        if last_date is not None:
+            newer = dates > last_date
+            dates, values = dates[newer], values[newer]
+        dates, values = dates[-self.capacity :], values[-self.capacity :]
+        count = len(dates)
+        if count == 0:
+            return
+        positions = (self._start + self._length + np.arange(count)) % self.capacity
+        self._write(positions, dates, values)
+        overflow = max(0, self._length + count - self.capacity)
+        self._start = (self._start + overflow) % self.capacity
+        self._length = min(self.capacity, self._length + count)
+
+    def update(self, candle):
+        """
+        update a candle in place, or append it if it is newer than the last one
+        :param candle: [timestamp, open, high, low, close, volume]
+        """
+        date = int(candle[0])
+        last_date = self.last_date()
+        if last_date is None or date > last_date:
+            self.extend(
+                {
+                    "date": [date],
+                    **{c: [candle[i + 1]] for i, c in enumerate(OHLCV)},
+                }
+            )
+            return
+        dates = self.dates()
+        index = int(np.searchsorted(dates, date, "left"))
+        if index == len(dates) or dates[index] != date:
+            logger.debug(f"skip candle {date} which is not in the window")
+            return
+        position = np.array([(self._start + index) % self.capacity])
+        self._write(position, date, np.asarray(candle[1:6], dtype=np.float64))
+
+    def to_frame(self, copy=False) -> pd.DataFrame:
+        """
+        :param copy: copy the ohlcv values, for buffers updated from another thread
+        :return: dataframe indexed by date, the ohlcv columns share the buffer memory
+        """
+        index = pd.to_datetime(self.dates(), unit="ms", utc=True).tz_convert(
+            "Asia/Shanghai"
+        )
+        values = self.values().copy() if copy else self.values()
+        return pd.DataFrame(
+            values, index=index.rename("date"), columns=OHLCV, copy=False
+        )
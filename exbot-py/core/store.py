@@ -0,0 +1,217 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from core.logger import logger
+
+COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+DTYPES = {
+    "date": np.dtype("<i8"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+
+
+class CandleStore:
+    """
+    Columnar candle store, one fixed-width file per column:
+    date is int64 milliseconds, ohlcv are float64.
+    Rows are sorted by date, writes append (or merge from their first date) and
+    reads are binary searches on the memory mapped date column.
+    The downloaded [start, end) date ranges are tracked in meta.json, so
+    missing head, tail and interior ranges can be fetched on their own.
+    """
+
+    def __init__(self, path, readonly=False):
+        """
+        :param readonly: open an existing store without creating or repairing
+            any file, the reads stop at the committed rows of the date column
+        :raise ValueError: the readonly store or its meta.json does not exist
+        """
+        self.path = path
+        self.readonly = readonly
+        if readonly:
+            if not os.path.exists(self._meta_path()):
+                raise ValueError(f"Candle store not downloaded: {path}")
+        else:
+            os.makedirs(path, exist_ok=True)
+            self._repair()
+        self._load_meta()
+
+    def _column_path(self, column):
+        return os.path.join(self.path, f"{column}.bin")
+
+    def _column_len(self, column):
+        path = self._column_path(column)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // DTYPES[column].itemsize
+
+    def _repair(self):
+        # date is written last, so its length is the number of committed rows
+        self._truncate(self._column_len("date"))
+
+    def _truncate(self, length):
+        for column in COLUMNS:
+            path = self._column_path(column)
+            with open(path, "ab") as f:
+                f.truncate(length * DTYPES[column].itemsize)
+
+    def _meta_path(self):
+        return os.path.join(self.path, "meta.json")
+
+    def _load_meta(self):
+        if os.path.exists(self._meta_path()):
+            with open(self._meta_path(), "r") as f:
+                self.meta = json.load(f)
+        else:
+            # stores without meta cover their data, except the last candle
+            # which may have been incomplete when it was downloaded
+            self.meta = {"ranges": []}
+            if len(self) > 1:
+                self.meta["ranges"] = [[self.first(), self.last()]]
+
+    def _check_writable(self):
+        if self.readonly:
+            raise ValueError(f"Candle store is read only: {self.path}")
+
+    def _save_meta(self):
+        self._check_writable()
+        tmp_path = self._meta_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._meta_path())
+
+    def ranges(self) -> List[List[int]]:
+        return [list(r) for r in self.meta["ranges"]]
+
+    def add_range(self, start, end):
+        """
+        mark [start, end) as downloaded
+        """
+        if start >= end:
+            return
+        self.meta["ranges"] = merge_ranges(self.meta["ranges"] + [[start, end]])
+        self._save_meta()
+
+    def missing(self, start, end) -> List[List[int]]:
+        """
+        :return: the [start, end) ranges in [start, end) which have not been downloaded
+        """
+        gaps = []
+        for r_start, r_end in self.meta["ranges"]:
+            if r_end <= start:
+                continue
+            if r_start >= end:
+                break
+            if r_start > start:
+                gaps.append([start, r_start])
+            start = max(start, r_end)
+        if start < end:
+            gaps.append([start, end])
+        return gaps
+
+    def __len__(self):
+        return self._column_len("date")
+
+    def column(self, name) -> np.ndarray:
+        length = len(self)
+        if length == 0:
+            return np.empty(0, dtype=DTYPES[name])
+        return np.memmap(
+            self._column_path(name), dtype=DTYPES[name], mode="r", shape=(length,)
+        )
+
+    def first(self) -> Optional[int]:
+        return int(self.column("date")[0]) if len(self) > 0 else None
+
+    def last(self) -> Optional[int]:
+        return int(self.column("date")[-1]) if len(self) > 0 else None
+
+    def read(self, start=None, end=None) -> Dict[str, np.ndarray]:
+        """
+        :param int start: include candles with date >= start (ms)
+        :param int end: include candles with date < end (ms)
+        :return: column name -> memory mapped array, valid until the next write
+        """
+        dates = self.column("date")
+        lo = 0 if start is None else int(np.searchsorted(dates, start, "left"))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, end, "left"))
+        hi = max(lo, hi)
+        return {
+            column: (dates if column == "date" else self.column(column))[lo:hi]
+            for column in COLUMNS
+        }
+
+    def write(self, candles):
+        """
+        Merge candles into the store, new rows replace stored rows with the same date.
+        Candles after the stored data are appended, earlier candles only rewrite
+        the rows from their first date onwards.
+        :param candles: ohlcv rows [[timestamp, open, high, low, close, volume], ...]
+        """
+        self._check_writable()
+        arrays = to_arrays(candles)
+        if len(arrays["date"]) == 0:
+            return
+        dates = self.column("date")
+        start = int(np.searchsorted(dates, arrays["date"][0], "left"))
+        if start < len(dates) and arrays["date"][-1] < dates[-1]:
+            # keep the stored rows after the new candles
+            tail = {c: np.array(a) for c, a in self.read(start=dates[start]).items()}
+            keep = ~np.isin(tail["date"], arrays["date"])
+            merged = np.concatenate([arrays["date"], tail["date"][keep]])
+            order = np.argsort(merged, kind="stable")
+            arrays = {
+                c: np.concatenate([arrays[c], tail[c][keep]])[order] for c in COLUMNS
+            }
+        del dates
+        if start < len(self):
+            self._truncate(start)
+        for column in COLUMNS[1:] + COLUMNS[:1]:
+            with open(self._column_path(column), "ab") as f:
+                f.write(arrays[column].tobytes())
+
+
+def merge_ranges(ranges) -> List[List[int]]:
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def to_arrays(candles) -> Dict[str, np.ndarray]:
+    """
+    Convert ohlcv rows to sorted column arrays, duplicated dates keep the last row.
+    """
+    data = np.asarray(candles, dtype=np.float64).reshape(-1, len(COLUMNS))
+    dates = data[:, 0].astype(DTYPES["date"])
+    # the last occurrence of every date, in date order
+    _, index = np.unique(dates[::-1], return_index=True)
+    index = len(dates) - 1 - index
+    return {
+        column: (dates if i == 0 else data[:, i]).astype(DTYPES[column])[index]
+        for i, column in enumerate(COLUMNS)
+    }
+
+
+def migrate_json(json_path, store: CandleStore):
+    """
+    One-time migration of a legacy json candles cache into the store,
+    the json file is kept with a .bak suffix.
+    """
+    with open(json_path, "r") as f:
+        candles = json.load(f)
+    if candles:
+        store.write(candles)
+        store.add_range(store.first(), store.last())
+    os.replace(json_path, json_path + ".bak")
+    logger.info(f"migrated {len(candles)} candles from {json_path} to {store.path}")
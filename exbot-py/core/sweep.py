@@ -0,0 +1,181 @@
+import itertools
+import json
+import random
+from argparse import Namespace
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from core.backtest import BacktestResult, run_backtest
+from core.logger import logger
+from core.ringbuffer import OHLCV
+from strategies.manager import create_strategy
+
+# candles shared with the trials of a worker process
+shared_frame = None
+_shared_blocks = []
+
+
+def parse_grid(items) -> Dict[str, list]:
+    """
+    :param items: ["fast_period=8,12,16", "sell_trend_indicator=trend_close_1h,trend_close_2h"]
+    :return: param name -> values
+    """
+    grid = {}
+    for item in items:
+        name, _, values = item.partition("=")
+        if not values:
+            raise ValueError(f"Invalid grid: {item}")
+        grid[name.strip()] = [parse_value(v.strip()) for v in values.split(",")]
+    return grid
+
+
+def parse_value(value):
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return value
+
+
+def param_grid(grid: Dict[str, list]) -> List[Dict]:
+    """
+    :param grid: param name -> values
+    :return: every combination of the values
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def random_params(grid: Dict[str, list], budget, seed=None) -> List[Dict]:
+    """
+    :return: budget combinations of the grid, without repeats
+    """
+    trials = param_grid(grid)
+    if budget >= len(trials):
+        return trials
+    return random.Random(seed).sample(trials, budget)
+
+
+def share_candles(df: pd.DataFrame):
+    """
+    copy the ohlcv candles into shared memory blocks
+    :return: blocks, and the arguments to attach them in another process
+    """
+    values = np.ascontiguousarray(df[OHLCV].values, dtype=np.float64)
+    dates = np.ascontiguousarray(df.index.as_unit("ms").asi8)
+    blocks, specs = [], []
+    for array in [values, dates]:
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[:] = array
+        blocks.append(block)
+        specs.append((block.name, array.shape, array.dtype.str))
+    return blocks, (specs, str(df.index.tz) if df.index.tz else None)
+
+
+def attach_candles(specs, tz):
+    """
+    worker initializer, the candles are read-only views of the shared memory
+    """
+    global shared_frame
+    arrays = []
+    for name, shape, dtype in specs:
+        block = shared_memory.SharedMemory(name=name)
+        # keep the block open while the views are used
+        _shared_blocks.append(block)
+        array = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays.append(array)
+    values, dates = arrays
+    index = pd.to_datetime(dates, unit="ms", utc=True)
+    index = index.tz_convert(tz) if tz else index.tz_localize(None)
+    shared_frame = (values, index.rename("date"))
+
+
+def shared_candles(start=0, end=None) -> pd.DataFrame:
+    """
+    :return: a new frame over the shared candles, the strategies add their columns to it
+    """
+    values, index = shared_frame
+    return pd.DataFrame(
+        values[start:end], index=index[start:end], columns=OHLCV, copy=False
+    )
+
+
+def backtest_strategy(
+    df: pd.DataFrame, strategy_name, params, reversals, uamount, uamount_max, warmup=0
+) -> BacktestResult:
+    """
+    :param warmup: leading candles for the indicators only, their signals are not traded
+    """
+    df = create_strategy(strategy_name, params).run(df, None, Namespace(debug=True))
+    return run_backtest(df.iloc[warmup:], reversals, uamount, uamount_max)
+
+
+def run_trial(strategy_name, params, reversals, uamount, uamount_max) -> Dict:
+    result = backtest_strategy(
+        shared_candles(), strategy_name, params, reversals, uamount, uamount_max
+    )
+    return {**params, **result.summary()}
+
+
+@contextmanager
+def candle_pool(df: pd.DataFrame, workers):
+    """
+    process pool whose workers share the candles of df, see shared_candles
+    """
+    blocks, (specs, tz) = share_candles(df)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=attach_candles, initargs=(specs, tz)
+        ) as executor:
+            yield executor
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def run_sweep(
+    df: pd.DataFrame,
+    strategy_name,
+    trials: List[Dict],
+    reversals=False,
+    uamount=6,
+    uamount_max=6,
+    workers=4,
+) -> pd.DataFrame:
+    """
+    backtest the strategy with every params of the trials in a process pool,
+    the candles are loaded once and shared by the workers
+    :return: results ranked by total profit
+    """
+    results = []
+    with candle_pool(df, workers) as executor:
+        futures = {
+            executor.submit(
+                run_trial, strategy_name, params, reversals, uamount, uamount_max
+            ): params
+            for params in trials
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            params = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"[{i}/{len(futures)}] {params} failed: {e}")
+                continue
+            results.append(result)
+            logger.info(
+                f"[{i}/{len(futures)}] {params} total profit: {result['total_profit']}"
+            )
+    if len(results) == 0:
+        return pd.DataFrame()
+    return (
+        pd.DataFrame(results)
+        .sort_values("total_profit", ascending=False)
+        .reset_index(drop=True)
+    )
@@ -0,0 +1,111 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from strategies.strategy import tpsl_settings
+
+
+class IntrabarTpsl:
+    """
+    Take profit and stop loss of the backtest positions between the signals,
+    replayed on lower timeframe (1m) candles with the live TPSL settings:
+    TAKE_PROFIT_FIX_UPNL, STOP_LOSS_FIX_UPNL, TAKE_PROFIT_FIX_PRICE_URATE,
+    STOP_LOSS_FIX_PRICE_URATE and the position POSITION_*_URATE orders.
+    The whole position is closed at the nearest level, TPSL_AMOUNT partial
+    closes are not simulated.
+    """
+
+    def __init__(
+        self,
+        dates: np.ndarray,
+        open: np.ndarray,
+        high: np.ndarray,
+        low: np.ndarray,
+        timeframe_ms,
+        settings: Optional[Dict[str, float]] = None,
+    ):
+        """
+        :param dates: ms, dates of the lower timeframe candles
+        :param timeframe_ms: timeframe of the strategy candles, a signal is filled at their close
+        :param settings: tpsl_settings() by default
+        """
+        self.dates = np.asarray(dates, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.timeframe_ms = timeframe_ms
+        self.settings = tpsl_settings() if settings is None else settings
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, timeframe_ms, settings=None):
+        return cls(
+            df.index.as_unit("ms").asi8,
+            df["open"].values,
+            df["high"].values,
+            df["low"].values,
+            timeframe_ms,
+            settings,
+        )
+
+    def levels(self, side, spend, amount) -> Tuple[float, float]:
+        """
+        :param side: buy (long) or sell (short)
+        :return: nearest take profit and stop loss prices, nan when not set
+        """
+        s = self.settings
+        entry_price = spend / amount
+        direction = 1 if side == "buy" else -1
+        take_profits = []
+        stop_losses = []
+        # upnl = direction * (amount * price - spend)
+        if s["take_profit_fix_upnl"] > 0:
+            take_profits.append(
+                (spend + direction * s["take_profit_fix_upnl"]) / amount
+            )
+        if s["stop_loss_fix_upnl"] < 0:
+            stop_losses.append((spend + direction * s["stop_loss_fix_upnl"]) / amount)
+        for key, levels, sign in [
+            ("take_profit_fix_price_urate", take_profits, 1),
+            ("position_take_profit_urate", take_profits, 1),
+            ("stop_loss_fix_price_urate", stop_losses, -1),
+            ("position_stop_loss_urate", stop_losses, -1),
+        ]:
+            if s[key] > 0:
+                levels.append(entry_price * (1 + direction * sign * s[key]))
+        pick = min if side == "buy" else max
+        take_profit = pick(take_profits) if take_profits else np.nan
+        pick = max if side == "buy" else min
+        stop_loss = pick(stop_losses) if stop_losses else np.nan
+        return take_profit, stop_loss
+
+    def first_touch(
+        self, side, spend, amount, start, end
+    ) -> Optional[Tuple[int, float, str]]:
+        """
+        first lower timeframe candle in [start, end) which touches a level,
+        the stop loss wins when a candle touches both
+        :param start: ms, the close of the strategy candle which opened the position
+        :return: (date, price, take_profit or stop_loss), None if no level is touched
+        """
+        take_profit, stop_loss = self.levels(side, spend, amount)
+        lo, hi = np.searchsorted(self.dates, [start, end])
+        if lo >= hi:
+            return None
+        high, low = self.high[lo:hi], self.low[lo:hi]
+        if side == "buy":
+            # comparisons with nan are False
+            hit_tp, hit_sl = high >= take_profit, low <= stop_loss
+        else:
+            hit_tp, hit_sl = low <= take_profit, high >= stop_loss
+        hit = hit_tp | hit_sl
+        i = int(np.argmax(hit))
+        if not hit[i]:
+            return None
+        open = self.open[lo + i]
+        if hit_sl[i]:
+            # a gap through the level is filled at the open
+            gapped = open <= stop_loss if side == "buy" else open >= stop_loss
+            return int(self.dates[lo + i]), open if gapped else stop_loss, "stop_loss"
+        gapped = open >= take_profit if side == "buy" else open <= take_profit
+        return int(self.dates[lo + i]), open if gapped else take_profit, "take_profit"
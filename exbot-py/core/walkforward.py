@@ -0,0 +1,120 @@
+from concurrent.futures import as_completed
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.logger import logger
+from core.sweep import backtest_strategy, candle_pool, shared_candles
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def walk_forward_windows(
+    dates: np.ndarray, train_ms, test_ms, warmup
+) -> List[Tuple[int, int, int]]:
+    """
+    rolling train and test windows, the test windows follow each other
+    :param dates: ms, sorted candle dates
+    :param warmup: candles before every window for the indicators
+    :return: [(train_start, test_start, test_end), ...] candle positions
+    """
+    windows = []
+    if len(dates) <= warmup:
+        return windows
+    start = int(dates[warmup])
+    while True:
+        train_start, test_start, test_end = np.searchsorted(
+            dates, [start, start + train_ms, start + train_ms + test_ms]
+        ).tolist()
+        if test_start >= len(dates):
+            break
+        windows.append((train_start, test_start, test_end))
+        start += test_ms
+    return windows
+
+
+def run_window(
+    strategy_name, trials, window, warmup, reversals, uamount, uamount_max
+) -> Dict:
+    """
+    optimize the params on the train candles and backtest them on the test candles
+    """
+    train_start, test_start, test_end = window
+
+    def backtest(params, start, end):
+        # the warmup candles are taken from before the window
+        warm = max(0, start - warmup)
+        return backtest_strategy(
+            shared_candles(warm, end),
+            strategy_name,
+            params,
+            reversals,
+            uamount,
+            uamount_max,
+            start - warm,
+        )
+
+    best, best_profit = None, None
+    for params in trials:
+        profit = backtest(params, train_start, test_start).total_profit
+        if best_profit is None or profit > best_profit:
+            best, best_profit = params, profit
+    test = backtest(best, test_start, test_end)
+    index = shared_candles().index
+    return {
+        "train_start": index[train_start],
+        "test_start": index[test_start],
+        "test_end": index[test_end - 1],
+        **best,
+        "train_profit": best_profit,
+        **{f"test_{k}": v for k, v in test.summary().items()},
+    }
+
+
+def walk_forward(
+    df: pd.DataFrame,
+    strategy_name,
+    trials: List[Dict],
+    train_days,
+    test_days,
+    warmup,
+    reversals=False,
+    uamount=6,
+    uamount_max=6,
+    workers=4,
+) -> pd.DataFrame:
+    """
+    walk-forward optimization, the windows are run in parallel worker processes
+    :return: a row per window, with the best train params and their test results
+    """
+    dates = df.index.as_unit("ms").asi8
+    windows = walk_forward_windows(
+        dates, int(train_days * DAY_MS), int(test_days * DAY_MS), warmup
+    )
+    if len(windows) == 0:
+        raise ValueError(
+            f"Not enough candles for a {train_days} days train window after {warmup} warmup candles"
+        )
+    results = []
+    with candle_pool(df, workers) as executor:
+        futures = {
+            executor.submit(
+                run_window,
+                strategy_name,
+                trials,
+                window,
+                warmup,
+                reversals,
+                uamount,
+                uamount_max,
+            ): window
+            for window in windows
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            logger.info(
+                f"[{i}/{len(futures)}] test {result['test_start']} - {result['test_end']}, total profit: {result['test_total_profit']}"
+            )
+    return pd.DataFrame(results).sort_values("test_start").reset_index(drop=True)
@@ -1,28 +1,93 @@
 import argparse
 import logging
-from core.candle import get_candles
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from core.candle import sync_candles
 from core.logger import logger
 from config import load_config
 from exchanges import exchange
 
+
+def usdt_perpetual_symbols(markets):
+    return sorted(
+        symbol
+        for symbol, market in markets.items()
+        if market.get("swap")
+        and market.get("linear")
+        and market.get("quote") == "USDT"
+        and market.get("active") is not False
+    )
+
+
+def download(ex, symbol, timeframe, days):
+    started = time.time()
+    store, since = sync_candles(ex, symbol, timeframe, days)
+    return len(store.read(start=since)["date"]), time.time() - started
+
+
+def download_all(ex, symbols, timeframes, days, workers=4):
+    """
+    download symbols x timeframes on a worker pool,
+    requests are limited by the exchange's shared rate limiter
+    """
+    jobs = [(symbol, timeframe) for symbol in symbols for timeframe in timeframes]
+    started = time.time()
+    total_candles = 0
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(download, ex, symbol, timeframe, days): (symbol, timeframe)
+            for symbol, timeframe in jobs
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            symbol, timeframe = futures[future]
+            try:
+                candles, seconds = future.result()
+            except Exception as e:
+                failed.append((symbol, timeframe))
+                logger.exception(f"[{done}/{len(jobs)}] {symbol} {timeframe}: {e}")
+                continue
+            total_candles += candles
+            elapsed = time.time() - started
+            logger.info(
+                f"[{done}/{len(jobs)}] {symbol} {timeframe}: {candles} candles in {seconds:.1f}s, "
+                f"total: {total_candles} candles, {total_candles / elapsed:.0f} candles/s, {done / elapsed:.2f} jobs/s"
+            )
+    logger.info(
+        f"downloaded {len(jobs) - len(failed)}/{len(jobs)} in {time.time() - started:.1f}s, failed: {failed}"
+    )
+    return failed
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="exbot for python")
     parser.add_argument(
         "-c", "--config", type=str, required=True, help="config file path"
     )
     parser.add_argument(
-        "--symbol", type=str, required=True, help="The trading symbol to use"
+        "--symbol",
+        type=str,
+        default="",
+        help="The trading symbols to use, separated by commas",
+    )
+    parser.add_argument(
+        "--all-usdt-perp",
+        action="store_true",
+        help="download all the active USDT perpetual symbols",
     )
     parser.add_argument(
         "-t",
         "--timeframe",
         type=str,
         required=True,
-        help="timeframe: 1m 5m 15m 30m 1h 4h 1d 1w 1M",
+        help="timeframes separated by commas: 1m 5m 15m 30m 1h 4h 1d 1w 1M",
     )
     parser.add_argument(
         "--days", type=int, default=7, help="download data for given number of days"
     )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=4, help="number of download workers"
+    )
     # add arg verbose
     parser.add_argument("-v", "--verbose", action="store_true", help="verbose mode")
     args = parser.parse_args()
@@ -34,5 +99,14 @@ if __name__ == "__main__":
     config = load_config(args.config)
 
     ex = exchange.Exchange(config.exchange).get()
-    ex.load_markets()
-    get_candles(ex, args.symbol, args.timeframe, args.days)
+    # markets are loaded once for all the downloads
+    markets = ex.load_markets()
+    if args.all_usdt_perp:
+        symbols = usdt_perpetual_symbols(markets)
+    else:
+        symbols = [s.strip() for s in args.symbol.split(",") if s.strip()]
+    if len(symbols) == 0:
+        parser.error("--symbol or --all-usdt-perp is required")
+    timeframes = [t.strip() for t in args.timeframe.split(",") if t.strip()]
+
+    download_all(ex, symbols, timeframes, args.days, args.workers)
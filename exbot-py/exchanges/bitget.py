@@ -1,6 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 import ccxt
 from core.logger import logger
+from core.ratelimit import RateLimiter
+from exchanges.bitget_ws import BitgetKlineStream
 import time
 from typing import Literal
 from pybitget import Client
@@ -9,6 +12,8 @@ from pybitget import Client
 class BitgetExchange:
     def __init__(self, exchange: ccxt.bitget):
         self.exchange: ccxt.bitget = exchange
+        # shared by all the threads requesting the public api
+        self.limiter = RateLimiter(self.exchange.rateLimit / 1000)
         self.client = Client(
             self.exchange.apiKey,
             self.exchange.secret,
@@ -199,23 +204,60 @@ class BitgetExchange:
             "Failed to fetch candle data after {} retries".format(retries)
         )
 
-    # get all candles from since to now
-    def get_all_candles(self, symbol, timeframe, since=None):
+    def _get_window_candles(self, symbol, timeframe, start, end, limit):
+        timeframe_ms = self.exchange.parse_timeframe(timeframe) * 1000
         candles = []
-        limit = 1000
-        while True:
-            if since is None:
-                ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-            else:
-                ohlcv = self.exchange.fetch_ohlcv(
-                    symbol, timeframe, limit=limit, since=since
-                )
-            candles.extend(ohlcv)
-            if len(ohlcv) < limit:
+        since = start
+        while since < end:
+            self.limiter.acquire()
+            ohlcv = self.get_candles(symbol, timeframe, since=since, limit=limit)
+            ohlcv = [x for x in ohlcv if since <= x[0] < end]
+            if len(ohlcv) == 0:
                 break
-            since = ohlcv[-1][0]
+            candles.extend(ohlcv)
+            # the exchange may return less than a window
+            since = ohlcv[-1][0] + timeframe_ms
         return candles
 
+    # get all candles from since to until(exclusive) or now
+    def get_all_candles(self, symbol, timeframe, since=None, until=None, workers=4):
+        limit = 1000
+        if since is None:
+            self.limiter.acquire()
+            return self.get_candles(symbol, timeframe, limit=limit)
+
+        timeframe_ms = self.exchange.parse_timeframe(timeframe) * 1000
+        end = until if until is not None else self.exchange.milliseconds() + 1
+        # independent windows of one page each, fetched concurrently
+        window = limit * timeframe_ms
+        windows = [
+            (start, min(start + window, end)) for start in range(since, end, window)
+        ]
+        if len(windows) == 0:
+            return []
+        with ThreadPoolExecutor(max_workers=min(workers, len(windows))) as executor:
+            pages = executor.map(
+                lambda w: self._get_window_candles(symbol, timeframe, *w, limit),
+                windows,
+            )
+            # deduplicate by timestamp
+            candles = {x[0]: x for page in pages for x in page}
+        return [candles[ts] for ts in sorted(candles)]
+
+    def watch_candles(self, pairs, on_candle, on_reconnect=None, **kwargs):
+        """
+        :param pairs: [(symbol, timeframe), ...]
+        :return: started BitgetKlineStream
+        """
+        subscriptions = [
+            # v1 market ids have a product type suffix, eg. BTCUSDT_UMCBL
+            (symbol, timeframe, self.market_symbol(symbol).split("_")[0])
+            for symbol, timeframe in pairs
+        ]
+        stream = BitgetKlineStream(subscriptions, on_candle, on_reconnect, **kwargs)
+        stream.start()
+        return stream
+
     def fetch_position(self, symbol):
         values = {
             "long": {
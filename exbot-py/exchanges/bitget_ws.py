@@ -0,0 +1,146 @@
+import asyncio
+import json
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import websockets
+
+from core.logger import logger
+
+BITGET_WS_PUBLIC_URL = "wss://ws.bitget.com/v2/ws/public"
+
+# timeframe -> bitget kline channel
+KLINE_CHANNELS = {
+    "1m": "candle1m",
+    "5m": "candle5m",
+    "15m": "candle15m",
+    "30m": "candle30m",
+    "1h": "candle1H",
+    "4h": "candle4H",
+    "6h": "candle6H",
+    "12h": "candle12H",
+    "1d": "candle1D",
+    "1w": "candle1W",
+}
+
+
+class BitgetKlineStream:
+    """
+    Kline updates of the bitget public websocket, pushed to on_candle(symbol, timeframe, candle)
+    from a background thread. Reconnects with backoff and calls on_reconnect() after
+    resubscribing, so that the candles missed while disconnected can be fetched over REST.
+    """
+
+    def __init__(
+        self,
+        subscriptions: List[Tuple[str, str, str]],
+        on_candle: Callable,
+        on_reconnect: Optional[Callable] = None,
+        url=BITGET_WS_PUBLIC_URL,
+        inst_type="USDT-FUTURES",
+        ping_interval=25,
+        max_backoff=60,
+    ):
+        """
+        :param subscriptions: [(symbol, timeframe, inst_id), ...], eg. ("BTC/USDT:USDT", "1m", "BTCUSDT")
+        """
+        self.url = url
+        self.inst_type = inst_type
+        self.ping_interval = ping_interval
+        self.max_backoff = max_backoff
+        self.on_candle = on_candle
+        self.on_reconnect = on_reconnect
+        # (channel, inst_id) -> (symbol, timeframe)
+        self.subscriptions = {
+            (KLINE_CHANNELS[timeframe], inst_id): (symbol, timeframe)
+            for symbol, timeframe, inst_id in subscriptions
+        }
+        self.connected = threading.Event()
+        self._loop = None
+        self._task = None
+        self._thread = None
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self._run())
+        self._thread = threading.Thread(
+            target=self._main, name="bitget-kline-stream", daemon=True
+        )
+        self._thread.start()
+
+    def _main(self):
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._task.cancel)
+        self._thread.join()
+        self._loop.close()
+        self._thread = None
+
+    def _subscribe_message(self):
+        args = [
+            {"instType": self.inst_type, "channel": channel, "instId": inst_id}
+            for channel, inst_id in self.subscriptions
+        ]
+        return json.dumps({"op": "subscribe", "args": args})
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await ws.send("ping")
+
+    def _handle(self, message):
+        if message == "pong":
+            return
+        data = json.loads(message)
+        if data.get("event") == "error":
+            logger.error(f"kline stream error: {data}")
+            return
+        if "data" not in data or "arg" not in data:
+            return
+        arg = data["arg"]
+        key = self.subscriptions.get((arg.get("channel"), arg.get("instId")))
+        if key is None:
+            return
+        symbol, timeframe = key
+        candles = sorted([int(x[0])] + [float(v) for v in x[1:6]] for x in data["data"])
+        for candle in candles:
+            self.on_candle(symbol, timeframe, candle)
+
+    async def _run(self):
+        backoff = 1
+        reconnect = False
+        while True:
+            try:
+                async with websockets.connect(self.url, ping_interval=None) as ws:
+                    await ws.send(self._subscribe_message())
+                    self.connected.set()
+                    logger.info(f"kline stream connected: {self.url}")
+                    if reconnect and self.on_reconnect is not None:
+                        await asyncio.get_running_loop().run_in_executor(
+                            None, self.on_reconnect
+                        )
+                    reconnect = True
+                    backoff = 1
+                    ping = asyncio.create_task(self._ping(ws))
+                    try:
+                        async for message in ws:
+                            try:
+                                self._handle(message)
+                            except Exception as e:
+                                logger.exception(f"kline stream message: {e}")
+                    finally:
+                        ping.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"kline stream disconnected: {e}")
+            self.connected.clear()
+            logger.warning(f"kline stream reconnect in {backoff} seconds")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
@@ -3,12 +3,19 @@ import os
 from pandas import DataFrame
 import pytz
 import talib.abstract as ta
-import freqtrade.vendor.qtpylib.indicators as qtpylib
 import pandas as pd
+from core import indicators
+from core.incremental import (
+    ATR,
+    EMA,
+    HeikinAshi,
+    IndicatorSeries,
+    RollingMax,
+    RollingMin,
+)
 from strategies.istrategy import IStrategy
 
 pd.options.mode.chained_assignment = None  # default='warn'
-import technical.indicators as ftt
 from functools import reduce
 
 
@@ -77,14 +84,128 @@ class ichiv1(IStrategy):
         },
     }
 
+    # trend name -> ema period of the 5m candles
+    trend_periods = {
+        "15m": 3,
+        "30m": 6,
+        "1h": 12,
+        "2h": 24,
+        "4h": 48,
+        "6h": 72,
+        "8h": 96,
+    }
+
+    ichimoku_params = {
+        "conversion_line_period": 20,
+        "base_line_periods": 60,
+        "laggin_span": 120,
+        "displacement": 30,
+    }
+
+    def __init__(self, params=None):
+        super().__init__(params)
+        # (symbol, timeframe) -> indicators of the live candles
+        self.live_indicators = {}
+
+    def indicator_lookback(self) -> int:
+        # senkou span b of the laggin span, shifted by the displacement
+        ichimoku = (
+            self.ichimoku_params["laggin_span"] + self.ichimoku_params["displacement"]
+        )
+        # the ema seeds are forgotten after about 4 periods
+        trend = 4 * max(self.trend_periods.values())
+        return max(ichimoku, trend)
+
+    def create_live_indicators(self):
+        heikinashi = IndicatorSeries(
+            {
+                ("ha_open", "ha_high", "ha_low", "ha_close"): (
+                    HeikinAshi(),
+                    ["open", "high", "low", "close"],
+                )
+            }
+        )
+        columns = {}
+        for name, period in self.trend_periods.items():
+            columns[f"trend_close_{name}"] = (EMA(period), ["close"])
+            columns[f"trend_open_{name}"] = (EMA(period), ["open"])
+        columns["atr"] = (ATR(14), ["high", "low", "close"])
+        for key in ["conversion_line_period", "base_line_periods", "laggin_span"]:
+            window = self.ichimoku_params[key]
+            columns[f"high_max_{window}"] = (RollingMax(window), ["high"])
+            columns[f"low_min_{window}"] = (RollingMin(window), ["low"])
+        return heikinashi, IndicatorSeries(columns)
+
+    def populate_live_indicators(self, dataframe: DataFrame, key) -> DataFrame:
+        """
+        same indicators as populate_indicators, only the new and the revised candles are computed
+        """
+        if key not in self.live_indicators:
+            self.live_indicators[key] = self.create_live_indicators()
+        heikinashi, indicators = self.live_indicators[key]
+        dataframe = dataframe.copy()
+        values = heikinashi.update(dataframe)
+        dataframe["open"] = values["ha_open"]
+        dataframe["high"] = values["ha_high"]
+        dataframe["low"] = values["ha_low"]
+
+        values = indicators.update(dataframe)
+        dataframe["trend_close_5m"] = dataframe["close"]
+        for name in self.trend_periods:
+            dataframe[f"trend_close_{name}"] = values[f"trend_close_{name}"]
+        dataframe["trend_open_5m"] = dataframe["open"]
+        for name in self.trend_periods:
+            dataframe[f"trend_open_{name}"] = values[f"trend_open_{name}"]
+
+        dataframe["fan_magnitude"] = (
+            dataframe["trend_close_1h"] / dataframe["trend_close_8h"]
+        )
+        dataframe["fan_magnitude_gain"] = dataframe["fan_magnitude"] / dataframe[
+            "fan_magnitude"
+        ].shift(1)
+
+        def donchian(key):
+            window = self.ichimoku_params[key]
+            return pd.Series(
+                (values[f"high_max_{window}"] + values[f"low_min_{window}"]) / 2,
+                index=dataframe.index,
+            )
+
+        displacement = self.ichimoku_params["displacement"]
+        tenkan_sen = donchian("conversion_line_period")
+        kijun_sen = donchian("base_line_periods")
+        leading_senkou_span_a = (tenkan_sen + kijun_sen) / 2
+        leading_senkou_span_b = donchian("laggin_span")
+        dataframe["chikou_span"] = dataframe["close"].shift(-displacement + 1)
+        dataframe["tenkan_sen"] = tenkan_sen
+        dataframe["kijun_sen"] = kijun_sen
+        dataframe["senkou_a"] = leading_senkou_span_a.shift(displacement - 1)
+        dataframe["senkou_b"] = leading_senkou_span_b.shift(displacement - 1)
+        dataframe["leading_senkou_span_a"] = leading_senkou_span_a
+        dataframe["leading_senkou_span_b"] = leading_senkou_span_b
+        dataframe["cloud_green"] = dataframe["senkou_a"] > dataframe["senkou_b"]
+        dataframe["cloud_red"] = dataframe["senkou_b"] > dataframe["senkou_a"]
+
+        dataframe["atr"] = values["atr"]
+
+        return dataframe
+
     def populate_indicators(self, dataframe: DataFrame) -> DataFrame:
-        dataframe = dataframe.reset_index()
-        heikinashi = qtpylib.heikinashi(dataframe)
-        dataframe["open"] = heikinashi["open"]
-        # dataframe['close'] = heikinashi['close']
-        dataframe["high"] = heikinashi["high"]
-        dataframe["low"] = heikinashi["low"]
-        dataframe = dataframe.set_index("date")
+        symbol = dataframe.attrs.get("symbol")
+        timeframe = dataframe.attrs.get("timeframe")
+        if symbol is not None and timeframe is not None:
+            return self.populate_live_indicators(dataframe, (symbol, timeframe))
+        dataframe = dataframe.copy()
+        ha_open, ha_high, ha_low, ha_close = indicators.heikinashi(
+            dataframe["open"].values,
+            dataframe["high"].values,
+            dataframe["low"].values,
+            dataframe["close"].values,
+        )
+        dataframe["open"] = ha_open
+        # dataframe['close'] = ha_close
+        dataframe["high"] = ha_high
+        dataframe["low"] = ha_low
 
         dataframe["trend_close_5m"] = dataframe["close"]
         dataframe["trend_close_15m"] = ta.EMA(dataframe["close"], timeperiod=3)
@@ -111,12 +232,11 @@ class ichiv1(IStrategy):
             "fan_magnitude"
         ].shift(1)
 
-        ichimoku = ftt.ichimoku(
-            dataframe,
-            conversion_line_period=20,
-            base_line_periods=60,
-            laggin_span=120,
-            displacement=30,
+        ichimoku = indicators.ichimoku(
+            dataframe["high"].values,
+            dataframe["low"].values,
+            dataframe["close"].values,
+            **self.ichimoku_params,
         )
         dataframe["chikou_span"] = ichimoku["chikou_span"]
         dataframe["tenkan_sen"] = ichimoku["tenkan_sen"]
@@ -238,9 +358,9 @@ class ichiv1(IStrategy):
         self.condition_early_close_seconds(dataframe, conditions)
 
         conditions.append(
-            qtpylib.crossed_below(
-                dataframe["trend_close_5m"],
-                dataframe[self.sell_params["sell_trend_indicator"]],
+            indicators.crossed_below(
+                dataframe["trend_close_5m"].values,
+                dataframe[self.sell_params["sell_trend_indicator"]].values,
             )
         )
 
@@ -253,11 +373,3 @@ class ichiv1(IStrategy):
         df["take_profit"] = pd.Series(dtype="str")
         df["stop_loss"] = pd.Series(dtype="str")
         return df
-
-    def run(self, df, ex, args):
-        df = self.populate_indicators(df)
-        df = self.populate_buy_trend(df)
-        df = self.populate_sell_trend(df)
-        df = self.populate_close_position(df)
-        self.trade(ex, df, args)
-        return df
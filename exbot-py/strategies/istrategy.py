@@ -1,9 +1,36 @@
 from abc import ABC, abstractmethod
 
+import pandas as pd
+
+from core.ringbuffer import OHLCV
 from strategies import strategy
 
 
 class IStrategy(ABC):
+    buy_params = {}
+    sell_params = {}
+
+    # candles before the first signal
+    startup_candle_count = 0
+    # only populate the live candles when a candle has closed
+    process_only_new_candles = False
+
+    def __init__(self, params=None):
+        """
+        :param params: overrides of the buy and sell hyperspace params
+        """
+        self.buy_params = dict(self.buy_params)
+        self.sell_params = dict(self.sell_params)
+        for key, value in (params or {}).items():
+            if key in self.buy_params:
+                self.buy_params[key] = value
+            elif key in self.sell_params:
+                self.sell_params[key] = value
+            else:
+                raise ValueError(f"Invalid strategy param: {key}")
+        # (symbol, timeframe) -> populated frame of the live candles
+        self.analyzed = {}
+
     @abstractmethod
     def populate_indicators(self, df):
         pass
@@ -47,6 +74,50 @@ class IStrategy(ABC):
                     raise ValueError(f"Invalid amount_type: {args.amount_type}")
         return side
 
-    @abstractmethod
+    def indicator_lookback(self) -> int:
+        """
+        :return: candles the indicators need with the current params
+        """
+        return 0
+
+    def required_candles(self) -> int:
+        """
+        :return: history size of the strategy, startup_candle_count or the indicator lookback
+        """
+        return max(self.startup_candle_count, self.indicator_lookback())
+
+    def populate(self, df):
+        df = self.populate_indicators(df)
+        df = self.populate_buy_trend(df)
+        df = self.populate_sell_trend(df)
+        df = self.populate_close_position(df)
+        return df
+
+    def analyze(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        populate the candles, with process_only_new_candles the live candles are
+        only populated when a candle has closed, the signals of the closed candle
+        are copied to the forming candle whose ohlcv is updated on every call
+        """
+        symbol, timeframe = df.attrs.get("symbol"), df.attrs.get("timeframe")
+        if not self.process_only_new_candles or symbol is None or timeframe is None:
+            return self.populate(df)
+        key = (symbol, timeframe)
+        analyzed = self.analyzed.get(key)
+        if analyzed is None or analyzed.index[-1] != df.index[-1]:
+            analyzed = self.populate(df.iloc[:-1])
+            # the forming candle with the signals of the last closed candle
+            last = analyzed.iloc[-1:].copy()
+            last.index = df.index[-1:]
+            analyzed = pd.concat([analyzed, last])
+            analyzed.attrs.update(df.attrs)
+            self.analyzed[key] = analyzed
+        # the tpsl checks use the live price
+        columns = [analyzed.columns.get_loc(c) for c in OHLCV]
+        analyzed.iloc[-1, columns] = df[OHLCV].values[-1]
+        return analyzed
+
     def run(self, df, ex, args):
-        pass
+        df = self.analyze(df)
+        self.trade(ex, df, args)
+        return df
@@ -1,10 +1,12 @@
 import datetime
+import logging
 import os
 from pandas import DataFrame
 import pytz
 import talib
 import pandas as pd
 
+from core.incremental import MACD, IndicatorSeries
 from strategies.istrategy import IStrategy
 
 pd.options.mode.chained_assignment = None  # default='warn'
@@ -17,7 +19,11 @@ from typing import Literal
 class macd(IStrategy):
     # NOTE: settings as of the 25th july 21
     # Buy hyperspace params:
-    buy_params = {}
+    buy_params = {
+        "fast_period": 12,
+        "slow_period": 26,
+        "signal_period": 9,
+    }
 
     # Sell hyperspace params:
     # NOTE: was 15m but kept bailing out in dryrun
@@ -37,14 +43,44 @@ class macd(IStrategy):
     use_sell_signal = True
     sell_profit_only = False
 
+    def __init__(self, params=None):
+        super().__init__(params)
+        # (symbol, timeframe) -> macd of the live candles
+        self.live_indicators = {}
+
+    def indicator_lookback(self) -> int:
+        slow = max(self.buy_params["fast_period"], self.buy_params["slow_period"])
+        # the ema seeds are forgotten after about 4 periods
+        return 4 * slow + self.buy_params["signal_period"]
+
     def populate_indicators(self, df: DataFrame) -> DataFrame:
-        close_prices = df["close"].values  # 获取收盘价的数据
-        fast_period = 12
-        slow_period = 26
-        signal_period = 9
-        macd, signal, hist = talib.MACD(
-            close_prices, fast_period, slow_period, signal_period
-        )
+        symbol, timeframe = df.attrs.get("symbol"), df.attrs.get("timeframe")
+        if symbol is not None and timeframe is not None:
+            # live candles, only the new and the revised candles are computed
+            key = (symbol, timeframe)
+            if key not in self.live_indicators:
+                self.live_indicators[key] = IndicatorSeries(
+                    {
+                        ("dif", "dea", "macd"): (
+                            MACD(
+                                self.buy_params["fast_period"],
+                                self.buy_params["slow_period"],
+                                self.buy_params["signal_period"],
+                            ),
+                            ["close"],
+                        )
+                    }
+                )
+            values = self.live_indicators[key].update(df)
+            macd, signal, hist = values["dif"], values["dea"], values["macd"]
+        else:
+            close_prices = df["close"].values  # 获取收盘价的数据
+            macd, signal, hist = talib.MACD(
+                close_prices,
+                self.buy_params["fast_period"],
+                self.buy_params["slow_period"],
+                self.buy_params["signal_period"],
+            )
 
         df["dif"] = np.around(macd, decimals=6)
         df["dea"] = np.around(signal, decimals=6)
@@ -139,61 +175,61 @@ class macd(IStrategy):
     def populate_close_position(self, df: DataFrame) -> DataFrame:
         df["take_profit"] = pd.Series(dtype="str")
         df["stop_loss"] = pd.Series(dtype="str")
-        # macd三连跌止盈止损
-        fall_nums = 0
-        before_macd = 0
-        # 开仓信号
-        open_signal = None
-        # 开仓价格
-        open_price = 0
-        # 平仓收益
-        profit = 0
         # fee
         fee_rate = 0.0012
-        fee = 0
 
         conditions = []
         self.condition_early_close_seconds(df, conditions)
-
-        for index, row in (
-            df.loc[reduce(lambda x, y: x & y, conditions)].iterrows()
-            if len(conditions) > 0
-            else df.iterrows()
-        ):
-            # 如果发现信号，就重置计数器
-            if pd.notnull(row["signal"]):
-                # set open data
-                open_signal = row["signal"]
-                open_price = float(row["close"])
-                fee = open_price * fee_rate
-                fall_nums = 0
-                before_macd = abs(row["macd"])
-                continue
-            if abs(row["macd"]) < before_macd:
-                fall_nums += 1
-            else:
-                fall_nums = 0
-            before_macd = abs(row["macd"])
-            if fall_nums == 4:
-                if open_signal == "buy":
-                    profit = float(row["close"]) - open_price - fee
-                elif open_signal == "sell":
-                    profit = open_price - float(row["close"]) - fee
+        if len(conditions) > 0:
+            rows = np.flatnonzero(reduce(lambda x, y: x & y, conditions).values)
+        else:
+            rows = np.arange(len(df))
+        if len(rows) == 0:
+            return df
+        signal = df["signal"].values[rows]
+        close = df["close"].values[rows].astype(float)
+        macd = np.abs(df["macd"].values[rows].astype(float))
+        # 发现信号时重置计数器
+        is_signal = pd.notnull(signal)
+
+        # macd三连跌止盈止损: 第4根连续缩小的macd
+        before_macd = np.r_[0.0, macd[:-1]]
+        reset = is_signal | ~(macd < before_macd)
+        index = np.arange(len(rows))
+        fall_nums = index - np.maximum.accumulate(np.where(reset, index, -1))
+        hits = np.flatnonzero((fall_nums == 4) & ~is_signal)
+        if len(hits) == 0:
+            return df
+
+        # 开仓信号和开仓价格
+        last_signal = np.maximum.accumulate(np.where(is_signal, index, -1))[hits]
+        opened = last_signal >= 0
+        open_signal = np.where(opened, signal[last_signal], None)
+        open_price = close[last_signal]
+        fee = open_price * fee_rate
+        # 平仓收益, 没有开仓信号时为0
+        profit = np.where(
+            open_signal == "buy",
+            close[hits] - open_price - fee,
+            open_price - close[hits] - fee,
+        )
+        profit = np.where(opened, profit, 0.0)
+
+        positions = rows[hits]
+        take_profit = df["take_profit"].values.copy()
+        stop_loss = df["stop_loss"].values.copy()
+        take_profit[positions[profit > 0]] = open_signal[profit > 0]
+        stop_loss[positions[profit <= 0]] = open_signal[profit <= 0]
+        df["take_profit"] = take_profit
+        df["stop_loss"] = stop_loss
+        profits = df["profit"].values.astype(float) if "profit" in df else None
+        if profits is None:
+            profits = np.full(len(df), np.nan)
+        profits[positions] = profit
+        df["profit"] = profits
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, position in enumerate(positions):
                 logger.debug(
-                    f"{'take profit' if profit > 0 else 'stop loss'} [macd_fall_4]: {index}, [{open_signal} {open_price} {row['close']}], {profit}"
+                    f"{'take profit' if profit[i] > 0 else 'stop loss'} [macd_fall_4]: {df.index[position]}, [{open_signal[i]} {open_price[i]} {close[hits[i]]}], {profit[i]}"
                 )
-                if profit > 0:
-                    df.loc[index, "take_profit"] = open_signal
-                    df.loc[index, "profit"] = profit
-                else:
-                    df.loc[index, "stop_loss"] = open_signal
-                    df.loc[index, "profit"] = profit
-        return df
-
-    def run(self, df, ex, args):
-        df = self.populate_indicators(df)
-        df = self.populate_buy_trend(df)
-        df = self.populate_sell_trend(df)
-        df = self.populate_close_position(df)
-        self.trade(ex, df, args)
         return df
@@ -1,18 +1,123 @@
+import importlib
 import os
-from core import chart
-from strategies import ichiv1, macd, strategy
+from collections.abc import Mapping
+from importlib.metadata import entry_points
+from core.candle import candles_days
 from core.logger import logger
-import plotly.graph_objects as go
-from typing import Dict
+from typing import TYPE_CHECKING, Callable, Dict, Tuple, Type
 
 from strategies.istrategy import IStrategy
 
-strategys: Dict[str, IStrategy] = {
-    "macd": macd.macd(),
-    "ichiv1": ichiv1.ichiv1(),
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+# entry point group of the strategy plugins, name = "module:class"
+ENTRY_POINT_GROUP = "exbot.strategies"
+
+# strategy name -> "module:class", the module is imported when the strategy is used
+strategy_paths: Dict[str, str] = {
+    "macd": "strategies.macd:macd",
+    "ichiv1": "strategies.ichiv1:ichiv1",
 }
 
 
+def discover_strategies(group=ENTRY_POINT_GROUP) -> Dict[str, str]:
+    """
+    strategies of the installed packages, declared in their entry points:
+    [project.entry-points."exbot.strategies"]
+    mystrategy = "mypackage.mystrategy:mystrategy"
+    :return: strategy name -> "module:class", the built-in names are not overridden
+    """
+    paths = {}
+    for ep in entry_points(group=group):
+        if ep.name in strategy_paths:
+            logger.warning(f"strategy {ep.name} of {ep.value} is already registered")
+            continue
+        paths[ep.name] = ep.value
+    return paths
+
+
+def load_strategy_class(path) -> Type[IStrategy]:
+    """
+    :param path: "module:class"
+    """
+    module_name, _, class_name = path.partition(":")
+    strategy_class = getattr(importlib.import_module(module_name), class_name)
+    if not issubclass(strategy_class, IStrategy):
+        raise TypeError(f"{path} is not an IStrategy")
+    return strategy_class
+
+
+class LazyStrategies(Mapping):
+    """
+    Strategy name -> value of the registered strategies,
+    the value is loaded on the first access of its name, so only the modules
+    of the strategies in use are imported.
+    """
+
+    def __init__(self, load: Callable[[str], object]):
+        self.load = load
+        self.loaded = {}
+
+    def __getitem__(self, name):
+        if name not in self.loaded:
+            if name not in strategy_paths:
+                raise KeyError(name)
+            self.loaded[name] = self.load(name)
+        return self.loaded[name]
+
+    def __contains__(self, name):
+        return name in strategy_paths
+
+    def __iter__(self):
+        return iter(strategy_paths)
+
+    def __len__(self):
+        return len(strategy_paths)
+
+
+strategy_classes: Dict[str, Type[IStrategy]] = LazyStrategies(
+    lambda name: load_strategy_class(strategy_paths[name])
+)
+
+# the strategy instances of the bots
+strategys: Dict[str, IStrategy] = LazyStrategies(lambda name: strategy_classes[name]())
+
+
+def register_strategy(name, path):
+    """
+    :param path: "module:class"
+    """
+    strategy_paths[name] = path
+    strategy_classes.loaded.pop(name, None)
+    strategys.loaded.pop(name, None)
+
+
+strategy_paths.update(discover_strategies())
+
+
+def create_strategy(strategy_name, params=None) -> IStrategy:
+    """
+    :param params: overrides of the strategy hyperspace params
+    :return: a new strategy instance
+    """
+    if strategy_name not in strategy_classes:
+        raise ValueError(f"Invalid strategy name: {strategy_name}")
+    return strategy_classes[strategy_name](params)
+
+
+def strategy_history(strategy_name, timeframe, margin=20) -> Tuple[float, int]:
+    """
+    history size of the live candles
+    :param margin: candles on top of the strategy lookback
+    :return: days to load, candles to keep
+    """
+    if strategy_name not in strategys:
+        raise ValueError(f"Invalid strategy name: {strategy_name}")
+    candles = strategys[strategy_name].required_candles() + margin
+    return candles_days(timeframe, candles), candles
+
+
 def with_strategy(strategy_name, ex, df, args):
     """
     :param strategy_name: strategy name
@@ -34,20 +139,23 @@ def with_strategy(strategy_name, ex, df, args):
     return df
 
 
-def with_figure(strategy_name, ex, df, fig: go.Figure, args):
-    df = df.tail(chart.chart_display_size)
+def with_figure(strategy_name, ex, df, fig: "go.Figure", args):
+    from core import chart, live
+
+    df = df.tail(live.chart_display_size)
     if fig is not None:
         match strategy_name:
             case "macd":
-                stgy = macd.macd()
+                stgy = create_strategy("macd")
                 # 获取多 timeframe 的数据
                 dfs = {}
                 timeframes = ["1m", "5m"]
                 for timeframe in timeframes:
                     if args.timeframe != timeframe:
-                        dfs[timeframe] = chart.get_charting(
-                            ex, args.symbol, timeframe
-                        ).tail(chart.chart_display_size)
+                        # higher timeframes are built from the 1m candles
+                        dfs[timeframe] = live.get_charting(
+                            ex, args.symbol, timeframe, base_timeframe=timeframes[0]
+                        ).tail(live.chart_display_size)
                         dfs[timeframe] = stgy.populate_indicators(dfs[timeframe])
                     else:
                         df = stgy.populate_indicators(df)
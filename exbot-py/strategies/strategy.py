@@ -1,5 +1,5 @@
 import os
-from typing import Literal
+from typing import Dict, Literal
 from exchanges.bitget import BitgetExchange
 from core.logger import logger
 from core.logger import setup_datalogger
@@ -24,6 +24,25 @@ def get_used_cache(key, cache_type=""):
     return used_cache.get(key)
 
 
+def tpsl_settings() -> Dict[str, float]:
+    """
+    env TPSL settings, shared by the live handlers and the backtest
+    """
+    return {
+        "tpsl_amount": float(os.getenv("TPSL_AMOUNT", 0)),
+        "take_profit_fix_upnl": float(os.getenv("TAKE_PROFIT_FIX_UPNL", 0)),
+        "stop_loss_fix_upnl": float(os.getenv("STOP_LOSS_FIX_UPNL", 0)),
+        "take_profit_fix_price_urate": float(
+            os.getenv("TAKE_PROFIT_FIX_PRICE_URATE", 0)
+        ),
+        "stop_loss_fix_price_urate": float(os.getenv("STOP_LOSS_FIX_PRICE_URATE", 0)),
+        "position_take_profit_urate": float(
+            os.getenv("POSITION_TAKE_PROFIT_URATE", 0.1)
+        ),
+        "position_stop_loss_urate": float(os.getenv("POSITION_STOP_LOSS_URATE", 0.1)),
+    }
+
+
 def signal_to_side(signal):
     if signal == "buy":
         return "long"
@@ -34,11 +53,12 @@ def signal_to_side(signal):
 
 
 def handle_take_profit(last, ex: BitgetExchange, symbol, position):
+    settings = tpsl_settings()
     tp = os.getenv("TAKE_PROFIT", "false") == "true"
     if not tp:
         return False
 
-    input_amount = float(os.getenv("TPSL_AMOUNT", 0))
+    input_amount = settings["tpsl_amount"]
     hold_side = signal_to_side(last["take_profit"])
     if hold_side is None:
         return False
@@ -62,11 +82,12 @@ def handle_take_profit(last, ex: BitgetExchange, symbol, position):
 
 
 def handle_stop_loss(last, ex: BitgetExchange, symbol, position):
+    settings = tpsl_settings()
     sl = os.getenv("STOP_LOSS", "false") == "true"
     if not sl:
         return False
 
-    input_amount = float(os.getenv("TPSL_AMOUNT", 0))
+    input_amount = settings["tpsl_amount"]
     hold_side = signal_to_side(last["stop_loss"])
     if hold_side is None:
         return False
@@ -90,8 +111,9 @@ def handle_stop_loss(last, ex: BitgetExchange, symbol, position):
 
 
 def handle_take_profit_fix_upnl(last, ex: BitgetExchange, symbol, position):
-    fix_upnl = float(os.getenv("TAKE_PROFIT_FIX_UPNL", 0))
-    input_amount = float(os.getenv("TPSL_AMOUNT", 0))
+    settings = tpsl_settings()
+    fix_upnl = settings["take_profit_fix_upnl"]
+    input_amount = settings["tpsl_amount"]
     if fix_upnl > 0:
         for side in ["short", "long"]:
             position_amount = position[side]["qty"]
@@ -112,8 +134,9 @@ def handle_take_profit_fix_upnl(last, ex: BitgetExchange, symbol, position):
 
 
 def handle_stop_loss_fix_upnl(last, ex: BitgetExchange, symbol, position):
-    fix_upnl = float(os.getenv("STOP_LOSS_FIX_UPNL", 0))
-    input_amount = float(os.getenv("TPSL_AMOUNT", 0))
+    settings = tpsl_settings()
+    fix_upnl = settings["stop_loss_fix_upnl"]
+    input_amount = settings["tpsl_amount"]
     if fix_upnl < 0:
         for side in ["short", "long"]:
             position_amount = position[side]["qty"]
@@ -134,8 +157,9 @@ def handle_stop_loss_fix_upnl(last, ex: BitgetExchange, symbol, position):
 
 
 def handle_take_profit_fix_price_urate(last, ex: BitgetExchange, symbol, position):
-    fix_urate = float(os.getenv("TAKE_PROFIT_FIX_PRICE_URATE", 0))
-    input_amount = float(os.getenv("TPSL_AMOUNT", 0))
+    settings = tpsl_settings()
+    fix_urate = settings["take_profit_fix_price_urate"]
+    input_amount = settings["tpsl_amount"]
     if fix_urate > 0:
         for side in ["short", "long"]:
             position_amount = position[side]["qty"]
@@ -168,8 +192,9 @@ def handle_take_profit_fix_price_urate(last, ex: BitgetExchange, symbol, positio
 
 
 def handle_stop_loss_fix_price_urate(last, ex: BitgetExchange, symbol, position):
-    fix_urate = float(os.getenv("STOP_LOSS_FIX_PRICE_URATE", 0))
-    input_amount = float(os.getenv("TPSL_AMOUNT", 0))
+    settings = tpsl_settings()
+    fix_urate = settings["stop_loss_fix_price_urate"]
+    input_amount = settings["tpsl_amount"]
     if fix_urate > 0:
         for side in ["short", "long"]:
             position_amount = position[side]["qty"]
@@ -236,6 +261,7 @@ def create_order_market(
     entry_price=0.0,
     position_amount=0,
 ):
+    settings = tpsl_settings()
     hold_side = signal_to_side(side)
     open_price = entry_price if entry_price > 0 else price
 
@@ -251,13 +277,13 @@ def create_order_market(
         logger.warning(f"amount[{amount}] * price[{price}] < 6, not create order")
         return False
 
-    stop_loss_urate = float(os.getenv("POSITION_STOP_LOSS_URATE", 0.1))
+    stop_loss_urate = settings["position_stop_loss_urate"]
     stop_loss_trigger_price = (
         open_price * (1 + stop_loss_urate)
         if side == "sell"
         else open_price * (1 - stop_loss_urate)
     )
-    take_profit_urate = float(os.getenv("POSITION_TAKE_PROFIT_URATE", 0.1))
+    take_profit_urate = settings["position_take_profit_urate"]
     take_profit_trigger_price = (
         open_price * (1 + take_profit_urate)
         if side == "buy"
@@ -0,0 +1,121 @@
+import argparse
+import logging
+import os
+from config import load_config
+from core import live
+from core.macd_batch import macd_grid
+from core.sweep import param_grid, parse_grid, random_params, run_sweep
+from exchanges import exchange
+import pandas as pd
+from core.logger import logger
+
+pd.set_option("display.max_columns", 1000)
+pd.set_option("display.width", 1000)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="exbot parameter sweep for python")
+    parser.add_argument(
+        "-c", "--config", type=str, required=True, help="config file path"
+    )
+    parser.add_argument(
+        "--symbol", type=str, required=True, help="The trading symbol to use"
+    )
+    parser.add_argument(
+        "--strategy", type=str, required=True, help="The strategy to use"
+    )
+    parser.add_argument(
+        "--days", type=int, default=7, help="download data for given number of days"
+    )
+    parser.add_argument(
+        "-t",
+        "--timeframe",
+        type=str,
+        required=True,
+        help="timeframe: 1m 5m 15m 30m 1h 4h 1d 1w 1M",
+    )
+    parser.add_argument(
+        "--base_timeframe",
+        type=str,
+        default=None,
+        help="build the timeframe from the candles of this lower timeframe, eg. 1m",
+    )
+    parser.add_argument(
+        "--grid",
+        type=str,
+        action="append",
+        required=True,
+        help="param values, eg. --grid fast_period=8,12,16 --grid slow_period=21,26",
+    )
+    parser.add_argument(
+        "--random",
+        type=int,
+        default=0,
+        help="random search budget, number of grid combinations to try",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="random search seed")
+    parser.add_argument("--reversals", action="store_true", help="reversals")
+    parser.add_argument(
+        "--amount", type=float, default=1, help="The usdt amount to trade"
+    )
+    parser.add_argument(
+        "--amount_max",
+        type=float,
+        default=1,
+        help="The usdt amount max limit to trade",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="compute the macd periods of all the trials in one pass, in one process",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=os.cpu_count(), help="number of workers"
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, default=None, help="results csv file path"
+    )
+    # add arg verbose
+    parser.add_argument("-v", "--verbose", action="store_true", help="verbose mode")
+    args = parser.parse_args()
+
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
+
+    if args.batch and args.strategy != "macd":
+        parser.error("--batch only supports the macd strategy")
+    grid = parse_grid(args.grid)
+    if args.random > 0:
+        trials = random_params(grid, args.random, args.seed)
+    else:
+        trials = param_grid(grid)
+    logger.info(f"exbot sweep {args.strategy}: {len(trials)} trials, grid: {grid}")
+
+    config = load_config(args.config)
+    ex = exchange.Exchange(config.exchange).get()
+    ex.load_markets()
+    # 只加载一次蜡烛图，所有的参数组合共享
+    df = live.get_charting(
+        ex, args.symbol, args.timeframe, args.days, base_timeframe=args.base_timeframe
+    )
+    if args.batch:
+        results = macd_grid(df, trials, args.reversals, args.amount, args.amount_max)
+    else:
+        results = run_sweep(
+            df,
+            args.strategy,
+            trials,
+            args.reversals,
+            args.amount,
+            args.amount_max,
+            args.workers,
+        )
+    logger.info(f"sweep results:\n{results.head(20)}")
+    output = args.output or os.path.join(
+        "data",
+        "sweep",
+        f"{args.strategy}_{args.symbol.replace('/', '_').replace(':', '_')}_{args.timeframe}.csv",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    results.to_csv(output, index=False)
+    logger.info(f"sweep results saved: {output}")
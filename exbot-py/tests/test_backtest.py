@@ -0,0 +1,113 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.backtest import cal_profit, run_backtest
+from strategies import ichiv1, macd
+from tests.test_macd import random_frame
+
+
+def legacy_backtesting(df, reversals=False, uamount=6, uamount_max=6):
+    """
+    the row loop of backtesting.backtesting before the engine, without logging
+    :return: total profit, total fee, unsettled profit
+    """
+    hold_side = None
+    position_spend = 0
+    position_amount = 0
+    total_profit = 0
+    total_fee = 0
+    last_price = 0
+    for index, row in df.iterrows():
+        last_price = row["close"]
+        if pd.notnull(row["buy"]) or pd.notnull(row["sell"]):
+            signal = "buy" if pd.notnull(row["buy"]) else "sell"
+            per_amount = uamount / float(row["close"])
+            if hold_side is None:
+                hold_side = signal
+                position_spend = float(row["close"]) * per_amount
+                position_amount = per_amount
+            else:
+                if signal == hold_side:
+                    if position_spend >= uamount_max:
+                        continue
+                    position_spend += float(row["close"]) * per_amount
+                    position_amount += per_amount
+                else:
+                    profit, fee = cal_profit(
+                        hold_side, position_spend, position_amount, row["close"]
+                    )
+                    total_profit += profit
+                    total_fee += fee
+                    if reversals:
+                        hold_side = signal
+                        position_spend = float(row["close"]) * per_amount
+                        position_amount = per_amount
+                    else:
+                        hold_side = None
+    unsettled = 0
+    if hold_side is not None:
+        unsettled, _ = cal_profit(
+            hold_side, position_spend, position_amount, last_price
+        )
+    return total_profit, total_fee, unsettled
+
+
+def strategy_frame(stgy, df):
+    df = stgy.populate_indicators(df)
+    df = stgy.populate_buy_trend(df)
+    df = stgy.populate_sell_trend(df)
+    return stgy.populate_close_position(df)
+
+
+class TestBacktest(unittest.TestCase):
+    def test_parity(self):
+        frames = [strategy_frame(macd.macd(), random_frame(2000, s)) for s in range(3)]
+        frames.append(strategy_frame(ichiv1.ichiv1(), random_frame(2000, 3)))
+        for df in frames:
+            for reversals in [False, True]:
+                for uamount, uamount_max in [(6, 6), (5, 20), (1, 100)]:
+                    expected = legacy_backtesting(df, reversals, uamount, uamount_max)
+                    result = run_backtest(df, reversals, uamount, uamount_max)
+                    assert (
+                        result.total_profit,
+                        result.total_fee,
+                        result.unsettled_profit,
+                    ) == expected
+
+    def test_ledger(self):
+        index = pd.date_range("2024-01-01", periods=6, freq="1min", name="date")
+        df = pd.DataFrame(
+            {
+                "close": [10.0, 8.0, 12.0, 11.0, 10.0, 9.0],
+                "buy": [1, 1, np.nan, np.nan, np.nan, np.nan],
+                "sell": [np.nan, np.nan, 1, np.nan, np.nan, 1],
+            },
+            index=index,
+        )
+        result = run_backtest(df, reversals=True, uamount=10, uamount_max=20)
+        assert result.trades["action"].tolist() == [
+            "open",
+            "add",
+            "close",
+            "open",
+            "add",
+        ]
+        close = result.trades.iloc[2]
+        profit, fee = cal_profit("buy", 20.0, 1 + 10 / 8, 12.0)
+        assert close["profit"] == profit
+        assert close["fee"] == fee
+        assert result.total_profit == profit
+        # the open position is valued at the close price, with its fee
+        assert (
+            result.equity.iloc[2] == profit + cal_profit("sell", 10.0, 10 / 12, 12.0)[0]
+        )
+        upnl, _ = cal_profit("sell", 10.0, 10 / 12, 11.0)
+        assert result.equity.iloc[3] == profit + upnl
+        assert result.hold_side == "sell"
+        assert result.equity.iloc[-1] == profit + result.unsettled_profit
+
+
+if __name__ == "__main__":
+    unittest.main()
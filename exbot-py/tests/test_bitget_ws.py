@@ -0,0 +1,197 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import websockets
+
+from core.feed import LiveCandleFeed
+from exchanges.bitget import BitgetExchange
+from exchanges.bitget_ws import BitgetKlineStream
+from tests.test_download import MINUTE, FakeBitget
+
+
+class KlineServer:
+    """
+    Local stand-in for the bitget public websocket.
+    Answers pings, acks subscriptions and pushes the queued messages,
+    the first connection is dropped after its pushes to test reconnects.
+    """
+
+    def __init__(self, pushes):
+        """
+        :param pushes: connection index -> [(channel, inst_id, [candle, ...]), ...]
+        """
+        self.pushes = pushes
+        self.connections = 0
+        self.pings = 0
+        self.subscribed = []
+        self.ready = threading.Event()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    async def handler(self, ws):
+        index = self.connections
+        self.connections += 1
+        subscribe = json.loads(await ws.recv())
+        self.subscribed.append(subscribe)
+        for arg in subscribe["args"]:
+            await ws.send(json.dumps({"event": "subscribe", "arg": arg}))
+        for channel, inst_id, candles in self.pushes.get(index, []):
+            arg = {"instType": "USDT-FUTURES", "channel": channel, "instId": inst_id}
+            data = [[str(x) for x in c] + ["0", "0"] for c in candles]
+            await ws.send(json.dumps({"action": "update", "arg": arg, "data": data}))
+        if index == 0:
+            await ws.close()
+            return
+        async for message in ws:
+            if message == "ping":
+                self.pings += 1
+                await ws.send("pong")
+
+    async def _serve(self):
+        self.server = await websockets.serve(self.handler, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+
+    def start(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._serve(), self.loop)
+        self.ready.wait(5)
+        return f"ws://127.0.0.1:{self.port}"
+
+    def stop(self):
+        async def close():
+            self.server.close()
+            await self.server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class MarketBitget(FakeBitget):
+    def market(self, symbol):
+        return {"id": symbol.split("/")[0] + "USDT_UMCBL"}
+
+
+class TestBitgetKlineStream(unittest.TestCase):
+    def test_stream(self):
+        server = KlineServer(
+            {
+                0: [("candle1m", "BTCUSDT", [[MINUTE, 1, 2, 0.5, 1.5, 10]])],
+                1: [
+                    (
+                        "candle1m",
+                        "BTCUSDT",
+                        [
+                            [3 * MINUTE, 1, 2, 0.5, 1.5, 10],
+                            [2 * MINUTE, 1, 2, 0.5, 1, 5],
+                        ],
+                    ),
+                    # not subscribed
+                    ("candle5m", "BTCUSDT", [[0, 1, 2, 0.5, 1.5, 10]]),
+                ],
+            }
+        )
+        url = server.start()
+        received = []
+        reconnects = []
+        stream = BitgetKlineStream(
+            [("BTC/USDT:USDT", "1m", "BTCUSDT")],
+            lambda *x: received.append(x),
+            lambda: reconnects.append(time.time()),
+            url=url,
+            ping_interval=0.05,
+            max_backoff=0.1,
+        )
+        stream.start()
+        try:
+            assert wait_until(lambda: len(received) == 3 and server.pings > 0)
+        finally:
+            stream.stop()
+            server.stop()
+        assert server.subscribed[0] == {
+            "op": "subscribe",
+            "args": [
+                {"instType": "USDT-FUTURES", "channel": "candle1m", "instId": "BTCUSDT"}
+            ],
+        }
+        assert server.connections == 2
+        # called after resubscribing only
+        assert len(reconnects) == 1
+        assert [c[0] for _, _, c in received] == [MINUTE, 2 * MINUTE, 3 * MINUTE]
+        assert received[1] == (
+            "BTC/USDT:USDT",
+            "1m",
+            [2 * MINUTE, 1.0, 2.0, 0.5, 1.0, 5.0],
+        )
+
+
+class TestFeedPush(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_watch(self):
+        fake = MarketBitget(20000 * MINUTE)
+        feed = LiveCandleFeed(BitgetExchange(fake), interval=10, min_capacity=10)
+        btc = feed.stream("BTC/USDT:USDT", "1m", days=0.1)
+        btc_5m = feed.stream("BTC/USDT:USDT", "5m", days=0.1, base_timeframe="1m")
+        server = KlineServer(
+            {
+                1: [
+                    ("candle1m", "BTCUSDT", [[20000 * MINUTE, 1, 3, 0.5, 2.5, 20]]),
+                    ("candle1m", "BTCUSDT", [[20001 * MINUTE, 2.5, 3, 2, 2, 1]]),
+                ]
+            }
+        )
+        url = server.start()
+        feed.watch([("BTC/USDT:USDT", "5m")], url=url, max_backoff=0.1)
+        try:
+            assert feed.wait(5)
+            assert wait_until(lambda: btc.buffer.last_date() == 20001 * MINUTE)
+        finally:
+            feed.close()
+            server.stop()
+        assert btc.streaming
+        assert btc.buffer.values()[-2][1] == 3
+        assert btc_5m.buffer.last_date() == 20000 * MINUTE
+        assert btc_5m.buffer.values()[-1][3] == 2
+        # pushed streams are not polled while they are fresh
+        assert feed.due(time.time() + 15) == []
+        assert feed.due(time.time() + 30) == [btc]
+
+        # a gap in the pushes is fetched over REST
+        fake.now = 20003 * MINUTE
+        feed.push("BTC/USDT:USDT", "1m", [20003 * MINUTE, 1, 2, 0.5, 4, 1])
+        # in a worker thread, off the websocket event loop
+        assert wait_until(lambda: btc.pending is None)
+        assert btc.buffer.dates()[-2] == 20002 * MINUTE
+        assert btc.buffer.values()[-1][3] == 4
+        assert btc_5m.buffer.values()[-1][3] == 4
+
+        frame = feed.get_frame("BTC/USDT:USDT", "1m")
+        assert frame["close"].iloc[-1] == 4
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from core import backtest, tpsl
+from core.cache import ResultCache, backtest_key, source_files
+from strategies.ichiv1 import ichiv1
+from strategies.istrategy import IStrategy
+from strategies.macd import macd
+from tests.test_macd import random_frame
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_backtest_key(self):
+        df = random_frame(500, 1)
+        key = backtest_key(df, macd(), reversals=False, amount=5)
+        assert key == backtest_key(df.copy(), macd(), reversals=False, amount=5)
+        # candles, params, strategy and backtest args
+        changed = df.copy()
+        changed.iloc[-1, changed.columns.get_loc("close")] += 1
+        assert key != backtest_key(changed, macd(), reversals=False, amount=5)
+        assert key != backtest_key(
+            df, macd({"fast_period": 8}), reversals=False, amount=5
+        )
+        assert key != backtest_key(df, ichiv1(), reversals=False, amount=5)
+        assert key != backtest_key(df, macd(), reversals=True, amount=5)
+        with mock.patch.dict(os.environ, {"CONDITION_DEA": "true"}):
+            assert key != backtest_key(df, macd(), reversals=False, amount=5)
+        # strategy source
+        with mock.patch("core.cache.source_fingerprint", return_value="changed"):
+            assert key != backtest_key(df, macd(), reversals=False, amount=5)
+
+    def test_source_files(self):
+        files = [
+            os.path.relpath(f) for f in source_files(ichiv1, IStrategy, backtest, tpsl)
+        ]
+        # the modules imported by the strategy and the backtest engine
+        for name in ["indicators", "incremental", "tpsl", "backtest", "ringbuffer"]:
+            assert os.path.join("core", f"{name}.py") in files, name
+        assert os.path.join("strategies", "strategy.py") in files
+        files = [os.path.relpath(f) for f in source_files(macd)]
+        assert os.path.join("core", "indicators.py") not in files
+        assert os.path.join("core", "chart.py") not in files
+
+    def test_get_put(self):
+        cache = ResultCache(self.tmpdir.name)
+        assert cache.get("a") is None
+        cache.put("a", {"total_profit": 1.5})
+        assert cache.get("a") == {"total_profit": 1.5}
+        # a broken file is a miss
+        with open(os.path.join(self.tmpdir.name, "b.pkl"), "wb") as f:
+            f.write(b"broken")
+        assert cache.get("b") is None
+        assert not os.path.exists(os.path.join(self.tmpdir.name, "b.pkl"))
+
+    def test_evict(self):
+        cache = ResultCache(self.tmpdir.name, max_bytes=2500)
+        for key in ["a", "b"]:
+            cache.put(key, b"x" * 1000)
+            time.sleep(0.01)
+        # a is used after b
+        cache.get("a")
+        time.sleep(0.01)
+        cache.put("c", b"x" * 1000)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+
+
+if __name__ == "__main__":
+    unittest.main()
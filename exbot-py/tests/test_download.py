@@ -0,0 +1,128 @@
+import functools
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import ccxt
+
+from core.candle import get_candle_store, sync_candles
+from download import download_all, usdt_perpetual_symbols
+from exchanges.bitget import BitgetExchange
+
+MINUTE = 60000
+
+
+class FakeBitget(ccxt.bitget):
+    """
+    1m candles until now, pages of at most page_size candles
+    """
+
+    def __init__(self, now, page_size=1000):
+        super().__init__()
+        self.now = now
+        self.page_size = page_size
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def milliseconds(self):
+        return self.now
+
+    def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params={}):
+        with self.lock:
+            self.calls += 1
+        if since is None:
+            since = self.now - limit * MINUTE
+        start = -(-since // MINUTE) * MINUTE
+        limit = min(limit, self.page_size)
+        return [
+            [ts, 1.0, 2.0, 0.5, 1.5, float(ts)]
+            for ts in range(start, min(start + limit * MINUTE, self.now + 1), MINUTE)
+        ]
+
+
+class TestGetAllCandles(unittest.TestCase):
+    def test_windows(self):
+        now = 10000 * MINUTE + 30000
+        ex = BitgetExchange(FakeBitget(now))
+        candles = ex.get_all_candles("BTC/USDT:USDT", "1m", since=1000 * MINUTE)
+        dates = [x[0] for x in candles]
+        assert dates == list(range(1000 * MINUTE, 10001 * MINUTE, MINUTE))
+        # one request per window
+        assert ex.exchange.calls == 10
+
+    def test_until(self):
+        ex = BitgetExchange(FakeBitget(10000 * MINUTE))
+        candles = ex.get_all_candles(
+            "BTC/USDT:USDT", "1m", since=100 * MINUTE + 1, until=2500 * MINUTE
+        )
+        dates = [x[0] for x in candles]
+        assert dates == list(range(101 * MINUTE, 2500 * MINUTE, MINUTE))
+
+    def test_small_pages(self):
+        ex = BitgetExchange(FakeBitget(3000 * MINUTE, page_size=200))
+        candles = ex.get_all_candles("BTC/USDT:USDT", "1m", since=0)
+        dates = [x[0] for x in candles]
+        assert dates == list(range(0, 3001 * MINUTE, MINUTE))
+
+
+class DownloadBitget(FakeBitget):
+    """
+    records the downloaded (symbol, timeframe), the candles of BAD fail
+    """
+
+    def __init__(self, now):
+        super().__init__(now)
+        self.jobs = set()
+
+    def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params={}):
+        with self.lock:
+            self.jobs.add((symbol, timeframe))
+        if symbol.startswith("BAD/"):
+            raise ccxt.ExchangeError(f"no candles of {symbol}")
+        return super().fetch_ohlcv(symbol, timeframe, since, limit, params)
+
+
+class TestDownloadAll(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_usdt_perpetual_symbols(self):
+        perp = {"swap": True, "linear": True, "quote": "USDT", "active": True}
+        markets = {
+            "BTC/USDT:USDT": perp,
+            "ETH/USDT:USDT": {**perp, "active": None},
+            "XRP/USDT:USDT": {**perp, "active": False},
+            "BTC/USD:BTC": {**perp, "linear": False, "quote": "USD"},
+            "BTC/USDC:USDC": {**perp, "quote": "USDC"},
+            "BTC/USDT": {**perp, "swap": False},
+            "NEAR/USDT:USDT": {**perp, "linear": False},
+        }
+        assert usdt_perpetual_symbols(markets) == ["BTC/USDT:USDT", "ETH/USDT:USDT"]
+
+    def test_download_all(self):
+        fake = DownloadBitget(20000 * MINUTE)
+        symbols = ["BTC/USDT:USDT", "BAD/USDT:USDT", "ETH/USDT:USDT"]
+        ex = BitgetExchange(fake)
+        # the failed fetches are retried without waiting
+        ex.get_candles = functools.partial(ex.get_candles, delay=0)
+        with mock.patch("download.sync_candles", wraps=sync_candles) as sync:
+            failed = download_all(ex, symbols, ["1m", "5m"], 0.1, workers=3)
+        # symbols x timeframes, the failed jobs do not stop the others
+        jobs = {(s, t) for s in symbols for t in ["1m", "5m"]}
+        assert fake.jobs == jobs
+        assert {call.args[1:3] for call in sync.call_args_list} == jobs
+        assert sorted(failed) == [("BAD/USDT:USDT", "1m"), ("BAD/USDT:USDT", "5m")]
+        store = get_candle_store("bitget", "ETH/USDT:USDT", "1m")
+        assert len(store.read()["date"]) > 0
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from core.candle import sync_candles
+from core.feed import LiveCandleFeed, offline_frame
+from exchanges.bitget import BitgetExchange
+from tests.test_download import MINUTE, FakeBitget
+
+
+class PollingBitget(FakeBitget):
+    def __init__(self, now):
+        super().__init__(now)
+        self.polls = []
+
+    def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params={}):
+        self.polls.append((symbol, timeframe))
+        return super().fetch_ohlcv(symbol, timeframe, since, limit, params)
+
+
+class TestLiveCandleFeed(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_streams(self):
+        fake = PollingBitget(20000 * MINUTE)
+        feed = LiveCandleFeed(BitgetExchange(fake), interval=10, min_capacity=10)
+        btc = feed.stream("BTC/USDT:USDT", "1m", days=0.1)
+        eth = feed.stream("ETH/USDT:USDT", "1m", days=0.1)
+        btc_5m = feed.stream("BTC/USDT:USDT", "5m", days=0.1, base_timeframe="1m")
+        assert btc_5m.base is btc
+        assert btc.buffer.last_date() == 20000 * MINUTE
+        assert btc_5m.buffer.last_date() == 20000 * MINUTE
+        fake.polls = []
+
+        # freshly loaded streams are not due
+        assert feed.due() == []
+        feed.refresh()
+        assert fake.polls == []
+
+        btc.updated -= 20
+        eth.updated -= 5
+        assert feed.due() == [btc]
+        assert feed.staleness("BTC/USDT:USDT", "5m") >= 20
+        fake.now += 3 * MINUTE
+        feed.get_buffer("ETH/USDT:USDT", "1m")
+        # only the due stream is polled
+        assert fake.polls == [("BTC/USDT:USDT", "1m")]
+        assert feed.staleness("BTC/USDT:USDT", "1m") < 1
+        assert btc.buffer.last_date() == 20003 * MINUTE
+        # the missed candles are caught up
+        assert btc.buffer.dates()[-4:].tolist() == [
+            20000 * MINUTE,
+            20001 * MINUTE,
+            20002 * MINUTE,
+            20003 * MINUTE,
+        ]
+        assert btc_5m.buffer.last_date() == 20000 * MINUTE
+        assert btc_5m.buffer.values()[-1][3] == 1.5
+
+        # every due stream is refreshed in one batch
+        btc.updated -= 20
+        eth.updated -= 20
+        fake.polls = []
+        frame = feed.get_frame("BTC/USDT:USDT", "5m")
+        # only the frames of the live strategies are tagged
+        assert frame.attrs == {}
+        assert sorted(fake.polls) == [
+            ("BTC/USDT:USDT", "1m"),
+            ("ETH/USDT:USDT", "1m"),
+        ]
+        assert feed.last_update("BTC/USDT:USDT", "5m") == btc.updated
+        assert feed.last_update("XRP/USDT:USDT", "1m") == 0.0
+        frame = feed.get_frame("BTC/USDT:USDT", "5m", live=True)
+        assert frame.attrs == {"symbol": "BTC/USDT:USDT", "timeframe": "5m"}
+
+    def test_catch_up(self):
+        fake = PollingBitget(20000 * MINUTE)
+        feed = LiveCandleFeed(BitgetExchange(fake), interval=10, min_capacity=10)
+        btc = feed.stream("BTC/USDT:USDT", "1m", days=0.1, capacity=100)
+        btc_5m = feed.stream("BTC/USDT:USDT", "5m", days=0.1, base_timeframe="1m")
+        fake.polls = []
+        # stalled for 30 bars
+        fake.now += 30 * MINUTE
+        feed.refresh([btc])
+        dates = btc.buffer.dates()
+        assert len(btc.buffer) == 100
+        assert dates[-1] == 20030 * MINUTE
+        assert (dates[1:] - dates[:-1] == MINUTE).all()
+        assert btc_5m.buffer.dates()[-7:].tolist() == list(
+            range(20000 * MINUTE, 20031 * MINUTE, 5 * MINUTE)
+        )
+        # only the missed range is fetched
+        assert fake.polls == [("BTC/USDT:USDT", "1m")]
+
+        # stalled longer than the window
+        fake.now += 1000 * MINUTE
+        feed.refresh([btc])
+        dates = btc.buffer.dates()
+        assert dates[0] == 20931 * MINUTE
+        assert dates[-1] == 21030 * MINUTE
+        assert (dates[1:] - dates[:-1] == MINUTE).all()
+
+    def test_push_gap(self):
+        fake = PollingBitget(20000 * MINUTE)
+        feed = LiveCandleFeed(BitgetExchange(fake), interval=10, min_capacity=10)
+        btc = feed.stream("BTC/USDT:USDT", "1m", days=0.1)
+        fetch = fake.fetch_ohlcv
+        fetching, release = threading.Event(), threading.Event()
+
+        def blocked_fetch(*args, **kwargs):
+            fetching.set()
+            release.wait(5)
+            return fetch(*args, **kwargs)
+
+        fake.fetch_ohlcv = blocked_fetch
+        fake.now += 3 * MINUTE
+        # the push returns while the missed candles are fetched
+        feed.push("BTC/USDT:USDT", "1m", [20003 * MINUTE, 1, 2, 0.5, 4, 1])
+        assert fetching.wait(5)
+        assert btc.buffer.last_date() == 20000 * MINUTE
+        # the next pushes wait for the catch up
+        feed.push("BTC/USDT:USDT", "1m", [20003 * MINUTE, 1, 2, 0.5, 5, 1])
+        feed.push("BTC/USDT:USDT", "1m", [20004 * MINUTE, 5, 6, 5, 6, 1])
+        assert btc.buffer.last_date() == 20000 * MINUTE
+        release.set()
+        feed.close()
+        assert btc.pending is None
+        assert btc.buffer.dates()[-5:].tolist() == [
+            20000 * MINUTE + i * MINUTE for i in range(5)
+        ]
+        assert btc.buffer.values()[-2][3] == 5
+        assert btc.buffer.values()[-1][3] == 6
+
+    def test_offline_frame(self):
+        fake = PollingBitget(20000 * MINUTE)
+        sync_candles(BitgetExchange(fake), "BTC/USDT:USDT", "1m", days=0.1)
+        fake.polls = []
+        start, end = 19900 * MINUTE, 19950 * MINUTE
+        df = offline_frame("bitget", "BTC/USDT:USDT", "1m", start, end)
+        assert len(df) == 50
+        assert df.index[0].value // 10**6 == start
+        assert str(df.index.tz) == "Asia/Shanghai"
+        df = offline_frame(
+            "bitget", "BTC/USDT:USDT", "5m", start + 2 * MINUTE, end, "1m"
+        )
+        assert len(df) == 10
+        assert df["volume"].iloc[0] == sum(range(start, start + 5 * MINUTE, MINUTE))
+        # the stored ranges are read, nothing is downloaded
+        assert fake.polls == []
+        # the last candle may have been incomplete
+        with self.assertRaises(ValueError):
+            offline_frame("bitget", "BTC/USDT:USDT", "1m", start, 20001 * MINUTE)
+        with self.assertRaises(ValueError):
+            offline_frame("bitget", "ETH/USDT:USDT", "1m", start, end)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import subprocess
+import sys
+import unittest
+
+PLOTTING = ["plotly", "dash", "core.chart"]
+
+
+def import_times(module):
+    """
+    import the module in a new interpreter with -X importtime
+    :return: module name -> cumulative import time in us
+    """
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    times = {}
+    for line in err.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImports(unittest.TestCase):
+    def test_headless(self):
+        # the trading loop and the backtester run without the plotting stack
+        for module in ["bot", "backtesting"]:
+            times = import_times(module)
+            assert module in times
+            for name in times:
+                root = name.split(".")[0]
+                assert root not in PLOTTING and name not in PLOTTING, (module, name)
+
+    def test_chart(self):
+        times = import_times("core.chart")
+        assert "plotly" in times
+        assert "core.live" in times
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,243 @@
+import unittest
+from argparse import Namespace
+
+import freqtrade.vendor.qtpylib.indicators as qtpylib
+import numpy as np
+import pandas as pd
+import talib
+
+from core.incremental import (
+    ATR,
+    EMA,
+    MACD,
+    HeikinAshi,
+    IndicatorSeries,
+    RollingMax,
+    RollingMin,
+)
+from strategies import ichiv1, macd
+from strategies.manager import strategy_history
+
+
+def get_frame():
+    df = pd.read_json("tests/ohlcv.json")
+    df.index = df.index.tz_localize("UTC").tz_convert("Asia/Shanghai").rename("date")
+    return df[["open", "high", "low", "close", "volume"]]
+
+
+def run(indicator, *inputs):
+    """
+    update every bar twice, a partial bar first and then the final bar
+    """
+    outputs = []
+    for date, values in enumerate(zip(*inputs)):
+        indicator.update(date, *[v * 1.01 for v in values])
+        outputs.append(indicator.update(date, *values))
+    return np.array(outputs)
+
+
+class TestIndicators(unittest.TestCase):
+    def setUp(self):
+        df = get_frame()
+        self.df = df
+        self.open = df["open"].values
+        self.high = df["high"].values
+        self.low = df["low"].values
+        self.close = df["close"].values
+
+    def test_ema(self):
+        for period in [3, 12, 96]:
+            np.testing.assert_array_equal(
+                run(EMA(period), self.close), talib.EMA(self.close, period)
+            )
+
+    def test_macd(self):
+        expected = np.column_stack(talib.MACD(self.close, 12, 26, 9))
+        result = run(MACD(12, 26, 9), self.close)
+        np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-15)
+
+    def test_atr(self):
+        expected = talib.ATR(self.high, self.low, self.close, 14)
+        result = run(ATR(14), self.high, self.low, self.close)
+        np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+    def test_heikinashi(self):
+        expected = qtpylib.heikinashi(self.df.reset_index())
+        result = run(HeikinAshi(), self.open, self.high, self.low, self.close)
+        np.testing.assert_array_equal(
+            result, expected[["open", "high", "low", "close"]].values
+        )
+
+    def test_rolling(self):
+        for window in [1, 20, 120]:
+            np.testing.assert_array_equal(
+                run(RollingMax(window), self.high),
+                pd.Series(self.high).rolling(window).max().values,
+            )
+            np.testing.assert_array_equal(
+                run(RollingMin(window), self.low),
+                pd.Series(self.low).rolling(window).min().values,
+            )
+
+    def test_older_bar(self):
+        ema = EMA(3)
+        ema.update(2, 1.0)
+        with self.assertRaises(ValueError):
+            ema.update(1, 1.0)
+        for indicator in [EMA(3), RollingMax(3)]:
+            for date in range(5):
+                indicator.update(date, 1.0)
+            with self.assertRaises(ValueError):
+                indicator.update(2, 1.0)
+
+    def test_revise_previous_bar(self):
+        """
+        the previous bar is revised after the last bar was updated
+        """
+
+        def run_revised(indicator, *inputs):
+            outputs = []
+            for date, values in enumerate(zip(*inputs)):
+                indicator.update(date, *[v * 1.01 for v in values])
+                if date > 0:
+                    previous = [v[date - 1] for v in inputs]
+                    indicator.update(date - 1, *[v * 0.99 for v in previous])
+                    indicator.update(date, *[v * 1.02 for v in values])
+                    indicator.update(date - 1, *previous)
+                outputs.append(indicator.update(date, *values))
+            return np.array(outputs)
+
+        np.testing.assert_array_equal(
+            run_revised(EMA(12), self.close), talib.EMA(self.close, 12)
+        )
+        expected = np.column_stack(talib.MACD(self.close, 12, 26, 9))
+        result = run_revised(MACD(12, 26, 9), self.close)
+        np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-15)
+        for window in [1, 20]:
+            np.testing.assert_array_equal(
+                run_revised(RollingMax(window), self.high),
+                pd.Series(self.high).rolling(window).max().values,
+            )
+            np.testing.assert_array_equal(
+                run_revised(RollingMin(window), self.low),
+                pd.Series(self.low).rolling(window).min().values,
+            )
+
+
+class TestIndicatorSeries(unittest.TestCase):
+    def test_window(self):
+        df = get_frame()
+        series = IndicatorSeries({"ema": (EMA(12), ["close"])})
+        expected = talib.EMA(df["close"].values, 12)
+        # a sliding window of 100 candles
+        for end in range(100, len(df) + 1):
+            values = series.update(df.iloc[end - 100 : end])
+            np.testing.assert_array_equal(values["ema"], expected[end - 100 : end])
+        # a window older than the kept values
+        values = series.update(df.iloc[:10])
+        assert np.isnan(values["ema"]).all()
+
+    def test_revise_previous_bar(self):
+        df = get_frame()
+        n = len(df)
+        series = IndicatorSeries({("dif", "dea", "macd"): (MACD(), ["close"])})
+        series.update(df.iloc[: n - 1])
+        series.update(df)
+        # the poll of the last 2 candles repairs the previous bar
+        revised = df.copy()
+        revised.iloc[n - 2, revised.columns.get_loc("close")] *= 1.05
+        values = series.update(revised)
+        expected = talib.MACD(revised["close"].values, 12, 26, 9)
+        for name, column in zip(["dif", "dea", "macd"], expected):
+            np.testing.assert_allclose(values[name], column, rtol=1e-12, err_msg=name)
+        values = series.update(df)
+        expected = talib.MACD(df["close"].values, 12, 26, 9)
+        np.testing.assert_allclose(values["dif"], expected[0], rtol=1e-12)
+
+
+class TestLiveStrategy(unittest.TestCase):
+    def test_live_indicators(self):
+        df = get_frame()
+        for cls in [macd.macd, ichiv1.ichiv1]:
+            stgy = cls()
+            expected = stgy.populate_indicators(df.copy())
+            live = df.copy()
+            live.attrs.update(symbol="BTC/USDT:USDT", timeframe="1m")
+            stgy.populate_indicators(live.iloc[:400])
+            for end in range(401, len(df) + 1):
+                # the live candle is revised on every tick
+                tick = live.iloc[:end].copy()
+                tick.iloc[-1, tick.columns.get_loc("close")] *= 1.01
+                # and the previous candle is repaired by the next poll
+                tick.iloc[-2, tick.columns.get_loc("high")] *= 1.01
+                stgy.populate_indicators(tick)
+                result = stgy.populate_indicators(live.iloc[:end])
+            assert list(result.columns) == list(expected.columns)
+            for c in expected.columns:
+                if expected[c].dtype == bool:
+                    assert (result[c] == expected[c]).all(), c
+                else:
+                    np.testing.assert_allclose(
+                        result[c].values, expected[c].values, rtol=1e-12, err_msg=c
+                    )
+
+    def test_process_only_new_candles(self):
+        df = get_frame()
+        df.attrs.update(symbol="BTC/USDT:USDT", timeframe="1m")
+        stgy = macd.macd()
+        stgy.process_only_new_candles = True
+        populated = []
+        populate = stgy.populate
+        stgy.populate = lambda frame: populated.append(len(frame)) or populate(frame)
+        args = Namespace(debug=True)
+        for end in range(300, 320):
+            for close in [1.0, 1.01, 0.99]:
+                # ticks of the forming candle
+                tick = df.iloc[:end].copy()
+                tick.iloc[-1, tick.columns.get_loc("close")] *= close
+                result = stgy.run(tick, None, args)
+                assert result.index[-1] == tick.index[-1]
+                assert result["close"].iloc[-1] == tick["close"].iloc[-1]
+        # once per candle, without the forming candle
+        assert populated == list(range(299, 319))
+        # the forming candle has the signals of the closed candles
+        expected = macd.macd().populate(df.iloc[:318].copy())
+        for c in ["buy", "sell", "dif", "dea"]:
+            np.testing.assert_array_equal(result[c].values[:-1], expected[c].values)
+            np.testing.assert_array_equal(result[c].values[-1], expected[c].values[-1])
+        # the backtest frames are always populated
+        frame = df.iloc[:300].copy()
+        frame.attrs = {}
+        stgy.run(frame, None, args)
+        assert len(populated) == 21
+
+    def test_required_candles(self):
+        df = get_frame()
+        stgy = macd.macd()
+        expected = stgy.populate_indicators(df.copy())
+        # the indicators of a window of the required candles converge
+        window = stgy.required_candles()
+        result = stgy.populate_indicators(df.iloc[-window:].copy())
+        for c in ["dif", "dea"]:
+            # the macd is rounded to 6 decimals
+            np.testing.assert_allclose(
+                result[c].iloc[-1], expected[c].iloc[-1], atol=2e-6, err_msg=c
+            )
+        stgy.startup_candle_count = 1000
+        assert stgy.required_candles() == 1000
+        params = {**macd.macd.buy_params, "slow_period": 60}
+        assert macd.macd(params).required_candles() == 4 * 60 + 9
+        ichi = ichiv1.ichiv1()
+        assert ichi.required_candles() == 4 * 96
+
+    def test_strategy_history(self):
+        candles = macd.macd().required_candles() + 20
+        days, capacity = strategy_history("macd", "15m")
+        assert capacity == candles
+        assert days == candles * 15 / (24 * 60)
+        with self.assertRaises(ValueError):
+            strategy_history("unknown", "15m")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+
+import freqtrade.vendor.qtpylib.indicators as qtpylib
+import numpy as np
+import pandas as pd
+import technical.indicators as ftt
+
+from core import indicators
+from tests.test_imports import import_times
+
+
+def get_frame():
+    df = pd.read_json("tests/ohlcv.json")
+    return df[["open", "high", "low", "close", "volume"]].reset_index(drop=True)
+
+
+def random_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open = np.r_[close[0], close[:-1]]
+    return pd.DataFrame(
+        {
+            "open": open,
+            "high": np.maximum(open, close) * (1 + rng.random(n) * 0.001),
+            "low": np.minimum(open, close) * (1 - rng.random(n) * 0.001),
+            "close": close,
+        }
+    )
+
+
+class TestIndicators(unittest.TestCase):
+    def test_heikinashi(self):
+        for df in [get_frame(), random_frame(3000)]:
+            expected = qtpylib.heikinashi(df)
+            columns = ["open", "high", "low", "close"]
+            result = indicators.heikinashi(*(df[c].values for c in columns))
+            for c, values in zip(columns, result):
+                np.testing.assert_allclose(
+                    values, expected[c].values, rtol=1e-14, err_msg=c
+                )
+        # written into the given arrays
+        out = tuple(np.empty(len(df)) for _ in range(4))
+        result = indicators.heikinashi(*(df[c].values for c in columns), out=out)
+        assert all(a is b for a, b in zip(result, out))
+        assert len(indicators.heikinashi(*([np.zeros(0)] * 4))[0]) == 0
+
+    def test_crossed(self):
+        df = random_frame(2000, 1)
+        ema = df["close"].ewm(span=9).mean()
+        result = indicators.crossed_below(df["close"].values, ema.values)
+        expected = qtpylib.crossed_below(df["close"], ema)
+        assert result.any()
+        np.testing.assert_array_equal(result, expected.values)
+        result = indicators.crossed_above(df["close"].values, 100.0)
+        expected = qtpylib.crossed_above(df["close"], 100.0)
+        np.testing.assert_array_equal(result, expected.values)
+
+    def test_rolling(self):
+        rng = np.random.default_rng(2)
+        for n in [1, 7, 119, 120, 121, 1003]:
+            values = rng.normal(size=n)
+            values[rng.random(n) < 0.01] = np.nan
+            for window in [1, 3, 20, 120]:
+                series = pd.Series(values).rolling(window)
+                np.testing.assert_array_equal(
+                    indicators.rolling_max(values, window), series.max().values
+                )
+                np.testing.assert_array_equal(
+                    indicators.rolling_min(values, window), series.min().values
+                )
+
+    def test_shift(self):
+        values = np.arange(5.0)
+        for periods in [-6, -2, 0, 3, 5]:
+            np.testing.assert_array_equal(
+                indicators.shift(values, periods), pd.Series(values).shift(periods)
+            )
+
+    def test_ichimoku(self):
+        for df in [get_frame(), random_frame(3000)]:
+            for params in [
+                {},
+                dict(
+                    conversion_line_period=20,
+                    base_line_periods=60,
+                    laggin_span=120,
+                    displacement=30,
+                ),
+            ]:
+                expected = ftt.ichimoku(df, **params)
+                result = indicators.ichimoku(
+                    df["high"].values, df["low"].values, df["close"].values, **params
+                )
+                assert list(result) == list(expected)
+                for key, values in result.items():
+                    np.testing.assert_array_equal(
+                        values, expected[key].values, err_msg=key
+                    )
+
+    def test_imports(self):
+        times = import_times("strategies.ichiv1")
+        for module in ["freqtrade", "technical"]:
+            assert module not in times, module
+
+
+if __name__ == "__main__":
+    unittest.main()
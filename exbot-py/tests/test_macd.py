@@ -0,0 +1,105 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from strategies.macd import macd
+
+
+def legacy_close_position(df):
+    """
+    the row loop of macd.populate_close_position before it was vectorized
+    """
+    df["take_profit"] = pd.Series(dtype="str")
+    df["stop_loss"] = pd.Series(dtype="str")
+    fall_nums = 0
+    before_macd = 0
+    open_signal = None
+    open_price = 0
+    profit = 0
+    fee_rate = 0.0012
+    fee = 0
+    for index, row in df.iterrows():
+        if pd.notnull(row["signal"]):
+            open_signal = row["signal"]
+            open_price = float(row["close"])
+            fee = open_price * fee_rate
+            fall_nums = 0
+            before_macd = abs(row["macd"])
+            continue
+        if abs(row["macd"]) < before_macd:
+            fall_nums += 1
+        else:
+            fall_nums = 0
+        before_macd = abs(row["macd"])
+        if fall_nums == 4:
+            if open_signal == "buy":
+                profit = float(row["close"]) - open_price - fee
+            elif open_signal == "sell":
+                profit = open_price - float(row["close"]) - fee
+            if profit > 0:
+                df.loc[index, "take_profit"] = open_signal
+                df.loc[index, "profit"] = profit
+            else:
+                df.loc[index, "stop_loss"] = open_signal
+                df.loc[index, "profit"] = profit
+    return df
+
+
+def random_frame(n, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, n))
+    index = pd.date_range(
+        "2024-01-01", periods=n, freq="1min", tz="Asia/Shanghai", name="date"
+    )
+    return pd.DataFrame(
+        {
+            "open": close + rng.normal(0, 0.1, n),
+            "high": close + 1,
+            "low": close - 1,
+            "close": close,
+            "volume": rng.random(n),
+        },
+        index=index,
+    )
+
+
+class TestClosePosition(unittest.TestCase):
+    def assert_parity(self, df):
+        stgy = macd()
+        df = stgy.populate_indicators(df)
+        df = stgy.populate_buy_trend(df)
+        df = stgy.populate_sell_trend(df)
+        expected = legacy_close_position(df.copy())
+        result = stgy.populate_close_position(df.copy())
+        assert list(result.columns) == list(expected.columns)
+        for c in ["take_profit", "stop_loss"]:
+            assert result[c].tolist() == expected[c].tolist(), c
+        if "profit" in expected:
+            np.testing.assert_array_equal(result["profit"], expected["profit"])
+        return result
+
+    def test_ohlcv(self):
+        df = pd.read_json("tests/ohlcv.json")
+        df.index = df.index.tz_localize("UTC").tz_convert("Asia/Shanghai")
+        self.assert_parity(df[["open", "high", "low", "close", "volume"]])
+
+    def test_random(self):
+        for seed in range(5):
+            result = self.assert_parity(random_frame(3000, seed))
+            assert result["profit"].notnull().sum() > 0
+
+    def test_no_signal(self):
+        # closes before the first signal have no open position
+        df = random_frame(200, 0)
+        stgy = macd()
+        df = stgy.populate_indicators(df)
+        df["signal"] = pd.Series(dtype="str")
+        expected = legacy_close_position(df.copy())
+        result = stgy.populate_close_position(df.copy())
+        assert result["stop_loss"].tolist() == expected["stop_loss"].tolist()
+        np.testing.assert_array_equal(result["profit"], expected["profit"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from argparse import Namespace
+
+import numpy as np
+import talib
+
+from core.backtest import run_backtest
+from core.macd_batch import ema_batch, macd_batch, macd_grid, macd_signals
+from core.sweep import param_grid
+from strategies.manager import create_strategy
+from tests.test_macd import random_frame
+
+
+class TestMacdBatch(unittest.TestCase):
+    def test_macd_batch(self):
+        close = random_frame(3000, 1)["close"].values
+        params = [(12, 26, 9), (8, 21, 5), (12, 21, 9), (26, 12, 9), (5, 30, 12)]
+        macd, signal, hist = macd_batch(close, params)
+        for i, p in enumerate(params):
+            expected = talib.MACD(close, *p)
+            for result, values in zip([macd[i], signal[i], hist[i]], expected):
+                np.testing.assert_array_equal(
+                    np.around(result, 6), np.around(values, 6)
+                )
+
+    def test_ema_batch(self):
+        close = random_frame(500, 3)["close"].values
+        emas = ema_batch(close, [3, 12, 26, 600], [0, 14, 5, 0])
+        for row, (period, start) in enumerate([(3, 0), (12, 14), (26, 5)]):
+            expected = np.full(len(close), np.nan)
+            expected[start:] = talib.EMA(close[start:], period)
+            np.testing.assert_array_equal(emas[row], expected)
+        assert np.isnan(emas[3]).all()
+
+    def test_signal_chunks(self):
+        close = random_frame(2000, 4)["close"].values
+        params = param_grid({"fast": [8, 12], "slow": [21, 26, 30], "signal": [5, 9]})
+        params = [(p["fast"], p["slow"], p["signal"]) for p in params]
+        expected = macd_signals(close, params, condition_dea=True, chunk=len(params))
+        for chunk in [1, 5]:
+            result = macd_signals(close, params, condition_dea=True, chunk=chunk)
+            for values, expected_values in zip(result, expected):
+                np.testing.assert_array_equal(values, expected_values)
+
+    def test_macd_signals(self):
+        df = random_frame(3000, 2)
+        params = [(12, 26, 9), (8, 21, 5)]
+        buy, sell = macd_signals(df["close"].values, params, condition_dea=False)
+        for i, p in enumerate(params):
+            stgy = create_strategy(
+                "macd", dict(zip(["fast_period", "slow_period", "signal_period"], p))
+            )
+            frame = stgy.populate_indicators(df.copy())
+            frame = stgy.populate_buy_trend(frame)
+            frame = stgy.populate_sell_trend(frame)
+            np.testing.assert_array_equal(buy[i], frame["buy"].notnull().values)
+            np.testing.assert_array_equal(sell[i], frame["sell"].notnull().values)
+
+    def test_macd_grid(self):
+        df = random_frame(3000, 3)
+        trials = param_grid({"fast_period": [8, 12], "signal_period": [5, 9]})
+        results = macd_grid(df, trials, True, 5, 20)
+        assert len(results) == 4
+        for _, row in results.iterrows():
+            params = {k: int(row[k]) for k in ["fast_period", "signal_period"]}
+            frame = create_strategy("macd", params).run(
+                df.copy(), None, Namespace(debug=True)
+            )
+            assert run_backtest(frame, True, 5, 20).total_profit == row["total_profit"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import subprocess
+import sys
+import unittest
+from importlib.metadata import EntryPoint
+from unittest import mock
+
+from strategies import manager
+from strategies.macd import macd
+
+
+def imported_modules(code):
+    """
+    :return: modules imported by the code in a new interpreter
+    """
+    out = subprocess.run(
+        [sys.executable, "-c", code + "\nimport sys\nprint(' '.join(sys.modules))"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return set(out.split())
+
+
+class TestManager(unittest.TestCase):
+    def test_lazy_import(self):
+        modules = imported_modules(
+            "from strategies.manager import strategys\nstrategys['macd']"
+        )
+        assert "strategies.macd" in modules
+        for module in ["strategies.ichiv1", "freqtrade", "technical", "plotly"]:
+            assert module not in modules, module
+
+    def test_registry(self):
+        assert "macd" in manager.strategys
+        assert "unknown" not in manager.strategys
+        assert set(manager.strategy_classes) >= {"macd", "ichiv1"}
+        assert manager.strategy_classes["macd"] is macd
+        assert manager.strategys["macd"] is manager.strategys["macd"]
+        with self.assertRaises(ValueError):
+            manager.create_strategy("unknown")
+
+    def test_entry_points(self):
+        eps = [
+            EntryPoint("mymacd", "strategies.macd:macd", manager.ENTRY_POINT_GROUP),
+            EntryPoint("macd", "mypackage:macd", manager.ENTRY_POINT_GROUP),
+        ]
+        with mock.patch.object(manager, "entry_points", return_value=eps):
+            paths = manager.discover_strategies()
+        # the built-in strategies are not overridden
+        assert paths == {"mymacd": "strategies.macd:macd"}
+        with mock.patch.dict(manager.strategy_paths):
+            manager.register_strategy("mymacd", paths["mymacd"])
+            assert isinstance(manager.create_strategy("mymacd"), macd)
+            manager.register_strategy("notastrategy", "core.logger:logger")
+            with self.assertRaises(TypeError):
+                manager.strategy_classes["notastrategy"]
+        assert "mymacd" not in manager.strategys
+
+
+if __name__ == "__main__":
+    unittest.main()
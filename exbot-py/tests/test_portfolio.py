@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from core.backtest import backtest_signals
+from core.portfolio import portfolio_backtest, portfolio_signals, symbol_signals
+from tests.test_macd import random_frame
+
+
+class TestPortfolio(unittest.TestCase):
+    def test_single_symbol(self):
+        signals = symbol_signals("macd", None, random_frame(3000, 1))
+        single = backtest_signals(
+            signals["index"],
+            signals["close"],
+            signals["buy"],
+            signals["sell"],
+            True,
+            5,
+            20,
+        )
+        # the capital is never used up
+        result = portfolio_signals({"BTC": signals}, 1000, True, 5, 20)
+        stats = result.symbols["BTC"]
+        assert stats["total_profit"] == single.total_profit
+        assert stats["total_fee"] == single.total_fee
+        assert stats["skipped"] == single.skipped
+        assert stats["skipped_capital"] == 0
+        assert stats["unsettled_profit"] == single.unsettled_profit
+        assert (result.trades["date"].values == single.trades["date"].values).all()
+        assert np.allclose(result.equity["BTC"].values, single.equity.values)
+        assert np.allclose(result.equity["total"].values, single.equity.values)
+
+    def test_shared_capital(self):
+        frames = {
+            "BTC": random_frame(3000, 1),
+            "ETH": random_frame(2000, 2).iloc[500:],
+            "XRP": random_frame(3000, 3),
+        }
+        result = portfolio_backtest(frames, "macd", None, 20, True, 5, 20, workers=2)
+        trades = result.trades
+        assert trades["date"].is_monotonic_increasing
+        # the open positions never spend more than the balance
+        spends = {}
+        for symbol, action, position_spend, realized in trades[
+            ["symbol", "action", "position_spend", "total_profit"]
+        ].values:
+            spends[symbol] = 0 if action == "close" else position_spend
+            assert sum(spends.values()) <= 20 + realized + 1e-9
+        summary = result.summary()
+        assert summary["skipped_capital"].sum() > 0
+        assert summary.loc["total", "total_profit"] == result.total_profit
+        assert list(result.equity.columns) == ["BTC", "ETH", "XRP", "total"]
+        # the equity of every symbol ends with its realized and unsettled profit
+        last = result.equity.iloc[-1]
+        for symbol, stats in result.symbols.items():
+            expected = stats["total_profit"] + stats["unsettled_profit"]
+            assert abs(last[symbol] - expected) < 1e-9
+        assert abs(last["total"] - last[["BTC", "ETH", "XRP"]].sum()) < 1e-9
+
+
+if __name__ == "__main__":
+    unittest.main()
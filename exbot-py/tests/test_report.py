@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.backtest import backtest_signals
+from core.report import export_report, report_metrics
+from tests.test_macd import random_frame
+
+
+class TestReport(unittest.TestCase):
+    def backtest(self, reversals=False):
+        df = random_frame(3000, 1)
+        rng = np.random.default_rng(2)
+        buy = rng.random(len(df)) < 0.02
+        sell = ~buy & (rng.random(len(df)) < 0.02)
+        return backtest_signals(
+            df.index, df["close"].values, buy, sell, reversals, 5, 20
+        )
+
+    def test_metrics(self):
+        result = self.backtest()
+        metrics = report_metrics(result)
+        summary = result.summary()
+        for key in ["total_profit", "trades", "win_rate"]:
+            assert metrics[key] == summary[key]
+        assert abs(metrics["max_drawdown"] - summary["max_drawdown"]) < 1e-9
+
+        closes = result.trades[result.trades["action"] == "close"]["profit"]
+        assert abs(metrics["expectancy"] - closes.mean()) < 1e-9
+        assert abs(metrics["avg_win"] - closes[closes > 0].mean()) < 1e-9
+        assert (
+            abs(
+                metrics["profit_factor"]
+                - closes[closes > 0].sum() / -closes[closes <= 0].sum()
+            )
+            < 1e-9
+        )
+
+        # the position loop of the ledger
+        position = 0
+        sides = []
+        actions = result.trades.set_index("date")
+        for date in result.equity.index:
+            if date in actions.index:
+                rows = actions.loc[[date]]
+                last = rows.iloc[-1]
+                position = (
+                    0
+                    if last["action"] == "close"
+                    else (1 if last["side"] == "buy" else -1)
+                )
+            sides.append(position)
+        sides = np.array(sides)
+        assert (result.position.values == sides).all()
+        assert metrics["exposure"] == (sides != 0).mean()
+        total = metrics["long_exposure"] + metrics["short_exposure"]
+        assert abs(total - metrics["exposure"]) < 1e-12
+
+        pnl = result.equity.diff().fillna(result.equity.iloc[0])
+        sharpe = pnl.mean() / pnl.std(ddof=0) * np.sqrt(365 * 24 * 60)
+        assert abs(metrics["sharpe"] - sharpe) < 1e-9
+
+        # the longest drawdown
+        peak = result.equity.clip(lower=0).cummax()
+        longest, run = 0, 0
+        for under in (result.equity < peak).values:
+            run = run + 1 if under else 0
+            longest = max(longest, run)
+        assert metrics["max_drawdown_candles"] == longest
+
+    def test_profit_factor(self):
+        df = random_frame(100, 1)
+        close = np.linspace(100.0, 200.0, len(df))
+        buy = np.zeros(len(df), dtype=bool)
+        sell = np.zeros(len(df), dtype=bool)
+        # no trades
+        result = backtest_signals(df.index, close, buy, sell)
+        assert np.isnan(report_metrics(result)["profit_factor"])
+        # a winning trade without a loss
+        buy[10] = sell[50] = True
+        result = backtest_signals(df.index, close, buy, sell)
+        metrics = report_metrics(result)
+        assert metrics["trades"] == 1
+        assert metrics["profit_factor"] == np.inf
+        # a losing trade
+        result = backtest_signals(df.index, close[::-1].copy(), buy, sell)
+        assert report_metrics(result)["profit_factor"] == 0.0
+
+    def test_export(self):
+        result = self.backtest(True)
+        with tempfile.TemporaryDirectory() as path:
+            for format, read in [
+                ("parquet", pd.read_parquet),
+                ("arrow", pd.read_feather),
+            ]:
+                paths = export_report(result, path, format=format)
+                assert [os.path.basename(p) for p in paths] == [
+                    f"trades.{format}",
+                    f"equity.{format}",
+                    f"metrics.{format}",
+                ]
+                trades = read(paths[0])
+                assert len(trades) == len(result.trades)
+                assert (trades["date"] == result.trades["date"]).all()
+                equity = read(paths[1])
+                assert (equity["equity"].values == result.equity.values).all()
+                assert (equity["position"].values == result.position.values).all()
+                metrics = read(paths[2])
+                assert metrics["total_profit"][0] == result.total_profit
+        with self.assertRaises(ValueError):
+            export_report(result, path, format="csv")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.resample import Resampler, resample
+
+
+def get_arrays():
+    df = pd.read_json("tests/ohlcv.json")
+    return {
+        "date": df.index.as_unit("ms").asi8,
+        "open": df["open"].values,
+        "high": df["high"].values,
+        "low": df["low"].values,
+        "close": df["close"].values,
+        "volume": df["volume"].values,
+    }
+
+
+class TestResample(unittest.TestCase):
+    def test_resample(self):
+        arrays = get_arrays()
+        for timeframe, rule in [("5m", "5min"), ("15m", "15min"), ("1h", "1h")]:
+            candles = resample(arrays, timeframe)
+            df = pd.DataFrame(arrays).set_index("date")
+            df.index = pd.to_datetime(df.index, unit="ms")
+            expected = df.resample(rule).agg(
+                {
+                    "open": "first",
+                    "high": "max",
+                    "low": "min",
+                    "close": "last",
+                    "volume": "sum",
+                }
+            )
+            assert (
+                candles["date"].tolist() == expected.index.as_unit("ms").asi8.tolist()
+            )
+            for c in ["open", "high", "low", "close", "volume"]:
+                np.testing.assert_allclose(candles[c], expected[c].values)
+
+    def test_resampler(self):
+        arrays = get_arrays()
+        rows = np.column_stack(
+            [arrays[c] for c in ["date", "open", "high", "low", "close", "volume"]]
+        ).tolist()
+        expected = resample(arrays, "15m")
+        resampler = Resampler("15m")
+        candles = {}
+        for i, row in enumerate(rows):
+            # a partial candle first, then the revised candle with the next one
+            partial = row[:4] + [row[1], row[5] / 2]
+            for candle in resampler.update([partial]):
+                candles[candle[0]] = candle
+            for candle in resampler.update(rows[max(i - 1, 0) : i + 1]):
+                candles[candle[0]] = candle
+        result = np.array([candles[d] for d in sorted(candles)])
+        assert result[:, 0].tolist() == expected["date"].tolist()
+        for i, c in enumerate(["open", "high", "low", "close", "volume"], 1):
+            np.testing.assert_allclose(result[:, i], expected[c])
+
+    def test_resampler_batch(self):
+        arrays = get_arrays()
+        rows = np.column_stack(
+            [arrays[c] for c in ["date", "open", "high", "low", "close", "volume"]]
+        ).tolist()
+        expected = resample(arrays, "15m")
+        resampler = Resampler("15m")
+        # a batch spanning many periods, eg. after a stall
+        candles = resampler.update(rows[:10]) + resampler.update(rows[10:])
+        candles = {c[0]: c for c in candles}
+        result = np.array([candles[d] for d in sorted(candles)])
+        assert result[:, 0].tolist() == expected["date"].tolist()
+        np.testing.assert_allclose(result[:, 4], expected["close"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+import numpy as np
+
+from core.ringbuffer import CandleRingBuffer
+
+
+def make_arrays(start, count):
+    dates = np.arange(start, start + count, dtype=np.int64) * 60000
+    values = np.arange(start, start + count, dtype=np.float64)
+    return {
+        "date": dates,
+        "open": values,
+        "high": values + 1,
+        "low": values - 1,
+        "close": values + 0.5,
+        "volume": values * 10,
+    }
+
+
+class TestCandleRingBuffer(unittest.TestCase):
+    def test_extend(self):
+        buffer = CandleRingBuffer(5)
+        buffer.extend(make_arrays(0, 3))
+        assert len(buffer) == 3
+        assert buffer.dates().tolist() == [0, 60000, 120000]
+        # wraps around, the oldest rows are dropped
+        buffer.extend(make_arrays(2, 6))
+        assert len(buffer) == 5
+        assert buffer.dates().tolist() == [i * 60000 for i in range(3, 8)]
+        assert buffer.arrays()["close"].tolist() == [3.5, 4.5, 5.5, 6.5, 7.5]
+        for i in range(8, 20):
+            buffer.extend(make_arrays(i, 1))
+            assert buffer.dates().tolist() == [j * 60000 for j in range(i - 4, i + 1)]
+            assert buffer.values()[:, 0].tolist() == list(range(i - 4, i + 1))
+
+    def test_update(self):
+        buffer = CandleRingBuffer(4)
+        buffer.extend(make_arrays(0, 6))
+        # in place
+        buffer.update([5 * 60000, 1, 2, 3, 4, 5])
+        assert buffer.values()[-1].tolist() == [1, 2, 3, 4, 5]
+        buffer.update([3 * 60000, 1, 2, 3, 4, 5])
+        assert buffer.values()[1].tolist() == [1, 2, 3, 4, 5]
+        # append
+        buffer.update([6 * 60000, 6, 7, 8, 9, 10])
+        assert buffer.dates().tolist() == [i * 60000 for i in range(3, 7)]
+        assert buffer.values()[-1].tolist() == [6, 7, 8, 9, 10]
+        assert buffer.values()[0].tolist() == [1, 2, 3, 4, 5]
+        # out of the window
+        buffer.update([0, 0, 0, 0, 0, 0])
+        assert buffer.dates()[0] == 3 * 60000
+
+    def test_to_frame(self):
+        buffer = CandleRingBuffer(4)
+        buffer.extend(make_arrays(0, 6))
+        df = buffer.to_frame()
+        assert df.index.name == "date"
+        assert df["close"].tolist() == [2.5, 3.5, 4.5, 5.5]
+        assert np.shares_memory(df["close"].values, buffer.values())
+        with self.assertRaises(ValueError):
+            df.loc[df.index[-1], "close"] = 0
+        df["buy"] = 1
+        assert df["buy"].tolist() == [1, 1, 1, 1]
+
+
+if __name__ == "__main__":
+    unittest.main()
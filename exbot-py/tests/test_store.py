@@ -0,0 +1,228 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from core import candle
+from core.store import CandleStore, migrate_json
+
+
+def make_candles(start, count, step=60000):
+    return [
+        [start + i * step, 1.0 + i, 2.0 + i, 0.5 + i, 1.5 + i, 10.0 * i]
+        for i in range(count)
+    ]
+
+
+class TestCandleStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "BTC_USDT:USDT_1m")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_write_read(self):
+        store = CandleStore(self.path)
+        assert len(store) == 0
+        assert store.first() is None
+        store.write(make_candles(0, 10))
+        assert len(store) == 10
+        assert store.first() == 0
+        assert store.last() == 9 * 60000
+
+        arrays = store.read(start=2 * 60000, end=5 * 60000)
+        assert arrays["date"].tolist() == [120000, 180000, 240000]
+        assert arrays["close"].tolist() == [3.5, 4.5, 5.5]
+        assert arrays["date"].dtype == np.int64
+
+    def test_append_overwrites_tail(self):
+        store = CandleStore(self.path)
+        store.write(make_candles(0, 10))
+        # the last candle is updated and new candles are appended
+        candles = make_candles(9 * 60000, 3)
+        candles[0][4] = 99.0
+        store.write(candles)
+        assert len(store) == 12
+        assert store.read()["close"][9] == 99.0
+
+        reopened = CandleStore(self.path)
+        assert len(reopened) == 12
+        assert reopened.last() == 11 * 60000
+
+    def test_write_duplicates(self):
+        store = CandleStore(self.path)
+        candles = make_candles(0, 3) + make_candles(60000, 1)
+        store.write(candles)
+        assert store.read()["date"].tolist() == [0, 60000, 120000]
+
+    def test_write_merge(self):
+        store = CandleStore(self.path)
+        store.write(make_candles(5 * 60000, 5))
+        # head
+        store.write(make_candles(0, 3))
+        assert store.read()["date"].tolist() == [
+            0,
+            60000,
+            120000,
+            300000,
+            360000,
+            420000,
+            480000,
+            540000,
+        ]
+        # interior gap, overlapping the stored rows
+        candles = make_candles(3 * 60000, 3)
+        candles[-1][4] = 99.0
+        store.write(candles)
+        arrays = store.read()
+        assert arrays["date"].tolist() == [i * 60000 for i in range(10)]
+        assert arrays["close"][5] == 99.0
+        assert arrays["close"][9] == 5.5
+
+    def test_ranges(self):
+        store = CandleStore(self.path)
+        assert store.missing(0, 100) == [[0, 100]]
+        store.add_range(10, 20)
+        store.add_range(40, 50)
+        store.add_range(20, 30)
+        assert store.ranges() == [[10, 30], [40, 50]]
+        assert store.missing(0, 100) == [[0, 10], [30, 40], [50, 100]]
+        assert store.missing(15, 45) == [[30, 40]]
+        assert store.missing(12, 28) == []
+        # reopened store keeps its ranges
+        assert CandleStore(self.path).ranges() == [[10, 30], [40, 50]]
+
+    def test_repair(self):
+        store = CandleStore(self.path)
+        store.write(make_candles(0, 5))
+        # simulate an interrupted append of the close column
+        with open(os.path.join(self.path, "close.bin"), "ab") as f:
+            f.write(np.zeros(2).tobytes())
+        store = CandleStore(self.path)
+        assert len(store) == 5
+        assert len(store.read()["close"]) == 5
+
+    def test_migrate_json(self):
+        json_path = self.path + ".json"
+        with open(json_path, "w") as f:
+            json.dump(make_candles(0, 4), f)
+        store = CandleStore(self.path)
+        migrate_json(json_path, store)
+        assert len(store) == 4
+        assert store.ranges() == [[0, 3 * 60000]]
+        assert not os.path.exists(json_path)
+        assert os.path.exists(json_path + ".bak")
+
+    def test_readonly(self):
+        with self.assertRaises(ValueError):
+            CandleStore(self.path, readonly=True)
+        # nothing is created
+        assert not os.path.exists(self.path)
+        store = CandleStore(self.path)
+        store.write(make_candles(0, 5))
+        with self.assertRaises(ValueError):
+            CandleStore(self.path, readonly=True)
+        store.add_range(0, 4 * 60000)
+        # an interrupted append is not repaired, the reads stop at the date column
+        with open(os.path.join(self.path, "close.bin"), "ab") as f:
+            f.write(np.zeros(2).tobytes())
+        files = {
+            name: os.path.getsize(os.path.join(self.path, name))
+            for name in os.listdir(self.path)
+        }
+        store = CandleStore(self.path, readonly=True)
+        assert store.ranges() == [[0, 4 * 60000]]
+        assert store.read()["close"].tolist() == [1.5, 2.5, 3.5, 4.5, 5.5]
+        with self.assertRaises(ValueError):
+            store.write(make_candles(5 * 60000, 1))
+        with self.assertRaises(ValueError):
+            store.add_range(0, 5 * 60000)
+        assert files == {
+            name: os.path.getsize(os.path.join(self.path, name))
+            for name in os.listdir(self.path)
+        }
+
+
+class FakeExchange:
+    """
+    1m candles from 0 to now, records the requested ranges
+    """
+
+    def __init__(self, now):
+        self.now = now
+        self.requests = []
+        self.exchange = self
+
+    def milliseconds(self):
+        return self.now
+
+    def id(self):
+        return "fake"
+
+    def get_all_candles(self, symbol, timeframe, since=None, until=None):
+        self.requests.append((since, until))
+        end = self.now if until is None else until
+        start = -(-since // 60000) * 60000
+        return make_candles(start, len(range(start, end, 60000)))
+
+
+class TestSyncCandles(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_incremental_backfill(self):
+        day = 24 * 60 * 60 * 1000
+        ex = FakeExchange(10 * day)
+        store, since = candle.sync_candles(ex, "BTC/USDT:USDT", "1m", days=2)
+        assert ex.requests == [(8 * day, None)]
+        assert store.read(start=since)["date"][0] == 8 * day
+
+        # tail only, from the last (incomplete) candle
+        ex.now += 5 * 60000
+        ex.requests = []
+        candle.sync_candles(ex, "BTC/USDT:USDT", "1m", days=2)
+        assert ex.requests == [(10 * day - 60000, None)]
+
+        # head only
+        ex.requests = []
+        candle.sync_candles(ex, "BTC/USDT:USDT", "1m", days=3)
+        assert ex.requests == [(ex.now - 3 * day, 8 * day), (ex.now - 60000, None)]
+
+        # interior gap after a pause
+        ex.now += day
+        ex.requests = []
+        store, since = candle.sync_candles(ex, "BTC/USDT:USDT", "1m", days=1)
+        assert ex.requests == [(ex.now - day, None)]
+        ex.requests = []
+        store, since = candle.sync_candles(ex, "BTC/USDT:USDT", "1m", days=4)
+        assert ex.requests[0] == (10 * day + 4 * 60000, ex.now - day)
+
+        dates = store.read(start=since)["date"]
+        assert (dates[1:] - dates[:-1] == 60000).all()
+        assert dates[-1] == ex.now - 60000
+
+    def test_read_candles(self):
+        ex = FakeExchange(2 * 24 * 60 * 60 * 1000)
+        candle.sync_candles(ex, "BTC/USDT:USDT", "1m", days=1)
+        start = ex.now - 60 * 60000
+        arrays = candle.read_candles(
+            "fake", "BTC/USDT:USDT", "1m", start, start + 10 * 60000
+        )
+        assert arrays["date"][0] == start
+        # a symbol which has not been downloaded is not created
+        with self.assertRaises(ValueError):
+            candle.read_candles("fake", "ETH/USDT:USDT", "1m", start, ex.now)
+        assert os.listdir(os.path.join("data", "fake")) == ["BTC_USDT:USDT_1m"]
+
+
+if __name__ == "__main__":
+    unittest.main()
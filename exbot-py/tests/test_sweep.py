@@ -0,0 +1,47 @@
+import unittest
+from argparse import Namespace
+
+from core.backtest import run_backtest
+from core.sweep import param_grid, random_params, run_sweep
+from strategies.manager import create_strategy
+from tests.test_macd import random_frame
+
+
+class TestSweep(unittest.TestCase):
+    def test_params(self):
+        grid = {"fast_period": [8, 12], "slow_period": [21, 26, 30]}
+        trials = param_grid(grid)
+        assert len(trials) == 6
+        assert trials[0] == {"fast_period": 8, "slow_period": 21}
+        sampled = random_params(grid, 4, seed=1)
+        assert len(sampled) == 4
+        assert all(t in trials for t in sampled)
+        assert random_params(grid, 10) == trials
+
+    def test_create_strategy(self):
+        stgy = create_strategy("macd", {"fast_period": 8})
+        assert stgy.buy_params["fast_period"] == 8
+        # the class defaults are not changed
+        assert create_strategy("macd").buy_params["fast_period"] == 12
+        stgy = create_strategy("ichiv1", {"sell_trend_indicator": "trend_close_1h"})
+        assert stgy.sell_params["sell_trend_indicator"] == "trend_close_1h"
+        with self.assertRaises(ValueError):
+            create_strategy("macd", {"unknown": 1})
+
+    def test_run_sweep(self):
+        df = random_frame(3000, 1)
+        trials = param_grid({"fast_period": [8, 12], "signal_period": [5, 9]})
+        results = run_sweep(df, "macd", trials, True, 5, 20, workers=2)
+        assert len(results) == 4
+        assert results["total_profit"].is_monotonic_decreasing
+        # same as a backtest in this process
+        best = results.iloc[0]
+        params = {k: int(best[k]) for k in ["fast_period", "signal_period"]}
+        frame = create_strategy("macd", params).run(
+            df.copy(), None, Namespace(debug=True)
+        )
+        assert run_backtest(frame, True, 5, 20).total_profit == best["total_profit"]
+
+
+if __name__ == "__main__":
+    unittest.main()
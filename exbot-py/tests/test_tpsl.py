@@ -0,0 +1,174 @@
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from core.backtest import backtest_signals, run_backtest
+from core.tpsl import IntrabarTpsl
+from strategies.strategy import tpsl_settings
+
+MINUTE = 60000
+
+SETTINGS = {
+    "tpsl_amount": 0,
+    "take_profit_fix_upnl": 0,
+    "stop_loss_fix_upnl": 0,
+    "take_profit_fix_price_urate": 0,
+    "stop_loss_fix_price_urate": 0,
+    "position_take_profit_urate": 0.1,
+    "position_stop_loss_urate": 0.1,
+}
+
+
+def minute_candles(prices):
+    """
+    1m candles opening at the previous price and closing at the price
+    """
+    close = np.asarray(prices, dtype=np.float64)
+    open = np.r_[close[0], close[:-1]]
+    index = pd.date_range(
+        "2024-01-01", periods=len(close), freq="1min", tz="Asia/Shanghai", name="date"
+    )
+    return pd.DataFrame(
+        {
+            "open": open,
+            "high": np.maximum(open, close),
+            "low": np.minimum(open, close),
+            "close": close,
+            "volume": 1.0,
+        },
+        index=index,
+    )
+
+
+def five_minute_signals(minutes: pd.DataFrame, buy_bars, sell_bars):
+    df = minutes.resample("5min").agg(
+        {"open": "first", "high": "max", "low": "min", "close": "last"}
+    )
+    df["buy"] = np.where(np.isin(np.arange(len(df)), buy_bars), 1, np.nan)
+    df["sell"] = np.where(np.isin(np.arange(len(df)), sell_bars), 1, np.nan)
+    return df
+
+
+class TestIntrabarTpsl(unittest.TestCase):
+    def test_levels(self):
+        settings = dict(
+            SETTINGS, take_profit_fix_upnl=1, stop_loss_fix_price_urate=0.02
+        )
+        tpsl = IntrabarTpsl([], [], [], [], 5 * MINUTE, settings)
+        # 10 usdt at 100
+        take_profit, stop_loss = tpsl.levels("buy", 10, 0.1)
+        assert take_profit == 110
+        assert stop_loss == 98
+        take_profit, stop_loss = tpsl.levels("sell", 10, 0.1)
+        assert take_profit == 90
+        assert stop_loss == 102
+        tpsl.settings = dict(SETTINGS, position_take_profit_urate=0)
+        assert np.isnan(tpsl.levels("buy", 10, 0.1)[0])
+
+    def test_settings_env(self):
+        with mock.patch.dict(
+            os.environ,
+            {"TAKE_PROFIT_FIX_UPNL": "2", "POSITION_STOP_LOSS_URATE": "0.05"},
+        ):
+            settings = tpsl_settings()
+            assert settings["take_profit_fix_upnl"] == 2
+            assert settings["position_stop_loss_urate"] == 0.05
+            assert IntrabarTpsl([], [], [], [], MINUTE).settings == settings
+
+    def test_take_profit(self):
+        # buy at the close of the first 5m candle, then rise 12% in the third one
+        prices = [100] * 10 + [100, 104, 108, 112, 112] + [112] * 5
+        minutes = minute_candles(prices)
+        df = five_minute_signals(minutes, [0], [3])
+        tpsl = IntrabarTpsl.from_frame(minutes, 5 * MINUTE, SETTINGS)
+        result = run_backtest(df, False, 10, 10, tpsl)
+        trades = result.trades
+        assert trades["action"].tolist() == ["open", "take_profit", "open"]
+        exit = trades.iloc[1]
+        assert abs(exit["price"] - 110) < 1e-9
+        assert exit["date"] == minutes.index[13]
+        assert abs(exit["profit"] - (1 - 10 * 0.0012)) < 1e-9
+        # the sell signal opens a new position
+        assert result.hold_side == "sell"
+        assert result.summary()["trades"] == 1
+        # the equity follows the exit from its candle
+        assert result.equity.iloc[1] < 0
+        assert result.equity.iloc[2] == result.total_profit
+
+        # without the intrabar candles the sell signal closes the position
+        result = run_backtest(df, False, 10, 10)
+        assert result.trades["action"].tolist() == ["open", "close"]
+
+    def test_exit_signal_candle(self):
+        # buy at the close of the first 5m candle, the take profit is touched
+        # at 00:16 inside the candle of the sell signal
+        prices = [100] * 16 + [112] * 9
+        minutes = minute_candles(prices)
+        df = five_minute_signals(minutes, [0], [3])
+        tpsl = IntrabarTpsl.from_frame(minutes, 5 * MINUTE, SETTINGS)
+        result = run_backtest(df, False, 10, 10, tpsl)
+        trades = result.trades
+        # the long is closed before the short is filled at the candle close
+        assert trades["action"].tolist() == ["open", "take_profit", "open"]
+        assert trades["side"].tolist() == ["buy", "buy", "sell"]
+        assert trades["date"].iloc[1] == minutes.index[16]
+        assert trades["date"].iloc[2] == df.index[3]
+        # the short opened by the sell signal is held from its candle
+        assert result.hold_side == "sell"
+        assert result.position.tolist() == [1, 1, 1, -1, -1]
+        # the open short is valued in the equity curve
+        expected = result.total_profit + result.unsettled_profit
+        assert abs(result.equity.iloc[-1] - expected) < 1e-12
+
+    def test_stop_loss_gap(self):
+        # short at 100, a gap up opens above the stop loss
+        prices = [100] * 5 + [100, 100, 120, 121, 121]
+        minutes = minute_candles(prices)
+        minutes.iloc[7, minutes.columns.get_loc("open")] = 115
+        df = five_minute_signals(minutes, [], [0])
+        tpsl = IntrabarTpsl.from_frame(minutes, 5 * MINUTE, SETTINGS)
+        result = run_backtest(df, False, 10, 10, tpsl)
+        exit = result.trades.iloc[1]
+        assert exit["action"] == "stop_loss"
+        assert exit["price"] == 115
+        assert exit["date"] == minutes.index[7]
+
+    def test_stop_loss_first(self):
+        # both levels touched by the same candle
+        minutes = minute_candles([100] * 10)
+        minutes.iloc[7, minutes.columns.get_loc("high")] = 111
+        minutes.iloc[7, minutes.columns.get_loc("low")] = 89
+        tpsl = IntrabarTpsl.from_frame(minutes, 5 * MINUTE, SETTINGS)
+        start = tpsl.dates[0]
+        touch = tpsl.first_touch(
+            "buy", 10, 0.1, start + 5 * MINUTE, start + 10 * MINUTE
+        )
+        assert touch == (start + 7 * MINUTE, 90.0, "stop_loss")
+        # the candles before the fill are not used
+        touch = tpsl.first_touch(
+            "buy", 10, 0.1, start + 8 * MINUTE, start + 10 * MINUTE
+        )
+        assert touch is None
+
+    def test_untouched(self):
+        rng = np.random.default_rng(1)
+        minutes = minute_candles(100 + np.cumsum(rng.normal(0, 0.05, 3000)))
+        df = minutes.resample("5min").agg({"close": "last"})
+        buy = rng.random(len(df)) < 0.05
+        sell = ~buy & (rng.random(len(df)) < 0.05)
+        tpsl = IntrabarTpsl.from_frame(
+            minutes, 5 * MINUTE, dict(SETTINGS, position_take_profit_urate=0.5)
+        )
+        args = (df.index, df["close"].values, buy, sell, True, 5, 20)
+        result = backtest_signals(*args, tpsl)
+        expected = backtest_signals(*args)
+        assert "take_profit" not in result.trades["action"].values
+        assert result.total_profit == expected.total_profit
+        assert (result.equity.values == expected.equity.values).all()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+import numpy as np
+
+from core.sweep import backtest_strategy, param_grid
+from core.walkforward import DAY_MS, walk_forward, walk_forward_windows
+from tests.test_macd import random_frame
+
+
+class TestWalkForward(unittest.TestCase):
+    def test_windows(self):
+        # 1 candle per hour for 10 days
+        dates = np.arange(240) * 3600 * 1000
+        windows = walk_forward_windows(dates, 3 * DAY_MS, DAY_MS, 24)
+        assert windows[0] == (24, 96, 120)
+        assert windows[1] == (48, 120, 144)
+        # the last test window is cut at the end of the candles
+        assert windows[-1] == (144, 216, 240)
+        # the test windows follow each other
+        for prev, window in zip(windows, windows[1:]):
+            assert prev[2] == window[1]
+        assert walk_forward_windows(dates, 10 * DAY_MS, DAY_MS, 24) == []
+
+    def test_walk_forward(self):
+        df = random_frame(3000, 2)
+        trials = param_grid({"fast_period": [8, 12], "signal_period": [5, 9]})
+        days = (df.index[-1] - df.index[0]).total_seconds() / 86400
+        results = walk_forward(
+            df, "macd", trials, days / 4, days / 8, 96, True, 5, 20, workers=2
+        )
+        assert len(results) > 0
+        assert results["test_start"].is_monotonic_increasing
+        # same as the backtests in this process
+        for _, row in results.iterrows():
+            params = {k: int(row[k]) for k in ["fast_period", "signal_period"]}
+            train_start, test_start = df.index.get_indexer(
+                [row["train_start"], row["test_start"]]
+            )
+            test_end = df.index.get_loc(row["test_end"]) + 1
+            train = [
+                backtest_strategy(
+                    df.iloc[train_start - 96 : test_start].copy(),
+                    "macd",
+                    trial,
+                    True,
+                    5,
+                    20,
+                    96,
+                ).total_profit
+                for trial in trials
+            ]
+            assert row["train_profit"] == max(train)
+            test = backtest_strategy(
+                df.iloc[test_start - 96 : test_end].copy(),
+                "macd",
+                params,
+                True,
+                5,
+                20,
+                96,
+            )
+            assert row["test_total_profit"] == test.total_profit
+
+
+if __name__ == "__main__":
+    unittest.main()